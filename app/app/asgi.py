@@ -0,0 +1,20 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.1 has no ASGI support of its own, so this wraps the WSGI application
+(see core/asgi.py); serve it with ``python manage.py serve --asgi``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+wsgi_application = get_wsgi_application()
+
+from core.asgi import ASGIHandler  # noqa: E402 (needs django set up first)
+from recipe.fastpath import cached_list  # noqa: E402
+
+application = ASGIHandler(wsgi_application, fast_paths=[cached_list])
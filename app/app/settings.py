@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,13 +38,18 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # trigram search lookups (see recipe/search.py)
     'rest_framework',
     'rest_framework.authtoken',
     'core',
-    'user'
+    'user',
+    'recipe',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware', # first, so its timings cover everything below it
+    'core.middleware.LoadSheddingMiddleware', # before the real work so shedding a request is cheap
+    'core.middleware.ReplicaPinMiddleware', # only active when read replicas are configured
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryInspectorMiddleware', # only active when DEBUG is on
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -73,6 +80,13 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# ASGI mode (app/asgi.py, python manage.py serve --asgi)
+    # ASGI_THREADS - threads per process running django (views & ORM); connections themselves don't use one
+    # ASGI_FAST_PATH - answer repeat tag/ingredient list requests from caches without a thread (recipe/fastpath.py)
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+ASGI_FAST_PATH = os.environ.get('ASGI_FAST_PATH', '1').lower() in ('1', 'true', 'yes')
+
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
@@ -87,10 +101,81 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # seconds to keep a connection open between requests (0 == close after every request)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
     }
 }
 
+# Connection pooling - set DB_POOL=1 to borrow connections from a pool in each worker process
+    # instead of opening a new one (TCP + auth handshake) for every request
+    # DB_POOL_MAX_SIZE - most connections a worker process opens
+    # DB_POOL_TIMEOUT - seconds to wait for a free connection before giving up
+    # DB_POOL_CHECK_INTERVAL - connections idle longer than this are pinged (SELECT 1) before they're
+        # handed out; 0 (default) pings every one, so a restarted / failed over DB is never a 500
+    # DB_POOL_MAX_LIFETIME - seconds before a connection is closed & replaced (unset == never)
+if os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['ENGINE'] = 'core.db.backends.postgresql_pool'
+    DATABASES['default']['POOL'] = {
+        'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'CHECK_INTERVAL': float(os.environ.get('DB_POOL_CHECK_INTERVAL', 0)),
+        'MAX_LIFETIME': float(os.environ['DB_POOL_MAX_LIFETIME']) if os.environ.get('DB_POOL_MAX_LIFETIME') else None,
+    }
+
+
+# Read replicas (see core/db/router.py) - reads go to a replica, writes & reads right after a write to default
+    # DB_REPLICA_HOSTS - comma separated replica hosts; same name, user & password as the primary
+    # DB_REPLICA_MAX_LAG - seconds a replica may be behind before reads stop going to it
+    # DB_REPLICA_CHECK_INTERVAL - seconds between replica lag checks (per process)
+    # DB_REPLICA_PIN_SECONDS - how long a client that wrote keeps reading from the primary
+    # REPLICA_PIN_CACHE_ALIAS - cache those pins live in; must be shared by every server process
+        # (the app refuses to start with replicas & a per process LocMemCache)
+
+DATABASE_ROUTERS = ['core.db.router.ReplicaRouter']
+DATABASE_REPLICAS = []
+for i, host in enumerate(h.strip() for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+    alias = 'replica%d' % (i + 1)
+    # tests run against the primary's test database instead of creating one per replica
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 1))
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_CACHE_ALIAS = os.environ.get('REPLICA_PIN_CACHE_ALIAS', 'default')
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/2.1/topics/auth/passwords/
+    # PASSWORD_HASHER picks the hasher for new passwords: 'pbkdf2' (default) or 'argon2'
+        # (memory-hard; needs `pip install argon2-cffi`). The others stay listed so existing
+        # hashes still verify & get upgraded on the user's next login
+    # PASSWORD_PBKDF2_ITERATIONS - pbkdf2 cost (0 == django's default)
+    # PASSWORD_ARGON2_* - argon2 time cost (passes), memory cost (KiB) & parallelism (threads)
+    # PASSWORD_HASHING_WORKERS - threads hashing passwords per process (0 == hash on the request thread)
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'core.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1)) # the first one hashes new passwords
+
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0))
+
+PASSWORD_ARGON2 = {
+    'TIME_COST': int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)),
+    'MEMORY_COST': int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 512)),
+    'PARALLELISM': int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 2)),
+}
+
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -131,3 +216,207 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 AUTH_USER_MODEL = 'core.User'
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+    # JSON is rendered & parsed with orjson when it's installed (see core/renderers.py), else the json module
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # token bucket throttles (see core/throttling.py) - "<requests>/<s|m|h|d>"
+        # signup & email_check - per IP address; create - tag/ingredient creates per user; create_ip - per IP address
+        # set one to an empty string to turn it off
+    'DEFAULT_THROTTLE_RATES': {
+        'signup': os.environ.get('THROTTLE_SIGNUP_RATE', '10/min'),
+        'email_check': os.environ.get('THROTTLE_EMAIL_CHECK_RATE', '60/min'),
+        'create': os.environ.get('THROTTLE_CREATE_RATE', '120/min'),
+        'create_ip': os.environ.get('THROTTLE_CREATE_IP_RATE', '600/min'),
+    },
+    # how many proxies (ie. a load balancer) sit in front of the app - the client's IP address
+        # is then taken from X-Forwarded-For instead of being the proxy's
+    'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if os.environ.get('NUM_PROXIES') else None,
+}
+
+
+# Caches
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+# the default cache holds what every server process must agree on - the list versions behind
+    # the ETags (recipe/caching.py) & the replica pins (core/db/router.py) - so it's a directory
+    # of files by default, which all the workers of one machine share; with several machines
+    # (or containers) point it at memcached instead
+    # ie. CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache CACHE_LOCATION=memcached:11211
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'app-cache')),
+        # (memcached takes no MAX_ENTRIES - it evicts on its own)
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000))} if 'memcached' not in CACHE_BACKEND else {},
+    },
+    # rendered tag/ingredient list responses (see recipe/caching.py); local to each process
+        # unless RESPONSE_CACHE_BACKEND points at a shared cache
+    'recipe_responses': {
+        'BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'recipe-responses'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 10000))},
+    },
+}
+
+
+# Token authentication cache (see core/authentication.py)
+    # MAX_SIZE - how many tokens each process keeps in its LRU
+    # TTL - seconds a cached token is trusted before we look it up again
+    # ALIAS - name of a cache in CACHES shared by all workers (ie. memcached); leave unset to only cache in-process
+    # LOCAL_TTL - seconds each process trusts its own copy; this is the REVOCATION WINDOW: a deleted
+        # token / deactivated user can keep working in other worker processes for up to this long
+        # when there's no ALIAS (with one, revocations reach every process on its next request,
+        # except the ASGI fast path, which never waits on the shared cache)
+
+TOKEN_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_CACHE_TTL', 60)),
+    'ALIAS': os.environ.get('TOKEN_CACHE_ALIAS') or None,
+    'LOCAL_TTL': int(os.environ.get('TOKEN_CACHE_LOCAL_TTL', 5)),
+}
+
+
+# Cache holding the per-user versions of the tag/ingredient lists (see recipe/caching.py)
+    # must be shared between server processes - serve refuses to start more than one worker
+    # when it's a per process LocMemCache
+
+RECIPE_CACHE_ALIAS = os.environ.get('RECIPE_CACHE_ALIAS', 'default')
+
+# Cache holding the rendered list responses & how many seconds they're kept
+
+RECIPE_RESPONSE_CACHE_ALIAS = os.environ.get('RECIPE_RESPONSE_CACHE_ALIAS', 'recipe_responses')
+RECIPE_RESPONSE_CACHE_TTL = int(os.environ.get('RECIPE_RESPONSE_CACHE_TTL', 300))
+
+
+# Rows fetched per round trip when streaming a whole list (?format=json-stream) or an export
+
+RECIPE_STREAM_CHUNK_SIZE = int(os.environ.get('RECIPE_STREAM_CHUNK_SIZE', 2000))
+
+
+# Most tags/ingredients accepted in one bulk create request (a JSON array posted to the create endpoint)
+
+RECIPE_BULK_CREATE_MAX = int(os.environ.get('RECIPE_BULK_CREATE_MAX', 1000))
+
+
+# Per process filter of the registered emails (see core/emails.py) - lets most signups &
+    # availability checks of a new email skip the database
+    # CAPACITY - emails it's sized for before it's rebuilt bigger (at least twice the users at build time)
+    # ERROR_RATE - share of free emails it wrongly calls "maybe taken" (those cost a query)
+    # REFRESH - at most this often (seconds) it looks for users other processes created
+
+EMAIL_FILTER = {
+    'ENABLED': os.environ.get('EMAIL_FILTER_ENABLED', '1').lower() in ('1', 'true', 'yes'),
+    'CAPACITY': int(os.environ.get('EMAIL_FILTER_CAPACITY', 100000)),
+    'ERROR_RATE': float(os.environ.get('EMAIL_FILTER_ERROR_RATE', 0.01)),
+    'REFRESH': float(os.environ.get('EMAIL_FILTER_REFRESH', 1.0)),
+}
+
+
+# Admin changelist for big tables (see core/changelist.py - used for users)
+    # COUNT_LIMIT - tables bigger than this show postgres' row estimate instead of a COUNT(*);
+        # searches & filters count at most this many rows ("more than N")
+    # QUERY_TIMEOUT - seconds any one query of the list page may run (postgres statement_timeout)
+
+ADMIN_CHANGELIST = {
+    'COUNT_LIMIT': int(os.environ.get('ADMIN_CHANGELIST_COUNT_LIMIT', 10000)),
+    'QUERY_TIMEOUT': float(os.environ.get('ADMIN_CHANGELIST_QUERY_TIMEOUT', 5.0)),
+}
+
+
+# last_login writes (see core/last_login.py)
+    # BUFFERED - collect logins in memory & write them in batches from a background thread; turn
+        # off (LAST_LOGIN_BUFFERED=0) for django's one UPDATE per login, written before the response
+    # FLUSH_INTERVAL - seconds between batch writes (last_login can be this far behind)
+    # MAX_SIZE - users waiting to be written before a login flushes them itself
+
+LAST_LOGIN = {
+    'BUFFERED': os.environ.get('LAST_LOGIN_BUFFERED', '1').lower() in ('1', 'true', 'yes'),
+    'FLUSH_INTERVAL': float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', 5.0)),
+    'MAX_SIZE': int(os.environ.get('LAST_LOGIN_MAX_SIZE', 10000)),
+}
+
+
+# Cache holding the throttles' token buckets (see core/throttling.py)
+    # leave unset to keep them in each process - then every worker allows the full rate on its own
+
+THROTTLE_CACHE_ALIAS = os.environ.get('THROTTLE_CACHE_ALIAS') or None
+
+
+# Threads each server process runs requests on - gthread's --threads (python manage.py serve sets
+    # it from its options; ASGI_THREADS with --asgi); the load shedding limits below follow it
+    # unset == not under serve (ie. runserver, a thread per request) - load shedding stays off
+        # unless LOAD_SHED_MAX_IN_FLIGHT is set
+
+SERVER_THREADS = int(os.environ['SERVER_THREADS']) if os.environ.get('SERVER_THREADS') else None
+
+# Load shedding (see LoadSheddingMiddleware in core/middleware.py) - requests over a limit get a
+    # fast 503 with Retry-After instead of queueing up behind the ones already running
+    # MAX_IN_FLIGHT - requests one process works on at once (0 turns load shedding off); unset ==
+        # SERVER_THREADS - a pooled server (gthread, ASGI) never runs more than that; with neither
+        # set (ie. runserver) load shedding is off
+    # MAX_WRITES_IN_FLIGHT - how many of those may be writes (ie. signups, which hash a password),
+        # so a burst of them can't take every thread away from the reads; unset == half of MAX_IN_FLIGHT
+    # MAX_QUEUE_WAIT - seconds a request may wait before a thread picks it up before it's shed;
+        # known in ASGI mode (core/asgi.py stamps it) or from REQUEST_START_HEADER
+    # REQUEST_START_HEADER - header a proxy in front sets to when it received the request (ie. nginx:
+        # proxy_set_header X-Request-Start "t=${msec}";), the only way to see gthread's own queue;
+        # unset by default - only set it when that proxy also overwrites any value a client sends,
+        # or anyone can get their requests shed by sending an old timestamp
+        # with neither (gthread, no such proxy) nothing measures queueing - only the writes &
+        # latency checks protect the process
+    # MAX_LATENCY - while the recent average request takes longer than this many seconds,
+        # writes are shed so the reads behind them stay fast
+    # RETRY_AFTER - seconds the client is told to wait
+
+LOAD_SHED = {
+    'MAX_IN_FLIGHT': int(os.environ['LOAD_SHED_MAX_IN_FLIGHT']) if os.environ.get('LOAD_SHED_MAX_IN_FLIGHT') else None,
+    'MAX_WRITES_IN_FLIGHT': (
+        int(os.environ['LOAD_SHED_MAX_WRITES_IN_FLIGHT']) if os.environ.get('LOAD_SHED_MAX_WRITES_IN_FLIGHT') else None
+    ),
+    'MAX_QUEUE_WAIT': float(os.environ.get('LOAD_SHED_MAX_QUEUE_WAIT', 1.0)),
+    'REQUEST_START_HEADER': os.environ.get('LOAD_SHED_REQUEST_START_HEADER') or None,
+    'MAX_LATENCY': float(os.environ.get('LOAD_SHED_MAX_LATENCY', 2.0)),
+    'RETRY_AFTER': int(os.environ.get('LOAD_SHED_RETRY_AFTER', 1)),
+}
+
+
+# Request metrics (see core/middleware.py) - scraped from /metrics/
+    # METRICS_SERVER_TIMING - also send each request's db/serialize/render/total times in a Server-Timing header
+    # METRICS_DIR - where serve's workers leave their numbers for /metrics/ to add up (see
+        # core/metrics.py); unset -> serve makes a fresh temporary directory on every start
+    # METRICS_FLUSH_INTERVAL - seconds between a worker's writes of its numbers
+    # METRICS_ALLOWED_NETWORKS - comma separated addresses / networks (ie. 10.0.0.0/8) that may read
+        # /metrics/; localhost only by default - behind a proxy every request comes from the proxy's
+        # address, so use the token there
+    # METRICS_TOKEN - scrapers sending "Authorization: Bearer <token>" may read /metrics/ from anywhere
+
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '1').lower() in ('1', 'true', 'yes')
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+METRICS_ACCESS = {
+    'ALLOWED_NETWORKS': [
+        n.strip() for n in os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1,::1').split(',') if n.strip()
+    ],
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+}
+
+
+# Dev-only N+1 logging (see QueryInspectorMiddleware in core/middleware.py)
+    # QUERY_INSPECTOR_REPEATS - how many runs of the same query shape in one request get logged
+
+QUERY_INSPECTOR_REPEATS = int(os.environ.get('QUERY_INSPECTOR_REPEATS', 3))
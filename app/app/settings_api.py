@@ -0,0 +1,47 @@
+"""
+Lean settings for processes that only serve the JSON API (ie. autoscaled serve workers)
+
+Everything in app/settings.py, minus what an API request never touches:
+    - the admin site & the apps behind it (sessions, messages, staticfiles)
+    - their middleware (sessions, CSRF, request.user, messages, X-Frame-Options)
+    - DRF's browsable API (HTML pages rendered with templates)
+
+    DJANGO_SETTINGS_MODULE=app.settings_api python manage.py serve
+
+Run migrations (& the admin) with the full app.settings - the tables of the apps left out
+here still exist, this profile just never loads them. See python manage.py profile_startup
+for what the difference is worth.
+"""
+from app.settings import *  # noqa: F401,F403
+from app.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+
+# apps only the admin site needs
+    # auth & contenttypes stay - the User model & its permissions are built on them
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+)]
+
+# middleware for browsers & sessions - the API authenticates every request with its token
+    # (DRF views are exempt from CSRF checks anyway & set request.user themselves)
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)]
+
+# the same urls without admin/
+ROOT_URLCONF = 'app.urls_api'
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    # JSON only - no browsable API (it needs templates & would try to log in with a session)
+    DEFAULT_RENDERER_CLASSES=('core.renderers.JSONRenderer',),
+    # DRF's default is session + basic auth; neither is used by the API
+    DEFAULT_AUTHENTICATION_CLASSES=('core.authentication.CachedTokenAuthentication',),
+)
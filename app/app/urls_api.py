@@ -0,0 +1,10 @@
+"""URLs of the lean API-only profile (app/settings_api.py): app/urls.py without the admin site"""
+from django.urls import path, include
+
+from core.views import metrics
+
+urlpatterns = [
+    path('api/user/', include('user.urls')),
+    path('api/recipe/', include('recipe.urls')),
+    path('metrics/', metrics, name='metrics'),
+]
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 from core import models
+# estimated counts, keyset pages & a time limit - the user table is far too big for COUNT(*) & OFFSET
+from core.changelist import KeysetChangeListMixin
 
 # the recommended convention for converting string to human readable text
     # we do it so it gets passed through the translation engine; in case u wanted to extend the code to support multiple languages
@@ -9,9 +11,12 @@ from core import models
 from django.utils.translation import gettext as _
 
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(KeysetChangeListMixin, BaseUserAdmin):
     ordering = ['id'] # set the ordering to the id of the object
     list_display = ['email', 'name'] # list them by email and name
+    # the search box finds emails starting with what's typed (ignoring case), using the
+        # LOWER(email) index instead of scanning every row for '%term%'
+    keyset_search_field = 'email'
     # define the sections for the field set in our change and create page
         # each bracked in paranthesis is a section
         # title of first section is NONE - has the email & pw fields
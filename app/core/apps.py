@@ -3,3 +3,17 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # importing the module connects the receivers (cache invalidation etc.)
+        from core import signals  # noqa: F401
+
+        from django.conf import settings
+        if settings.LAST_LOGIN['BUFFERED']:
+            from django.contrib.auth.models import update_last_login
+            from django.contrib.auth.signals import user_logged_in
+
+            from core.last_login import record_login
+            # logins update last_login through the write-behind buffer (see core/last_login.py)
+            user_logged_in.disconnect(update_last_login, dispatch_uid='update_last_login')
+            user_logged_in.connect(record_login, dispatch_uid='record_login')
@@ -0,0 +1,149 @@
+"""A small ASGI front end for our (WSGI only) django 2.1 app"""
+# an ASGI server (ie. uvicorn) keeps every connection - including the thousands of idle
+    # keep-alive ones & slow clients still sending their request or reading the response -
+    # in one event loop; a thread is only borrowed from a bounded pool while django itself
+    # (views, ORM, middleware) runs, then the response bytes are written back from the loop
+# fast paths (ie. recipe/fastpath.py) get a look at each request first & can answer it
+    # straight from the event loop without a thread - they must never touch the db
+import asyncio
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http.response import HttpResponseBase
+
+
+class ASGIHandler:
+    """ASGI 3 application that runs a WSGI application in a bounded thread pool"""
+
+    def __init__(self, wsgi_application, fast_paths=(), max_threads=None):
+        self.wsgi_application = wsgi_application
+        self.fast_paths = list(fast_paths)
+        self.max_threads = max_threads or settings.ASGI_THREADS
+        self.executor = None
+
+    def get_executor(self):
+        # created lazily so a forking server builds it in each worker, not the master
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.max_threads, thread_name_prefix='asgi')
+        return self.executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type %r' % scope['type'])
+
+        body = await self.read_body(receive)
+        if body is None:
+            return # client went away before sending the whole request
+
+        for fast_path in self.fast_paths:
+            response = fast_path(scope)
+            if response is not None:
+                body.close()
+                status, headers, content = response
+                await self.send_response(send, status, headers, content)
+                return
+
+        loop = asyncio.get_event_loop()
+        environ = self.get_environ(scope, body)
+        # lets LoadSheddingMiddleware see how long the request waited for a free thread
+        environ['core.queued_at'] = time.monotonic()
+        status, headers, content = await loop.run_in_executor(
+            self.get_executor(), self.run_wsgi, environ, loop, send
+        )
+        if status is not None: # None: a streamed response, already sent from the thread
+            await self.send_response(send, status, headers, content)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.executor is not None:
+                    self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """The request body, spooled to disk past FILE_UPLOAD_MAX_MEMORY_SIZE"""
+        body = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b')
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def get_environ(self, scope, body):
+        """The WSGI environ for an ASGI http scope"""
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI strings are bytes decoded as latin-1 (django re-decodes them as utf-8)
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+            'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            if name in environ: # repeated header
+                value = environ[name] + ',' + value
+            environ[name] = value
+        return environ
+
+    def run_wsgi(self, environ, loop, send):
+        """Run django in a pool thread; returns (status, headers, body bytes)"""
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            if isinstance(result, HttpResponseBase) and result.streaming:
+                # stream from this thread so the rows are read on the same db connection;
+                    # .result() waits for each chunk to be sent, so a slow client slows us down
+                    # instead of the chunks piling up in memory
+                def push(message):
+                    asyncio.run_coroutine_threadsafe(send(message), loop).result()
+                push({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+                for chunk in result:
+                    if chunk:
+                        push({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                push({'type': 'http.response.body', 'body': b''})
+                return None, None, None
+            content = b''.join(result)
+        finally:
+            # sends request_finished (which closes this thread's db connections) in the thread that used them
+            if hasattr(result, 'close'):
+                result.close()
+            environ['wsgi.input'].close()
+        return started['status'], started['headers'], content
+
+    async def send_response(self, send, status, headers, content):
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
@@ -0,0 +1,178 @@
+"""Token authentication that doesn't hit the database on every request"""
+# DRF's TokenAuthentication runs a SELECT on authtoken_token (joined to core_user)
+    # for every single authenticated request. Tokens almost never change, so we
+    # remember the token (and the user it belongs to):
+        # 1st tier - a bounded LRU dict living inside this process (no network hop at all)
+        # 2nd tier - optionally, one of the django caches from CACHES (ie. memcached/redis)
+            # so every worker process shares the lookups
+    # both tiers expire entries after a TTL and core/signals.py drops entries as soon as
+    # a token is deleted or a user is saved (ie. is_active flipped)
+    # revoking only clears the 1st tier of the process that saved - every other worker learns
+    # about it through the shared tier's generation number, which each revocation bumps:
+        # a 1st tier entry remembered under an older generation isn't served by get()
+        # without a shared tier (or through get_local(), which never asks it) an entry is
+            # trusted for LOCAL_TTL seconds at most - that's how long another process can
+            # keep accepting a revoked token or a deactivated user
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Two tier (in-process LRU + optional shared cache) map of token key -> token"""
+
+    key_prefix = 'authtoken:'
+    generation_key = key_prefix + 'generation'
+
+    def __init__(self, max_size=10000, ttl=60, alias=None, local_ttl=5):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.local_ttl = min(ttl, local_ttl) # how long the 1st tier trusts an entry
+        self.alias = alias # name of the django cache used as the shared tier; None disables it
+        self._entries = OrderedDict() # token key -> (expires_at, token, generation); order == recency
+        self._lock = threading.Lock() # the threaded server shares this dict between threads
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _shared_key(self, key):
+        # never put the raw token in the shared cache's keyspace
+        return self.key_prefix + hashlib.sha256(key.encode()).hexdigest()
+
+    def generation(self):
+        """The shared revocation generation (None without a shared tier)"""
+        if self.shared is None:
+            return None
+        # an evicted counter reads as 0, which no remembered entry has after a revocation -
+            # at worst that's a miss, never a stale hit
+        return self.shared.get(self.generation_key, 0)
+
+    def _bump_generation(self):
+        shared = self.shared
+        if shared is None:
+            return
+        shared.add(self.generation_key, 0, None)
+        try:
+            shared.incr(self.generation_key)
+        except ValueError: # evicted in between
+            shared.set(self.generation_key, 1, None)
+
+    def get(self, key, generation=None):
+        """Return the cached token (with its user loaded), or None on a miss"""
+        if self.shared is None:
+            return self.get_local(key)
+        if generation is None:
+            generation = self.generation()
+        token = self.get_local(key, generation)
+        if token is not None:
+            return token
+        now = time.monotonic()
+        token = self.shared.get(self._shared_key(key))
+        if token is not None:
+            self._remember(key, token, now, generation)
+        return token
+
+    def get_local(self, key, generation=None):
+        """Like get() but only looks in this process (never blocks on the network)
+
+        With a generation, entries remembered under another one are a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now and (generation is None or entry[2] == generation):
+                    self._entries.move_to_end(key) # mark as most recently used
+                    return entry[1]
+                del self._entries[key] # expired or revoked since
+        return None
+
+    def set(self, key, token, generation=None):
+        """Remember token; generation is the one read before it was looked up in the db"""
+        current = self.generation()
+        if generation is not None and current != generation:
+            return # something was revoked while we looked it up - maybe this token
+        self._remember(key, token, time.monotonic(), current)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), token, self.ttl)
+
+    def _remember(self, key, token, now, generation=None):
+        with self._lock:
+            self._entries[key] = (now + self.local_ttl, token, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False) # evict the least recently used token
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+            self._bump_generation() # the other processes drop their copies too
+
+    def delete_user(self, user_id, keys=()):
+        """Drop every cached token of a user
+
+        keys are the user's token keys from the db, so we can clear them
+        from the shared tier too (it can't be scanned by user)
+        """
+        with self._lock:
+            stale = [k for k, (_, token, _) in self._entries.items() if token.user_id == user_id]
+            for k in stale:
+                del self._entries[k]
+        if self.shared is not None:
+            if keys:
+                self.shared.delete_many([self._shared_key(k) for k in keys])
+            self._bump_generation()
+
+    def clear(self):
+        """Empty the in-process tier (the shared tier is left alone)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the process wide TokenCache, built from settings.TOKEN_CACHE on first use"""
+    global _token_cache
+    if _token_cache is None:
+        config = getattr(settings, 'TOKEN_CACHE', {})
+        _token_cache = TokenCache(
+            max_size=config.get('MAX_SIZE', 10000),
+            ttl=config.get('TTL', 60),
+            alias=config.get('ALIAS'),
+            local_ttl=config.get('LOCAL_TTL', 5),
+        )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop in replacement for TokenAuthentication that caches token lookups"""
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        generation = cache.generation() # before the lookup, so a revocation during it is noticed
+        token = cache.get(key, generation)
+        if token is not None:
+            # we only ever cache tokens of active users & the signals evict users that
+            # are deactivated (in other processes within LOCAL_TTL, or straight away with a
+            # shared tier), so a hit is as good as the db lookup
+            return (token.user, token)
+
+        # miss - let DRF do the normal lookup (token + user in one select_related query);
+        # it raises AuthenticationFailed for bad or inactive tokens, which are never cached
+        user, token = super().authenticate_credentials(key)
+        cache.set(key, token, generation)
+        return (user, token)
@@ -0,0 +1,45 @@
+"""A small Bloom filter - a set that can say "definitely not in it" without storing the items"""
+# "no" answers are always right; "yes" is wrong about error_rate of the time (a false
+    # positive), so a "yes" has to be confirmed elsewhere (ie. with a database query)
+# ~1.2 bytes per item at a 1% error rate - a million emails fit in about 1.2MB
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # optimal sizes for holding `capacity` items at `error_rate` false positives
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock() # setting a bit is a read-modify-write of its byte
+
+    def _positions(self, item):
+        # two 64 bit hashes combined into as many as we need (Kirsch & Mitzenmacher) -
+            # one blake2b call per item instead of one per hash function
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def full(self):
+        """Holding more than it was sized for (false positives climb past error_rate)"""
+        return self.count > self.capacity
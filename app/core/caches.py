@@ -0,0 +1,9 @@
+"""Tell the caches that live in one process' memory from those all the processes share"""
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+
+def is_per_process(alias):
+    """True if the cache named alias is a LocMemCache - every process then has its own copy"""
+    return issubclass(import_string(settings.CACHES[alias]['BACKEND']), LocMemCache)
@@ -0,0 +1,153 @@
+"""An admin changelist that stays fast on tables with millions of rows"""
+# django's changelist runs an exact COUNT(*) (twice, with a search) & pages with OFFSET, both
+    # of which read the whole table (up to the page) on every click; KeysetChangeList instead:
+        # - counts: the planner's row estimate (pg_class.reltuples) for the whole table, or an
+            # exact count stopped at settings.ADMIN_CHANGELIST['COUNT_LIMIT'] when filtered
+        # - pages: "newer"/"older" links that seek from the id at the edge of the current page
+            # (WHERE id > x ORDER BY id LIMIT n) - the same cost for page 1 & page 100000
+        # - time limit: ModelAdmin.changelist_view wraps GETs in a transaction with a
+            # statement_timeout (see KeysetChangeListMixin), so one bad search can't run for minutes
+# the list is always ordered by id - clicking a column header to sort isn't offered
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections, router, transaction
+from django.db.models.functions import Lower
+from django.http import HttpResponseRedirect
+
+
+AFTER_VAR = 'after' # ?after=<id>: the page starting right after this id
+BEFORE_VAR = 'before' # ?before=<id>: the page ending right before this id
+QUERY_CANCELED = '57014' # postgres error code for a statement_timeout
+
+
+def estimated_count(queryset):
+    """(count, how) for a queryset without counting every row - how is 'exact', 'estimate' or 'at_least'"""
+    # unfiltered table on postgres: VACUUM/ANALYZE keep pg_class.reltuples close to the truth
+    limit = settings.ADMIN_CHANGELIST['COUNT_LIMIT']
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [
+                queryset.model._meta.db_table
+            ])
+            row = cursor.fetchone()
+        if row and row[0] > limit:
+            return row[0], 'estimate'
+    # small or filtered - count exactly, but never more than limit + 1 rows
+    count = queryset.order_by()[:limit + 1].count()
+    return (limit, 'at_least') if count > limit else (count, 'exact')
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator told its count up front (the admin's pagination tag still wants one)"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.__dict__['count'] = count # count is a cached_property - never runs a COUNT(*)
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList with estimated counts & id keyset pagination instead of COUNT(*) & OFFSET"""
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = self._id_param(request, AFTER_VAR)
+        self.before = self._id_param(request, BEFORE_VAR)
+        self.read_db = getattr(request, 'admin_read_db', None)
+        super().__init__(request, *args, **kwargs)
+
+    @staticmethod
+    def _id_param(request, name):
+        value = request.GET.get(name, '')
+        return int(value) if value.isdigit() else None
+
+    def get_filters_params(self, params=None):
+        # our cursor params aren't field lookups
+        lookup_params = super().get_filters_params(params)
+        for name in (AFTER_VAR, BEFORE_VAR):
+            lookup_params.pop(name, None)
+        return lookup_params
+
+    def get_ordering(self, request, queryset):
+        return ['pk']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # the db the changelist view picked (a replica when there is one) for the whole page
+        return queryset.using(self.read_db) if self.read_db else queryset
+
+    def get_results(self, request):
+        per_page = self.list_per_page
+        count, self.count_kind = estimated_count(self.queryset) # the template says "about"/"more than"
+
+        if self.before is not None:
+            # the page before: the per_page rows under `before`, fetched backwards then flipped
+            rows = list(self.queryset.filter(pk__lt=self.before).order_by('-pk')[:per_page + 1])
+            has_previous, has_next = len(rows) > per_page, True
+            rows = rows[:per_page][::-1]
+        else:
+            queryset = self.queryset if self.after is None else self.queryset.filter(pk__gt=self.after)
+            rows = list(queryset.order_by('pk')[:per_page + 1])
+            has_previous, has_next = self.after is not None, len(rows) > per_page
+            rows = rows[:per_page]
+
+        self.result_count = count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_previous or has_next
+        self.paginator = EstimatedCountPaginator(self.queryset, per_page, count=count)
+        self.previous_url = self.get_query_string({BEFORE_VAR: rows[0].pk}, [AFTER_VAR]) if has_previous and rows else None
+        self.next_url = self.get_query_string({AFTER_VAR: rows[-1].pk}, [BEFORE_VAR]) if has_next and rows else None
+
+
+class KeysetChangeListMixin:
+    """ModelAdmin mixin: KeysetChangeList, prefix search on LOWER(<field>) & a query time limit"""
+    # keyset_search_field - searched with LOWER(field) LIKE 'term%', which the
+        # LOWER(field) text_pattern_ops index serves (see migration 0006 for email)
+
+    keyset_search_field = None
+    show_full_result_count = False # no second COUNT(*) of the whole table next to search results
+    sortable_by = () # keyset pagination needs the id order
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_fields(self, request):
+        return [self.keyset_search_field] if self.keyset_search_field else []
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip().lower()
+        if not term or not self.keyset_search_field:
+            return queryset, False
+        return queryset.annotate(search_key=Lower(self.keyset_search_field)).filter(search_key__startswith=term), False
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            # actions (ie. deleting the selected users) write, so they run as usual on the primary
+            return super().changelist_view(request, extra_context)
+
+        # pick the database (a replica when there are healthy ones - see core/db/router.py)
+            # before the transaction starts, so every query of the page goes to the same one
+        alias = router.db_for_read(self.model)
+        request.admin_read_db = alias
+        connection = connections[alias]
+        try:
+            with transaction.atomic(using=alias):
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL statement_timeout = %s', [
+                            int(settings.ADMIN_CHANGELIST['QUERY_TIMEOUT'] * 1000)
+                        ])
+                response = super().changelist_view(request, extra_context)
+                if hasattr(response, 'render'):
+                    response.render() # inside the time limit too
+        except OperationalError as exc:
+            if getattr(exc.__cause__, 'pgcode', None) != QUERY_CANCELED or not request.GET.get('q'):
+                raise
+            messages.error(request, 'That search took too long - try typing more of it.')
+            return HttpResponseRedirect(request.path)
+        return response
@@ -0,0 +1,117 @@
+"""The stock postgresql backend, with connections borrowed from a per-process pool"""
+# use it by setting ENGINE to 'core.db.backends.postgresql_pool' (see DB_POOL in settings.py)
+    # when django "closes" a connection at the end of a request (CONN_MAX_AGE) it goes back
+    # to the pool instead, so the next request skips the TCP + auth handshake
+import os
+import threading
+
+import psycopg2
+from psycopg2 import extensions
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as BaseDatabaseCreation
+from django.db.backends.base.base import NO_DB_ALIAS
+
+from core.db.pool import ConnectionPool
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def close_pools():
+    """Close the idle connections of every pool in this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def check_connection(conn, idle_for, check_interval=0):
+    """Health check run before a pooled connection is handed out"""
+    # conn.closed only notices sockets psycopg2 closed itself - after a postgres restart or a
+        # failover the socket looks fine until it's used, so by default every hand-out is pinged
+    if conn.closed:
+        return False
+    if idle_for < check_interval:
+        return True # used moments ago & opted out of the round trip (see DB_POOL_CHECK_INTERVAL)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def reset_connection(conn):
+    """Roll back anything left open so the next borrower starts clean"""
+    if conn.closed:
+        return False
+    try:
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # pooled connections to the test db would stop postgres from dropping it
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @property
+    def pool_settings(self):
+        return self.settings_dict.get('POOL', {})
+
+    def get_pool(self, conn_params):
+        """Return this process' pool for these connection params, creating it if needed"""
+        key = tuple(sorted((k, str(v)) for k, v in conn_params.items()))
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                # after a fork we must not touch the parent's sockets; just start over
+                options = self.pool_settings
+                check_interval = options.get('CHECK_INTERVAL', 0)
+                pool = _pools[key] = ConnectionPool(
+                    connect=lambda: psycopg2.connect(**conn_params),
+                    check=lambda conn, idle_for: check_connection(conn, idle_for, check_interval),
+                    reset=reset_connection,
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 30),
+                    max_lifetime=options.get('MAX_LIFETIME'),
+                )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            # short lived maintenance connection (ie. creating the test db); don't pool it
+            return super().get_new_connection(conn_params)
+        self._pool = self.get_pool(conn_params)
+        connection = self._pool.acquire()
+
+        # same as the stock backend does for a brand new connection
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        pool = getattr(self, '_pool', None)
+        if self.connection is None or pool is None:
+            return super()._close()
+        self._pool = None
+        with self.wrap_database_errors:
+            pool.release(self.connection)
@@ -0,0 +1,92 @@
+"""A small thread safe, bounded pool of DB-API connections"""
+# each worker process gets its own pool (see core/db/backends/postgresql_pool), so MAX_SIZE
+    # is the most connections one worker will ever open against postgres
+import os
+import threading
+import time
+
+from django.db.utils import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no connection frees up within the pool's timeout"""
+
+
+class ConnectionPool:
+    """Hands out connections made by connect(), reusing the ones that are given back
+
+    check(conn, idle_for) is called before a pooled connection is handed out again
+    and must return False for a connection that's broken; reset(conn) is called when a
+    connection is given back and must return False if it can't be reused.
+    """
+
+    def __init__(self, connect, check, reset, max_size=10, timeout=30, max_lifetime=None):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime # seconds before a connection is recycled; None == forever
+        self.pid = os.getpid() # pools must never be shared with a forked child
+        self._slots = threading.BoundedSemaphore(max_size) # one slot per open connection
+        self._lock = threading.Lock()
+        self._idle = [] # stack of (conn, returned_at) - LIFO keeps the hottest connections busy
+        self._born = {} # id(conn) -> when it was opened
+
+    def acquire(self):
+        """Return a healthy connection, opening a new one if none are idle"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                'No database connection available after %s seconds (pool size %d)'
+                % (self.timeout, self.max_size)
+            )
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    conn = self.connect()
+                    self._born[id(conn)] = time.monotonic()
+                    return conn
+                conn, returned_at = item
+                if not self._expired(conn) and self.check(conn, time.monotonic() - returned_at):
+                    return conn
+                self._discard(conn) # dead or too old; try the next one
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Give a connection back to the pool (or close it if it can't be reused)"""
+        try:
+            if self._expired(conn) or not self.reset(conn):
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection; connections in use are closed when released"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    def _expired(self, conn):
+        if self.max_lifetime is None:
+            return False
+        born = self._born.get(id(conn))
+        return born is not None and time.monotonic() - born > self.max_lifetime
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass # it's already broken; nothing else to do with it
@@ -0,0 +1,95 @@
+"""Send reads to replicas (settings.DATABASE_REPLICAS) & everything else to the primary"""
+# a read goes to the primary instead when:
+    # - the request already wrote something, or is inside a transaction (read your own writes)
+    # - the client wrote in the last REPLICA_PIN_SECONDS (ReplicaPinMiddleware pins them, so
+        # ie. a tag list right after creating a tag can't come from a replica that's behind)
+    # - every replica is more than REPLICA_MAX_LAG seconds behind, or unreachable
+# replica lag is measured at most once per REPLICA_CHECK_INTERVAL per process
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+state = threading.local() # per request (a request is served start to end by one thread)
+
+
+def reset_state():
+    state.pinned = False # the client wrote recently (set by ReplicaPinMiddleware)
+    state.wrote = False # this request wrote
+
+
+def use_primary():
+    return getattr(state, 'pinned', False) or getattr(state, 'wrote', False)
+
+
+def replication_lag(alias):
+    """Seconds alias is behind its primary (0 for databases that aren't streaming replicas)"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # replay timestamp is the time of the last replayed commit - an idle primary would
+            # look like growing lag, so a replica that has replayed everything it received is 0
+        cursor.execute(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+            'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+        )
+        lag = cursor.fetchone()[0]
+    return float(lag or 0.0)
+
+
+class ReplicaMonitor:
+    """Which replicas are currently within the allowed lag"""
+
+    def __init__(self, check=replication_lag):
+        self.check = check
+        self.checked_at = None
+        self.healthy = []
+        self._lock = threading.Lock()
+
+    def get_healthy(self, replicas):
+        now = time.monotonic()
+        with self._lock:
+            if self.checked_at is not None and now - self.checked_at < settings.REPLICA_CHECK_INTERVAL:
+                return self.healthy
+            self.checked_at = now # other threads keep using the last answer while we check
+
+        healthy = []
+        for alias in replicas:
+            try:
+                lag = self.check(alias)
+            except DatabaseError:
+                continue # down or unreachable
+            if lag <= settings.REPLICA_MAX_LAG:
+                healthy.append(alias)
+        self.healthy = healthy
+        return healthy
+
+
+monitor = ReplicaMonitor()
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or use_primary() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db # related objects come from where their parent did
+        healthy = monitor.get_healthy(replicas)
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True # replicas hold the same data as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS # replicas get the schema through replication
@@ -0,0 +1,159 @@
+"""Answer "is this email already registered?" mostly without touching the database"""
+# emails are unique ignoring case (migration 0005 adds a unique index on LOWER(email)); every
+    # process keeps a Bloom filter (core/bloom.py) of the lower cased emails it knows about:
+        # not in the filter -> definitely free, no query (the common case for a new signup)
+        # in the filter -> probably taken, confirmed with one query on the LOWER(email) index
+# the filter is built from the whole table on a thread of its own - as a worker starts (see
+    # serve), on first use & whenever it fills up - never on a request's thread: until it's ready
+    # the checks just ask the database, so neither a worker's start nor a signup waits on the
+    # scan; it gets the emails this process saves straight away (core/signals.py) & picks up
+    # users other processes created at most once every settings.EMAIL_FILTER['REFRESH'] seconds
+    # (one `WHERE id > last id seen` query, only when it's about to answer "free")
+# emails changed (not created) by another process are only seen after a restart - the unique
+    # index still refuses the duplicate, the signup just fails on the INSERT instead of earlier
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections
+from django.db.models.functions import Lower
+
+from core import metrics
+from core.bloom import BloomFilter
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER = 10 # seconds before a failed background build is tried again
+
+
+def normalize(email):
+    """The form emails are compared in"""
+    return email.strip().lower()
+
+
+def email_exists(email):
+    """Ask the database (uses the LOWER(email) index)"""
+    return get_user_model().objects.annotate(email_lower=Lower('email')).filter(
+        email_lower=normalize(email)
+    ).exists()
+
+
+class EmailIndex:
+
+    def __init__(self, capacity=100000, error_rate=0.01, refresh=1.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh = refresh
+        self.filter = None # built on first use
+        self.last_id = 0 # highest user id the filter has seen
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock() # one thread (re)builds / catches up at a time
+        self._builder = None # the thread of the last start_build()
+        self._retry_at = 0.0 # no new build before this (time.monotonic()) after one failed
+        self._builder_lock = threading.Lock()
+
+    @property
+    def needs_build(self):
+        return self.filter is None or self.filter.full
+
+    def build(self, force=False):
+        """(Re)build the filter from every user in the table - unless it's fine (or force)
+
+        Returns the number of emails in the filter.
+        """
+        User = get_user_model()
+        with self._lock:
+            # the threads that queued on the lock behind a build find it done - one scan, not one each
+            if not (force or self.needs_build):
+                return self.filter.count
+            total = User.objects.count()
+            # room to grow, so the filter doesn't fill up (& get rebuilt) straight away
+            bloom = BloomFilter(max(self.capacity, 2 * total), self.error_rate)
+            last_id = 0
+            for pk, email in User.objects.order_by().values_list('pk', 'email').iterator():
+                bloom.add(normalize(email))
+                last_id = max(last_id, pk)
+            self.filter, self.last_id = bloom, last_id
+            self.refreshed_at = time.monotonic()
+        return bloom.count
+
+    def start_build(self):
+        """Run build() on a thread of its own (unless one is running already); returns the thread"""
+        with self._builder_lock:
+            running = self._builder is not None and self._builder.is_alive()
+            if not running and time.monotonic() >= self._retry_at:
+                self._builder = threading.Thread(target=self._build_thread, name='email-index-build', daemon=True)
+                self._builder.start()
+            return self._builder
+
+    def _build_thread(self):
+        try:
+            self.build()
+        except DatabaseError:
+            # the checks keep asking the database meanwhile
+            logger.exception('Building the email filter failed; will retry in %d seconds', RETRY_AFTER)
+            self._retry_at = time.monotonic() + RETRY_AFTER
+        finally:
+            connections.close_all() # the connections of this thread - it's about to end
+
+    def catch_up(self):
+        """Add the users created (ie. by other processes) since we last looked"""
+        with self._lock:
+            rows = get_user_model().objects.filter(pk__gt=self.last_id).order_by().values_list('pk', 'email')
+            for pk, email in rows.iterator():
+                self.filter.add(normalize(email))
+                self.last_id = max(self.last_id, pk)
+            self.refreshed_at = time.monotonic()
+
+    def add(self, email):
+        if self.filter is not None:
+            self.filter.add(normalize(email))
+
+    def might_exist(self, email):
+        """False: the email is definitely free; True: it probably isn't"""
+        if self.needs_build:
+            self.start_build()
+            if self.filter is None:
+                return True # not built yet - let the database answer meanwhile
+            # a full filter still answers correctly until the bigger one replaces it (only with
+                # more false positives)
+        key = normalize(email)
+        if key in self.filter:
+            return True
+        if time.monotonic() - self.refreshed_at >= self.refresh:
+            self.catch_up()
+            return key in self.filter
+        return False
+
+    def is_taken(self, email):
+        if not self.might_exist(email):
+            metrics.email_checks_total.inc('filter_free')
+            return False
+        taken = email_exists(email)
+        metrics.email_checks_total.inc('db_taken' if taken else 'db_free') # db_free: a false positive
+        return taken
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_email_index():
+    """The process wide email index, built from settings.EMAIL_FILTER"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                config = settings.EMAIL_FILTER
+                _index = EmailIndex(config['CAPACITY'], config['ERROR_RATE'], config['REFRESH'])
+    return _index
+
+
+def is_email_taken(email):
+    """Whether a user already has this email (in any letter case)"""
+    if not settings.EMAIL_FILTER['ENABLED']:
+        return email_exists(email)
+    return get_email_index().is_taken(email)
@@ -0,0 +1,75 @@
+"""Password hashers with tunable cost & a bounded pool to run hashing on"""
+# hashing a password is deliberately slow, and at signup/login it's most of the request's CPU
+    # - the hashers below read their cost from settings so each deployment can pick its own
+        # trade off (see PASSWORD_HASHER & friends in settings.py); hashes made with an older
+        # cost are upgraded the next time the user logs in (User.check_password)
+    # - hash_password/verify_password run on a small, fixed size thread pool, so no matter how
+        # many signups arrive at once only PASSWORD_HASHING_WORKERS cores are busy hashing and
+        # the rest of the requests keep being served (argon2 & hashlib release the GIL)
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count from settings.PASSWORD_PBKDF2_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Memory-hard argon2 with its costs from settings.PASSWORD_ARGON2 (needs argon2-cffi)"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2.get('TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        # in KiB
+        return settings.PASSWORD_ARGON2.get('MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2.get('PARALLELISM', hashers.Argon2PasswordHasher.parallelism)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process wide hashing pool, or None when hashing runs inline (0 workers)"""
+    global _executor
+    workers = settings.PASSWORD_HASHING_WORKERS
+    if not workers:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+    return _executor
+
+
+def run_hashing(func, *args):
+    """Run func(*args) on the hashing pool & wait for the result"""
+    executor = get_executor()
+    if executor is None:
+        return func(*args)
+    return executor.submit(func, *args).result()
+
+
+def hash_password(raw_password):
+    """make_password() on the hashing pool"""
+    return run_hashing(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """Return (is it correct?, does the hash need upgrading?) - checked on the hashing pool"""
+    outdated = []
+    correct = run_hashing(hashers.check_password, raw_password, encoded, outdated.append)
+    # check_password only calls the setter for a correct password whose hash is outdated
+    return correct, bool(outdated)
@@ -0,0 +1,138 @@
+"""Write-behind buffer for User.last_login"""
+# django's update_last_login saves the user (one UPDATE) on every single login; with
+    # settings.LAST_LOGIN['BUFFERED'] on, core/apps.py swaps it for record_login, which only
+    # sets the attribute & remembers (user id -> latest login time) in this process:
+        # - a background thread writes everything remembered every FLUSH_INTERVAL seconds as
+            # one UPDATE ... SET last_login = CASE id WHEN ... END per batch of users
+        # - a user logging in 50 times between flushes is still one row in that UPDATE
+        # - MAX_SIZE users waiting -> the login that fills it up flushes right away, so the
+            # buffer can't grow without bound
+        # - whatever's left is written when the process exits (atexit)
+    # last_login can lag up to FLUSH_INTERVAL seconds & a process killed with SIGKILL loses its
+        # unwritten logins - deployments that can't accept that set LAST_LOGIN_BUFFERED=0
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+
+    batch_size = 500 # users per UPDATE (keeps the CASE & the IN list a sensible size)
+
+    def __init__(self, flush_interval=5.0, max_size=10000):
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.pending = {} # user id -> latest login time not written yet
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # one flush at a time
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, user_id, when):
+        with self._lock:
+            if when >= self.pending.get(user_id, when):
+                self.pending[user_id] = when
+            full = len(self.pending) >= self.max_size
+        if full:
+            self.flush() # in this request's thread - backpressure rather than unbounded memory
+        else:
+            self.start()
+
+    def start(self):
+        """Start the flushing thread (again, in a forked child) if it isn't running"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            # started lazily from the first login, so a pre-forking server gets one per worker
+                # (threads don't survive a fork)
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='last-login-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the thread & write what's left (registered with atexit)"""
+        self._stop.set()
+        self.flush()
+
+    def flush(self):
+        """Write every pending login; returns how many users were updated"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self.pending = self.pending, {}
+            if not pending:
+                return 0
+            items = sorted(pending.items())
+            try:
+                for start in range(0, len(items), self.batch_size):
+                    self.write(items[start:start + self.batch_size])
+            except DatabaseError:
+                logger.exception('Writing last_login for %d users failed; will retry', len(pending))
+                self.restore(pending)
+                return 0
+            finally:
+                if threading.current_thread() is self._thread:
+                    # the flushing thread isn't a request, so nothing else returns its
+                        # connection (to the pool, when DB_POOL is on) or closes it
+                    connections[DEFAULT_DB_ALIAS].close()
+            return len(items)
+
+    def write(self, items):
+        User = get_user_model()
+        User.objects.filter(pk__in=[user_id for user_id, _ in items]).update(last_login=Case(
+            *(When(pk=user_id, then=Value(when)) for user_id, when in items),
+            output_field=DateTimeField(),
+        ))
+
+    def restore(self, pending):
+        """Put logins from a failed flush back, unless the user has logged in again since"""
+        with self._lock:
+            for user_id, when in pending.items():
+                self.pending.setdefault(user_id, when)
+
+    def __len__(self):
+        return len(self.pending)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_last_login_buffer():
+    """The process wide buffer, built from settings.LAST_LOGIN on first use"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = settings.LAST_LOGIN
+                _buffer = LastLoginBuffer(config['FLUSH_INTERVAL'], config['MAX_SIZE'])
+                atexit.register(_buffer.stop)
+    return _buffer
+
+
+def record_login(sender, user, **kwargs):
+    """user_logged_in receiver - like django's update_last_login, minus the synchronous UPDATE"""
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        # a login inside a transaction (ie. ATOMIC_REQUESTS, or a test) is written right away,
+            # so it's rolled back along with everything else instead of escaping to the buffer
+        return update_last_login(sender, user, **kwargs)
+    user.last_login = timezone.now()
+    get_last_login_buffer().record(user.pk, user.last_login)
@@ -0,0 +1,283 @@
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Ingredient, Tag
+from core.queries import capture_queries
+from core.stats import summarize
+
+
+EMAIL = 'bench-%d@bench.invalid' # seeded users are recognised (& cleaned up) by this domain
+PASSWORD = 'benchpass'
+
+
+def server_name():
+    """A host name settings.ALLOWED_HOSTS accepts"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost' # what django allows with DEBUG on & no ALLOWED_HOSTS
+
+
+def call(application, method, path, body=None, token=None, headers=None):
+    """Send one request straight into the WSGI app; returns (status code, response headers)"""
+    path, _, query = path.partition('?')
+    body = json.dumps(body).encode() if body is not None else b''
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': server_name(),
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = 'Token %s' % token
+    environ.update(headers or {})
+
+    started = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = dict(response_headers)
+
+    result = application(environ, start_response)
+    try:
+        for _ in result: # drain the body like a server would
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started['status'], started['headers']
+
+
+class Command(BaseCommand):
+    """Seed data & time the API hot paths through the WSGI app, in process"""
+    # ie. python manage.py bench_api --users 200 --requests 1000 --output after.json --baseline before.json
+    # every scenario is timed on its own (after a few warm up requests) & reports:
+        # throughput + latency percentiles, SQL queries per request and - from a separate,
+        # smaller pass with tracemalloc on - the peak memory allocated per request
+    # the same --seed seeds the same data & sends the same requests, so runs are comparable;
+        # run it with DEBUG off (DEBUG keeps a log of every query, which skews the numbers)
+    # throttles (core/throttling.py) are off while it runs - one client sending hundreds of
+        # signups would otherwise just be timing 429s - unless --throttle
+    # writes to the configured database - seeded users are deleted again unless --keep
+
+    help = 'Benchmark user creation, token auth and the tag/ingredient endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--tags', type=int, default=20, help='tags per user')
+        parser.add_argument('--ingredients', type=int, default=50, help='ingredients per user')
+        parser.add_argument('--requests', type=int, default=500, help='timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=50, help='untimed requests before each scenario')
+        parser.add_argument('--alloc-requests', type=int, default=50, help='requests traced for allocations')
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='only run these (repeatable)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='write the results to this JSON file')
+        parser.add_argument('--baseline', help='JSON file of an earlier run to compare against')
+        parser.add_argument('--max-regression', type=float, help='fail if a p50 got this many percent slower')
+        parser.add_argument('--throttle', action='store_true', help='keep the rate limits on')
+        parser.add_argument('--keep', action='store_true', help="don't delete the seeded data afterwards")
+
+    def handle(self, *args, **options):
+        from app.wsgi import application
+
+        scenarios = self.scenarios()
+        selected = options['scenarios'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError('Unknown scenario(s): %s (choose from %s)' % (
+                ', '.join(sorted(unknown)), ', '.join(scenarios)
+            ))
+
+        self.random = random.Random(options['seed'])
+        self.delete_seeded()
+        throttles = settings.REST_FRAMEWORK if options['throttle'] else dict(
+            settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={}
+        )
+        try:
+            self.tokens = self.seed(options)
+            results = {}
+            with override_settings(REST_FRAMEWORK=throttles):
+                for name in selected:
+                    results[name] = self.run(application, scenarios[name], options)
+                    self.report(name, results[name])
+        finally:
+            if not options['keep']:
+                self.delete_seeded()
+
+        run = {
+            'meta': {
+                'date': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'options': {key: options[key] for key in (
+                    'users', 'tags', 'ingredients', 'requests', 'warmup', 'alloc_requests', 'seed'
+                )},
+            },
+            'scenarios': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(run, f, indent=2, sort_keys=True)
+            self.stdout.write('Results written to %s' % options['output'])
+        if options['baseline']:
+            self.compare(run, options['baseline'], options['max_regression'])
+
+    def scenarios(self):
+        """name -> function(application, i) sending the i-th request of the scenario"""
+        create_user_url = reverse('user:create')
+        tags_url = reverse('recipe:tag-list')
+        ingredients_url = reverse('recipe:ingredient-list')
+        etags = {}
+
+        def user_create(application, i):
+            email = 'bench-new-%d-%d@bench.invalid' % (self.run_id, i)
+            return call(application, 'POST', create_user_url, {'email': email, 'password': PASSWORD, 'name': 'Bench'})
+
+        def token_auth(application, i):
+            # a conditional GET that comes back 304 is mostly authentication + the version lookup
+            token = self.token(i)
+            if token not in etags:
+                etags[token] = call(application, 'GET', tags_url, token=token)[1].get('ETag', '')
+            return call(application, 'GET', tags_url, token=token, headers={'HTTP_IF_NONE_MATCH': etags[token]})
+
+        def tag_list(application, i):
+            return call(application, 'GET', tags_url, token=self.token(i))
+
+        def ingredient_list(application, i):
+            return call(application, 'GET', ingredients_url, token=self.token(i))
+
+        def tag_create(application, i):
+            return call(application, 'POST', tags_url, {'name': 'New tag %d-%d' % (self.run_id, i)}, self.token(i))
+
+        def ingredient_create(application, i):
+            return call(application, 'POST', ingredients_url, {'name': 'New ingredient %d-%d' % (self.run_id, i)}, self.token(i))
+
+        return {
+            'user_create': user_create,
+            'token_auth': token_auth,
+            'tag_list': tag_list,
+            'ingredient_list': ingredient_list,
+            'tag_create': tag_create,
+            'ingredient_create': ingredient_create,
+        }
+
+    def token(self, i):
+        return self.tokens[i % len(self.tokens)] # requests go round robin over the seeded users
+
+    def seed(self, options):
+        """Bulk insert the users (with tokens), tags & ingredients; returns the token keys"""
+        self.stdout.write('Seeding %d users...' % options['users'])
+        User = get_user_model()
+        password = make_password(PASSWORD) # hashing once keeps seeding fast
+        User.objects.bulk_create(
+            User(email=EMAIL % i, name='Bench %d' % i, password=password) for i in range(options['users'])
+        )
+        users = list(User.objects.filter(email__endswith='@bench.invalid').order_by('email'))
+        tokens = [Token(user=user, key=Token().generate_key()) for user in users]
+        Token.objects.bulk_create(tokens)
+        # random but distinct names per user - (user, name) is unique
+        Tag.objects.bulk_create(
+            Tag(user=user, name='Tag %d' % n)
+            for user in users for n in self.random.sample(range(10 * options['tags'] + 1), options['tags'])
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name='Ingredient %d' % n)
+            for user in users for n in self.random.sample(range(10 * options['ingredients'] + 1), options['ingredients'])
+        )
+        return [token.key for token in tokens]
+
+    def delete_seeded(self):
+        # tokens, tags & ingredients go with their users (on_delete=CASCADE)
+        get_user_model().objects.filter(email__endswith='@bench.invalid').delete()
+
+    def run(self, application, scenario, options):
+        self.run_id = self.random.randrange(10 ** 9) # keeps created names & emails unique
+        for i in range(options['warmup']):
+            scenario(application, -1 - i)
+
+        latencies = []
+        errors = 0
+        with capture_queries() as queries:
+            start = time.perf_counter()
+            for i in range(options['requests']):
+                begin = time.perf_counter()
+                status, _ = scenario(application, i)
+                latencies.append(time.perf_counter() - begin)
+                errors += status >= 400
+            elapsed = time.perf_counter() - start
+
+        peaks = []
+        for i in range(options['alloc_requests']):
+            tracemalloc.start()
+            scenario(application, options['requests'] + i)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        stats = summarize(latencies, elapsed)
+        stats['errors'] = errors
+        stats['queries_per_request'] = len(queries) / options['requests'] if options['requests'] else 0.0
+        stats['alloc_peak_kb'] = sum(peaks) / len(peaks) / 1024 if peaks else 0.0
+        return stats
+
+    def report(self, name, stats):
+        self.stdout.write(
+            '%-18s %8.1f req/s  p50 %7.2f ms  p90 %7.2f ms  p99 %7.2f ms  %5.2f queries  %8.1f KiB  %d errors' % (
+                name, stats['throughput'], stats['p50_ms'], stats['p90_ms'], stats['p99_ms'],
+                stats['queries_per_request'], stats['alloc_peak_kb'], stats['errors'],
+            )
+        )
+
+    def compare(self, run, path, max_regression):
+        with open(path) as f:
+            baseline = json.load(f)
+
+        self.stdout.write('\nChange against %s:' % path)
+        regressions = []
+        for name, stats in run['scenarios'].items():
+            before = baseline['scenarios'].get(name)
+            if not before:
+                continue
+            changes = {
+                key: (stats[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                for key in ('throughput', 'p50_ms', 'p99_ms', 'queries_per_request', 'alloc_peak_kb')
+            }
+            self.stdout.write(
+                '%-18s throughput %+6.1f%%  p50 %+6.1f%%  p99 %+6.1f%%  queries %+6.1f%%  alloc %+6.1f%%' % (
+                    name, changes['throughput'], changes['p50_ms'], changes['p99_ms'],
+                    changes['queries_per_request'], changes['alloc_peak_kb'],
+                )
+            )
+            if max_regression is not None and changes['p50_ms'] > max_regression:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError('p50 regressed by more than %s%%: %s' % (max_regression, ', '.join(regressions)))
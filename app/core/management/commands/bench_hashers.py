@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+class Command(BaseCommand):
+    """How many signups per second one core can hash at each cost setting"""
+    # hashing dominates signup time, so hashes/sec on one thread ~= signups/sec per core
+    # ie. python manage.py bench_hashers --pbkdf2-iterations 60000,120000 --argon2-time-costs 1,2,3
+
+    help = 'Benchmark password hashing cost settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help='time spent on each setting')
+        parser.add_argument('--pbkdf2-iterations', type=int_list, default=[20000, 60000, 120000])
+        parser.add_argument('--argon2-time-costs', type=int_list, default=[1, 2, 4])
+        parser.add_argument('--argon2-memory-cost', type=int, default=512, help='KiB')
+        parser.add_argument('--argon2-parallelism', type=int, default=1)
+
+    def handle(self, *args, **options):
+        for iterations in options['pbkdf2_iterations']:
+            with override_settings(
+                PASSWORD_HASHERS=['core.hashers.PBKDF2PasswordHasher'],
+                PASSWORD_PBKDF2_ITERATIONS=iterations,
+            ):
+                self.report('pbkdf2 iterations=%d' % iterations, options['seconds'])
+
+        try:
+            import argon2  # noqa: F401
+        except ImportError:
+            self.stdout.write('argon2    skipped (pip install argon2-cffi)')
+            return
+        for time_cost in options['argon2_time_costs']:
+            costs = {
+                'TIME_COST': time_cost,
+                'MEMORY_COST': options['argon2_memory_cost'],
+                'PARALLELISM': options['argon2_parallelism'],
+            }
+            with override_settings(
+                PASSWORD_HASHERS=['core.hashers.Argon2PasswordHasher'],
+                PASSWORD_ARGON2=costs,
+            ):
+                self.report(
+                    'argon2 t=%d m=%dKiB p=%d' % (time_cost, costs['MEMORY_COST'], costs['PARALLELISM']),
+                    options['seconds'],
+                )
+
+    def report(self, label, seconds):
+        make_password('warm-up') # loads the hasher (& library) outside the timing
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            make_password('correct horse battery staple')
+            count += 1
+        elapsed = time.perf_counter() - start
+        self.stdout.write('%-32s %8.1f signups/sec/core  %6.2f ms/hash' % (
+            label, count / elapsed, elapsed / count * 1000
+        ))
@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.models import Ingredient
+from core.renderers import JSONRenderer
+from recipe.serializers import IngredientSerializer, read_fields
+
+
+EMAIL = 'bench-serialization@bench.invalid'
+
+
+class Command(BaseCommand):
+    """Rows/sec for listing ingredients through the serializer vs the .values() read path"""
+    # ie. python manage.py bench_list_serialization --rows 10000
+    # both paths fetch the same rows from the db, turn them into dicts & render them to JSON;
+        # the seeded user (and their ingredients) is deleted afterwards
+
+    help = 'Benchmark the ModelSerializer list path against the values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='runs per path; the best one counts')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        User.objects.filter(email=EMAIL).delete()
+        user = User.objects.create_user(EMAIL)
+        try:
+            Ingredient.objects.bulk_create(
+                Ingredient(user=user, name='Ingredient %d' % i) for i in range(options['rows'])
+            )
+            queryset = Ingredient.objects.filter(user=user).order_by('-name')
+            fields = read_fields(IngredientSerializer)
+            renderer = JSONRenderer()
+
+            paths = (
+                ('serializer', lambda: IngredientSerializer(queryset, many=True).data),
+                ('values', lambda: list(queryset.values(*fields))),
+            )
+            results = {}
+            for label, build in paths:
+                results[label] = self.best(build, renderer, options['repeat'])
+                serialize, total = results[label]
+                self.stdout.write('%-10s %10.0f rows/s serialized  %10.0f rows/s with rendering' % (
+                    label, options['rows'] / serialize, options['rows'] / total
+                ))
+            self.stdout.write('values() is %.1fx faster end to end' % (results['serializer'][1] / results['values'][1]))
+        finally:
+            user.delete()
+
+    def best(self, build, renderer, repeat):
+        """Fastest (fetch + serialize, fetch + serialize + render) seconds out of repeat runs"""
+        serialize = total = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = build()
+            built = time.perf_counter()
+            renderer.render({'next': None, 'previous': None, 'results': data})
+            end = time.perf_counter()
+            serialize = min(serialize, built - start)
+            total = min(total, end - start)
+        return serialize, total
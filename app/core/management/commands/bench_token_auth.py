@@ -0,0 +1,47 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.authentication import CachedTokenAuthentication, get_token_cache
+
+
+class Command(BaseCommand):
+    """Compare queries & time per request for stock vs cached token auth"""
+    # ie. python manage.py bench_token_auth --email test@javid.com --requests 5000
+
+    help = 'Benchmark TokenAuthentication against CachedTokenAuthentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', required=True, help='user whose token is used (created if missing)')
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = User.objects.filter(email=options['email']).first()
+        if user is None:
+            user = User.objects.create_user(options['email']) # no password - only its token is used
+            self.stdout.write('Created user %s' % user.email)
+        token, _ = Token.objects.get_or_create(user=user)
+        get_token_cache().clear()
+
+        for label, auth in (('stock', TokenAuthentication()), ('cached', CachedTokenAuthentication())):
+            queries, seconds = self.run(auth, token.key, options['requests'])
+            self.stdout.write(
+                '%-7s %.3f queries/request  %.1f us/request' % (
+                    label, queries / options['requests'], seconds / options['requests'] * 1e6
+                )
+            )
+
+    def run(self, auth, key, requests):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for _ in range(requests):
+                auth.authenticate_credentials(key)
+            elapsed = time.perf_counter() - start
+        return len(ctx.captured_queries), elapsed
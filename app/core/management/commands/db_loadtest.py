@@ -0,0 +1,61 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.stats import summarize
+
+
+class Command(BaseCommand):
+    """Measure connection + query latency under concurrency"""
+    # each simulated request opens (or borrows) a connection, runs a tiny query & then
+    # does what django does at the end of a request - closes (or returns) the connection
+    # run it against the postgres container with & without pooling to compare:
+        # docker-compose run -e DB_POOL=0 app sh -c "python manage.py db_loadtest"
+        # docker-compose run -e DB_POOL=1 app sh -c "python manage.py db_loadtest"
+
+    help = 'Load test database connection handling with concurrent simulated requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16, help='number of threads')
+        parser.add_argument('--requests', type=int, default=100, help='requests per thread')
+        parser.add_argument('--query', default='SELECT 1')
+
+    def handle(self, *args, **options):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            mine = []
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(options['query'])
+                        cursor.fetchall()
+                except Exception as exc:
+                    errors.append(exc)
+                finally:
+                    connection.close_if_unusable_or_obsolete() # request_finished does this
+                mine.append(time.perf_counter() - start)
+            connection.close()
+            with lock:
+                latencies.extend(mine)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        stats = summarize(latencies, elapsed)
+        self.stdout.write('engine      %s' % connection.settings_dict['ENGINE'])
+        self.stdout.write('concurrency %d' % options['concurrency'])
+        self.stdout.write('requests    %d (%d errors)' % (stats['count'], len(errors)))
+        self.stdout.write('throughput  %.1f req/s' % stats['throughput'])
+        self.stdout.write('p50         %.2f ms' % stats['p50_ms'])
+        self.stdout.write('p99         %.2f ms' % stats['p99_ms'])
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.stats import summarize
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, headers)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2) # chunk + CRLF
+            if size == 0:
+                break
+    elif status != 304 and 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    return status, headers
+
+
+class Command(BaseCommand):
+    """Hammer a running server with many concurrent keep-alive connections"""
+    # compare the two serving modes on the same machine & data:
+        # python manage.py serve --workers 2 --threads 8     (WSGI, gthread)
+        # python manage.py serve --workers 2 --asgi          (ASGI, uvicorn)
+        # python manage.py http_loadtest --url http://127.0.0.1:8000/api/recipe/tags/ \
+        #     --token <key> --connections 500 --idle 2000
+    # --connections clients each send --requests requests back to back on one connection,
+        # while --idle more connections are opened first & just held open (like idle browsers
+        # / mobile clients with keep-alive) - a gthread worker holds at most worker_connections
+        # (1000) connections & needs a thread per request in flight, so it stalls once the
+        # idle ones fill it up; the ASGI mode keeps serving
+    # --conditional sends If-None-Match with the ETag from the first response (the 304 path)
+
+    help = 'Load test a running server with concurrent keep-alive HTTP connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/recipe/tags/')
+        parser.add_argument('--token', help='auth token key sent as "Authorization: Token <key>"')
+        parser.add_argument('--connections', type=int, default=100, help='concurrent active connections')
+        parser.add_argument('--requests', type=int, default=50, help='requests per active connection')
+        parser.add_argument('--idle', type=int, default=0, help='extra connections held open without requests')
+        parser.add_argument('--conditional', action='store_true')
+        parser.add_argument('--timeout', type=float, default=30.0, help='seconds per request')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Only http:// urls are supported')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.path = (url.path or '/') + ('?' + url.query if url.query else '')
+        self.options = options
+
+        loop = asyncio.get_event_loop()
+        latencies, errors, idle_open, elapsed = loop.run_until_complete(self.run())
+
+        stats = summarize(latencies, elapsed)
+        self.stdout.write('url          %s' % options['url'])
+        self.stdout.write('idle conns   %d held open (%d asked for)' % (idle_open, options['idle']))
+        self.stdout.write('active conns %d' % options['connections'])
+        self.stdout.write('requests     %d (%d errors)' % (stats['count'], errors))
+        self.stdout.write('throughput   %.1f req/s' % stats['throughput'])
+        self.stdout.write('p50          %.2f ms' % stats['p50_ms'])
+        self.stdout.write('p90          %.2f ms' % stats['p90_ms'])
+        self.stdout.write('p99          %.2f ms' % stats['p99_ms'])
+        self.stdout.write('max          %.2f ms' % stats['max_ms'])
+
+    def request_bytes(self, etag=None):
+        lines = ['GET %s HTTP/1.1' % self.path, 'Host: %s:%d' % (self.host, self.port), 'Accept: application/json']
+        if self.options['token']:
+            lines.append('Authorization: Token %s' % self.options['token'])
+        if etag:
+            lines.append('If-None-Match: %s' % etag)
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def run(self):
+        idle = []
+        for _ in range(self.options['idle']):
+            try:
+                idle.append(await asyncio.open_connection(self.host, self.port))
+            except OSError:
+                break # out of file descriptors / refused - report how many we got
+
+        latencies = []
+        errors = [0]
+        start = time.perf_counter()
+        await asyncio.gather(*(self.client(latencies, errors) for _ in range(self.options['connections'])))
+        elapsed = time.perf_counter() - start
+
+        for _, writer in idle:
+            writer.close()
+        return latencies, errors[0], len(idle), elapsed
+
+    async def client(self, latencies, errors):
+        connection = None
+        etag = None
+        for _ in range(self.options['requests']):
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(self.host, self.port)
+                reader, writer = connection
+                begin = time.perf_counter()
+                writer.write(self.request_bytes(etag))
+                status, headers = await asyncio.wait_for(read_response(reader), self.options['timeout'])
+            except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                # ie. the server recycled a worker (--max-requests) - count it & reconnect, like a browser
+                errors[0] += 1
+                if connection is not None:
+                    connection[1].close()
+                    connection = None
+                continue
+            latencies.append(time.perf_counter() - begin)
+            if status >= 400:
+                errors[0] += 1
+            if self.options['conditional']:
+                etag = headers.get('etag', etag)
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
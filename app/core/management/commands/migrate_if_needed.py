@@ -0,0 +1,98 @@
+import hashlib
+import pkgutil
+import time
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+
+# the postgres advisory lock every replica queues on while one of them migrates
+    # (any bigint - this one is the first 8 bytes of sha256(b'migrate_if_needed'))
+LOCK_ID = int.from_bytes(hashlib.sha256(b'migrate_if_needed').digest()[:8], 'big', signed=True)
+
+
+def disk_migrations():
+    """{(app label, migration name)} of every migration file, found without importing any of them"""
+    # the same files django's MigrationLoader finds - but listed, not imported & built into a graph
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue # MIGRATION_MODULES = {'app': None} turns an app's migrations off
+        try:
+            spec = find_spec(module_name)
+        except ImportError:
+            spec = None
+        if spec is None or not spec.submodule_search_locations:
+            continue # an app without migrations
+        for _, name, is_pkg in pkgutil.iter_modules(spec.submodule_search_locations):
+            if not is_pkg and name[0] not in '_~':
+                found.add((app_config.label, name))
+    return found
+
+
+def pending_migrations(connection, migrations):
+    """The migrations not recorded as applied in the database (one query; all of them on an empty db)"""
+    return migrations - set(MigrationRecorder(connection).applied_migrations())
+
+
+class Command(BaseCommand):
+    """migrate - but only when there's something to apply, & one replica at a time"""
+    # runs on every container boot (see docker-compose.yaml); plain migrate loads & imports every
+        # migration of every app to build the graph before it finds out there's nothing to do, &
+        # a fleet of replicas booting together all race to apply the same new migrations
+    # instead:
+        # - the set of migration files on disk (listed, not imported) is compared with the
+            # django_migrations table - nothing pending -> exit straight away (one query; the
+            # table itself is the record of what's applied, there's nothing else to keep in sync)
+        # - something pending -> on postgres, wait on an advisory lock (pg_advisory_lock blocks
+            # in the server, no polling), look again & only migrate if it's still pending -
+            # the replicas that waited find the first one already did it
+    # migrations that were removed from disk but are still recorded don't count as pending
+
+    help = 'Apply migrations only if some are pending, one replica at a time'
+    # the system checks import every URLconf & view - not worth it for a no-op; migrate itself
+        # still runs them when there's something to apply
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='database to migrate')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        migrations = disk_migrations()
+
+        if not pending_migrations(connection, migrations):
+            self.stdout.write('%d migrations, all applied - up to date.' % len(migrations))
+            return
+
+        if connection.vendor != 'postgresql':
+            self.migrate(options)
+            return
+
+        start = time.monotonic()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [LOCK_ID])
+        try:
+            waited = time.monotonic() - start
+            if waited > 1:
+                self.stdout.write('Waited %.1f seconds for another replica to migrate.' % waited)
+            if not pending_migrations(connection, migrations):
+                self.stdout.write('The pending migrations were applied by another replica.')
+                return
+            self.migrate(options)
+        finally:
+            # session level lock - released explicitly (or when the connection closes)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_ID])
+
+    def migrate(self, options):
+        call_command(
+            'migrate', database=options['database'], interactive=False, skip_checks=False,
+            verbosity=options['verbosity'], stdout=self.stdout,
+        )
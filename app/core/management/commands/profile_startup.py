@@ -0,0 +1,97 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import parse_importtime
+
+
+class Command(BaseCommand):
+    """Where a cold start of a worker spends its time - phases, apps & module imports"""
+    # every run is a brand new interpreter (python -X importtime -m core.startup) with the
+        # settings this command was given, so nothing is imported or cached up front
+    # ie. compare the full & the lean API-only profile:
+        # python manage.py profile_startup
+        # python manage.py profile_startup --settings app.settings_api
+    # -X importtime adds some overhead of its own, so compare runs with each other rather than
+        # with a server's real startup time
+
+    help = 'Profile a cold start: time per phase, per app & per imported module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='medians of this many fresh processes')
+        parser.add_argument('--top', type=int, default=15, help='how many modules/packages to list')
+
+    def handle(self, *args, **options):
+        runs = [self.run() for _ in range(max(1, options['runs']))]
+        results = [result for result, _, _ in runs]
+
+        self.stdout.write('Cold start of %s (median of %d runs, %d modules imported)' % (
+            settings.SETTINGS_MODULE, len(runs), results[0]['modules']
+        ))
+        self.stdout.write('%-28s %10.1f ms' % ('process (wall clock)', median(wall for _, _, wall in runs)))
+        phases = defaultdict(list)
+        for result in results:
+            for name, seconds in result['phases']:
+                phases[name].append(seconds)
+        for name, seconds in phases.items():
+            self.stdout.write('  %-26s %10.1f ms' % (name, median(seconds)))
+
+        self.stdout.write('\n%-28s %10s %10s %10s' % ('app', 'import', 'models', 'ready'))
+        for label in results[0]['apps']:
+            self.stdout.write('%-28s %10.1f %10.1f %10.1f' % ((label,) + tuple(
+                median(result['apps'][label].get(step, 0) for result in results)
+                for step in ('import', 'models', 'ready')
+            )))
+
+        # per module: the median of its self & cumulative (it + what it imported) times
+        self_times, cumulative_times = defaultdict(list), defaultdict(list)
+        for _, imports, _ in runs:
+            for module, own, cumulative in imports:
+                self_times[module].append(own)
+                cumulative_times[module].append(cumulative)
+        self.stdout.write('\n%-60s %10s %10s' % ('slowest imports', 'self ms', 'total ms'))
+        slowest = sorted(cumulative_times, key=lambda module: -median(cumulative_times[module]))
+        for module in slowest[:options['top']]:
+            self.stdout.write('%-60s %10.1f %10.1f' % (
+                module, median(self_times[module]), median(cumulative_times[module])
+            ))
+
+        # per top level package: the sum of its modules' self times
+        packages = defaultdict(float)
+        for module, times in self_times.items():
+            packages[module.split('.')[0]] += median(times)
+        self.stdout.write('\n%-60s %10s' % ('imports by package', 'ms'))
+        for package in sorted(packages, key=lambda package: -packages[package])[:options['top']]:
+            self.stdout.write('%-60s %10.1f' % (package, packages[package]))
+
+    def run(self):
+        """(phase & app timings, module import times, wall clock ms) of one fresh process"""
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-m', 'core.startup'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        wall = (time.perf_counter() - start) * 1000
+        if process.returncode:
+            raise CommandError('Starting up failed:\n%s' % process.stderr[-2000:])
+        result = json.loads(process.stdout)
+        result['phases'] = [(name, seconds * 1000) for name, seconds in result['phases']]
+        result['apps'] = {
+            label: {step: seconds * 1000 for step, seconds in steps.items()}
+            for label, steps in result['apps'].items()
+        }
+        imports = [(module, own * 1000, cumulative * 1000) for module, own, cumulative in parse_importtime(process.stderr)]
+        return result, imports, wall
+
+
+def median(values):
+    return statistics.median(list(values))
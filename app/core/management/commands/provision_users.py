@@ -0,0 +1,124 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Lower
+
+from core.emails import normalize
+
+
+def init_worker():
+    # a spawned (not forked) worker process starts without django set up
+    django.setup()
+
+
+def read_rows(path, fmt):
+    """Yield one dict per user from a CSV (with a header row) or JSON lines file"""
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    """Create users in bulk from a CSV or JSON lines file"""
+    # every row needs an email & may have a name & password (no password == unusable password)
+    # ie. python manage.py provision_users users.csv --batch-size 2000 --processes 8
+    # - passwords are hashed in parallel on a pool of processes, then each batch is saved with
+        # one bulk INSERT in its own transaction
+    # - emails that already exist (or repeat in the file), ignoring case, are skipped, and the number of rows
+        # done is saved to a checkpoint file after every batch - rerunning the same command
+        # after a failure picks up from the last saved batch
+
+    help = 'Bulk create users from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--checkpoint', help='default: <path>.checkpoint')
+        parser.add_argument('--restart', action='store_true', help='ignore the checkpoint & start from the top')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError('%s does not exist' % path)
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        checkpoint = options['checkpoint'] or path + '.checkpoint'
+
+        done = 0 if options['restart'] else self.read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write('Resuming after row %d' % done)
+
+        rows = islice(read_rows(path, fmt), done, None)
+        created = skipped = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(options['processes'], initializer=init_worker) as pool:
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                new, skip = self.save_batch(batch, pool, options['processes'])
+                created += new
+                skipped += skip
+                done += len(batch)
+                self.write_checkpoint(checkpoint, done)
+
+                elapsed = time.perf_counter() - start
+                self.stdout.write('%d rows done: %d created, %d skipped (%.0f users/s)' % (
+                    done, created, skipped, created / elapsed if elapsed else 0
+                ))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Created %d users in %.1fs' % (created, time.perf_counter() - start)
+        ))
+
+    def save_batch(self, batch, pool, processes):
+        """Hash & insert one batch; returns (created, skipped)"""
+        User = get_user_model()
+        users = {} # normalize(email) -> (email, row) - emails are unique ignoring case (migration 0005)
+        for row in batch:
+            email = User.objects.normalize_email((row.get('email') or '').strip())
+            if email and normalize(email) not in users:
+                users[normalize(email)] = (email, row)
+        existing = User.objects.annotate(email_lower=Lower('email')).filter(
+            email_lower__in=list(users)
+        ).values_list('email_lower', flat=True)
+        for email in existing:
+            del users[email]
+
+        passwords = [row.get('password') or None for _, row in users.values()]
+        chunksize = max(1, len(passwords) // (processes * 4)) # a few chunks per process
+        hashes = pool.map(make_password, passwords, chunksize=chunksize)
+
+        objs = [
+            User(email=email, name=row.get('name') or '', password=encoded)
+            for (email, row), encoded in zip(users.values(), hashes)
+        ]
+        User.objects.bulk_create(objs) # one transaction per batch
+        return len(objs), len(batch) - len(objs)
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, path, done):
+        # write then rename so a crash never leaves a half written checkpoint
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(str(done))
+        os.replace(tmp, path)
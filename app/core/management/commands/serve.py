@@ -0,0 +1,118 @@
+import glob
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gunicorn.app.base import BaseApplication
+
+from core.caches import is_per_process
+from core.emails import get_email_index
+from core.metrics import registry
+from core.warmup import warm_up
+
+
+class Application(BaseApplication):
+    """Runs app/wsgi.py (or app/asgi.py) under gunicorn with the options from our command"""
+
+    def __init__(self, options, asgi=False):
+        self.options = options
+        self.asgi = asgi
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        if self.asgi:
+            from app.asgi import application
+        else:
+            from app.wsgi import application
+        return application
+
+
+def post_worker_init(worker):
+    # runs in every new worker once the app is loaded, before it accepts connections
+    # all the workers answer on one port, so each one writes its metrics where /metrics/ adds
+        # them up, whichever worker the scrape lands on (see core/metrics.py)
+    registry.share(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+    count = warm_up()
+    worker.log.info('Worker %s warmed up (%d models)', worker.pid, count)
+    if settings.EMAIL_FILTER['ENABLED']:
+        # the scan of the emails runs next to the worker's first requests instead of holding up
+            # its start (or some signup later); the checks ask the database until it's done
+        get_email_index().start_build()
+
+
+def worker_exit(arbiter, worker):
+    # runs in the worker as it exits (--max-requests, a reload...): its last numbers are kept
+    registry.flush()
+
+
+class Command(BaseCommand):
+    """Production server: pre-forked workers, each with a pool of threads"""
+    # ie. python manage.py serve --workers 4 --threads 8
+    # - graceful reload: kill -HUP <master pid> starts fresh workers & lets the old ones
+        # finish their in-flight requests before they exit
+    # - every worker exits & is replaced after --max-requests requests (+ random jitter so
+        # they don't all restart at once), which bounds slow memory growth
+    # --asgi: uvicorn workers running app/asgi.py instead - each worker holds any number of
+        # (idle keep-alive / slow) connections in an event loop & only borrows one of its
+        # ASGI_THREADS threads while django runs; --threads doesn't apply (needs uvicorn installed)
+    # defaults come from environment variables so they can be tuned per deployment
+
+    help = 'Serve the API with gunicorn (pre-fork workers + threads)'
+
+    def add_arguments(self, parser):
+        env = os.environ.get
+        parser.add_argument('--bind', default=env('SERVER_BIND', '0.0.0.0:8000'))
+        parser.add_argument('--workers', type=int, default=int(env('SERVER_WORKERS', os.cpu_count() or 1)))
+        parser.add_argument('--threads', type=int, default=settings.SERVER_THREADS or 4)
+        parser.add_argument('--max-requests', type=int, default=int(env('SERVER_MAX_REQUESTS', 5000)))
+        parser.add_argument('--max-requests-jitter', type=int, default=int(env('SERVER_MAX_REQUESTS_JITTER', 500)))
+        parser.add_argument('--timeout', type=int, default=int(env('SERVER_TIMEOUT', 30)))
+        parser.add_argument('--graceful-timeout', type=int, default=int(env('SERVER_GRACEFUL_TIMEOUT', 30)))
+        parser.add_argument('--keepalive', type=int, default=int(env('SERVER_KEEPALIVE', 5)))
+        parser.add_argument('--asgi', action='store_true', default=env('SERVER_ASGI', '').lower() in ('1', 'true', 'yes'))
+
+    def handle(self, *args, **options):
+        if options['workers'] > 1 and is_per_process(settings.RECIPE_CACHE_ALIAS):
+            # each worker would keep its own list versions & answer 304s for lists another one changed
+            raise CommandError(
+                'RECIPE_CACHE_ALIAS (%r) is a per process LocMemCache - use a cache the workers share '
+                '(ie. CACHE_BACKEND=...MemcachedCache) or --workers 1' % settings.RECIPE_CACHE_ALIAS
+            )
+        worker_class = 'gthread'
+        # LoadSheddingMiddleware's default limits follow the threads a worker really has
+            # (the workers load the app - & the middleware - after this, in the forked process)
+        settings.SERVER_THREADS = options['threads']
+        if options['asgi']:
+            try:
+                import uvicorn.workers  # noqa: F401
+            except ImportError:
+                raise CommandError('--asgi needs uvicorn (pip install uvicorn)')
+            worker_class = 'uvicorn.workers.UvicornWorker'
+            settings.SERVER_THREADS = settings.ASGI_THREADS
+        # the counters start from zero with the server - like they would in a single process
+        if settings.METRICS_DIR is None:
+            settings.METRICS_DIR = tempfile.mkdtemp(prefix='api-metrics-')
+        else:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics-*.json')):
+                os.remove(path)
+
+        Application({
+            'bind': options['bind'],
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'worker_class': worker_class,
+            'max_requests': options['max_requests'],
+            'max_requests_jitter': options['max_requests_jitter'],
+            'timeout': options['timeout'],
+            'graceful_timeout': options['graceful_timeout'],
+            'keepalive': options['keepalive'],
+            'post_worker_init': post_worker_init,
+            'worker_exit': worker_exit,
+        }, asgi=options['asgi']).run()
@@ -1,35 +1,75 @@
-# importing time - the default python module that lets our app sleep a few seconds in between each database check
+# importing time - the default python module that lets our app sleep in between each database check
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 #import the connections module, which we want so we can test if the db connection is available
 from django.db import connections
 
-#import the error django will throw if db isn't available
-from django.db.utils import OperationalError
+#import the error django will throw if db isn't available (& the one for a misspelled --database)
+from django.db.utils import ConnectionDoesNotExist, OperationalError
 
 # needed so we can build our custom commmand
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 
 
 
+def probe(alias):
+    """Run a trivial query so we know the db really accepts queries (not just that it's configured)"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        connection.close() # connections are per thread; don't leave the probe's one lying around
+
+
 # create our command class
 
 class Command(BaseCommand):
 
     """Django command to pause execution until db is available"""
-    # put our code in a handle function that's run whenever we run this mgmt command
+    # retries quickly at first & backs off exponentially (with random jitter so a fleet of
+        # containers doesn't hammer the db in lock step) - ie. 0.1s, 0.2s, 0.4s ... up to --max-interval
+    # every database in settings.DATABASES (or each --database) is waited on in parallel
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='databases', help='alias to wait for (repeatable); default: all')
+        parser.add_argument('--timeout', type=float, default=0, help='seconds before giving up (default 0 == wait forever)')
+        parser.add_argument('--interval', type=float, default=0.1, help='seconds before the first retry')
+        parser.add_argument('--max-interval', type=float, default=2.0, help='longest wait between retries')
+
+    # put our code in a handle function that's run whenever we run this mgmt command
     def handle(self, *args, **options): # passing in custom arguments and options to our mgmt command - ie. customize wait time as an option
         # once db is available we'll just exit
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn: # aka, while this is a false value, try to set it to the db connection; if it's unavailable, django raises an error n we show error, then sleeps execution for a second and then tries again
+        aliases = options['databases'] or list(connections)
+        with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable; waiting 1 second...')
-                time.sleep(1)
+                results = list(pool.map(lambda alias: self.wait(alias, options), aliases))
+            except ConnectionDoesNotExist as e: # a misspelled --database; no point waiting for it
+                raise CommandError('%s (settings.DATABASES has: %s)' % (e, ', '.join(connections)))
 
+        failed = [alias for alias, ok in zip(aliases, results) if not ok]
+        if failed:
+            raise CommandError('Database unavailable after %ss: %s' % (options['timeout'], ', '.join(failed)))
         self.stdout.write(self.style.SUCCESS('Database is available!')) # outputs a green output
+
+    def wait(self, alias, options):
+        """Probe alias until it answers; False if the timeout ran out first"""
+        deadline = time.monotonic() + options['timeout'] if options['timeout'] else None
+        delay = options['interval']
+        while True: # if the db is unavailable, django raises an error n we show error, then sleep & try again
+            try:
+                probe(alias)
+                return True
+            except OperationalError:
+                pass
+            pause = delay * random.uniform(0.5, 1.0) # jitter
+            if deadline is not None and time.monotonic() + pause > deadline:
+                return False
+            self.stdout.write('Database %s unavailable; waiting %.2f seconds...' % (alias, pause))
+            time.sleep(pause)
+            delay = min(delay * 2, options['max_interval'])
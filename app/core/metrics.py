@@ -0,0 +1,237 @@
+"""Minimal metrics (counters & histograms) in the Prometheus text format"""
+# every server process counts in its own memory (no locks shared between processes on the
+    # request path). gunicorn's workers all sit behind one port though, so a scrape lands on a
+    # random worker - with only its own numbers the counters would seem to jump back & forth
+# so under serve (see Registry.share) each worker also writes its numbers to a file in
+    # settings.METRICS_DIR about once a second, & /metrics/ adds up the files of all the workers
+    # (plus those of the workers that have exited - counters must never go backwards)
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ('%s="%s"' % (n, str(v).replace('\\', '\\\\').replace('"', '\\"')) for n, v in zip(names, values))
+    return '{%s}' % ','.join(pairs)
+
+
+class Counter:
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {} # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        """{label values: count} - a copy"""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def collect(self, values=None):
+        """The exposition lines of values ({label values: count}; this process' own by default)"""
+        yield '# HELP %s %s' % (self.name, self.help)
+        yield '# TYPE %s counter' % self.name
+        values = sorted((self.snapshot() if values is None else values).items())
+        for label_values, value in values:
+            yield '%s%s %s' % (self.name, format_labels(self.labels, label_values), value)
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value) # first bucket with upper bound >= value
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """{label values: [count per bucket..., +Inf count, sum]} - a copy"""
+        with self._lock:
+            return {k: list(v) for k, v in self._series.items()}
+
+    @staticmethod
+    def merge(value, other):
+        return [a + b for a, b in zip(value, other)]
+
+    def collect(self, values=None):
+        """The exposition lines of values ({label values: series}; this process' own by default)"""
+        yield '# HELP %s %s' % (self.name, self.help)
+        yield '# TYPE %s histogram' % self.name
+        series = sorted((self.snapshot() if values is None else values).items())
+        for label_values, counts in series:
+            names = self.labels + ('le',)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield '%s_bucket%s %s' % (self.name, format_labels(names, label_values + (bound,)), cumulative)
+            labels = format_labels(self.labels, label_values)
+            yield '%s_sum%s %s' % (self.name, labels, counts[-1])
+            yield '%s_count%s %s' % (self.name, labels, cumulative)
+
+
+class Registry:
+    """Everything exposed on the metrics endpoint"""
+
+    def __init__(self):
+        self.metrics = []
+        self.directory = None # set by share(): where the processes leave their numbers
+        self.path = None
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        """{metric name: {label values: value}} of this process"""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def share(self, directory, interval=1.0):
+        """Write this process' numbers to a file in directory every interval seconds"""
+        # called once per worker after the fork, & flush() once more as it exits (see serve's
+            # post_worker_init & worker_exit hooks); the file name is unique per
+            # process, so a new process that's handed a recycled pid never overwrites one
+        self.directory = directory
+        self.path = os.path.join(directory, 'metrics-%d-%s.json' % (os.getpid(), uuid.uuid4().hex[:8]))
+        self.flush()
+
+        def flush_every():
+            while True:
+                time.sleep(interval)
+                self.flush()
+        threading.Thread(target=flush_every, name='metrics-flush', daemon=True).start()
+
+    def flush(self):
+        if self.path is None:
+            return
+        with self._lock: # the flush thread & a scrape can both be at it
+            self.write(self.path, self.snapshot())
+
+    def expose(self):
+        if self.directory is None:
+            values = self.snapshot()
+        else:
+            self.flush() # this process' numbers as of now; the others' are at most an interval old
+            values = self.combine()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect(values.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+    def combine(self):
+        """{metric name: {label values: value}} summed over the files of every process"""
+        # the files of processes that have exited are folded into one archive file, so
+            # recycled workers (--max-requests) don't leave an ever growing pile behind
+        archive = os.path.join(self.directory, 'metrics-archive.json')
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX) # one scrape at a time folds the dead files
+            archived, live, dead = self.read(archive), {}, []
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*-*.json')):
+                pid = int(os.path.basename(path).split('-')[1])
+                if is_running(pid):
+                    self.add(live, self.read(path))
+                else:
+                    self.add(archived, self.read(path))
+                    dead.append(path)
+            if dead:
+                self.write(archive, archived)
+                for path in dead:
+                    os.remove(path)
+        return self.add(archived, live)
+
+    def read(self, path):
+        """{metric name: {label values: value}} from a file written by flush()"""
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return {name: {tuple(labels): value for labels, value in series} for name, series in snapshot.items()}
+
+    def write(self, path, values):
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({
+                name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in values.items()
+            }, f)
+        os.replace(temporary, path) # readers see the old file or the new one, never half of one
+
+    def add(self, values, other):
+        """Add other's numbers into values (both {metric name: {label values: value}})"""
+        metrics = {metric.name: metric for metric in self.metrics}
+        for name, series in other.items():
+            metric = metrics.get(name)
+            if metric is None:
+                continue # renamed or removed since that process wrote it
+            merged = values.setdefault(name, {})
+            for labels, value in series.items():
+                merged[labels] = metric.merge(merged[labels], value) if labels in merged else value
+        return values
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0) # signal 0: nothing is sent, only checked
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # someone else's process
+    return True
+
+
+registry = Registry()
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+VIEW_LABELS = ('view', 'method')
+
+requests_total = registry.register(Counter(
+    'api_requests_total', 'Requests handled', ('view', 'method', 'status')))
+request_seconds = registry.register(Histogram(
+    'api_request_duration_seconds', 'Wall time per request', SECONDS, VIEW_LABELS))
+db_seconds = registry.register(Histogram(
+    'api_request_db_seconds', 'Time spent in SQL queries per request', SECONDS, VIEW_LABELS))
+db_queries = registry.register(Histogram(
+    'api_request_queries', 'SQL queries per request', QUERIES, VIEW_LABELS))
+serialize_seconds = registry.register(Histogram(
+    'api_request_serialize_seconds', 'Time spent in serializer .data (to_representation) per request', SECONDS, VIEW_LABELS))
+render_seconds = registry.register(Histogram(
+    'api_request_render_seconds', 'Time spent rendering the response body (JSON encoding)', SECONDS, VIEW_LABELS))
+response_bytes = registry.register(Histogram(
+    'api_response_size_bytes', 'Response body size', BYTES, VIEW_LABELS))
+throttled_total = registry.register(Counter(
+    'api_requests_throttled_total', 'Requests refused by a token bucket throttle (429)', ('scope',)))
+shed_total = registry.register(Counter(
+    'api_requests_shed_total', 'Requests turned away by the load shedder (503)', ('reason',)))
+email_checks_total = registry.register(Counter(
+    'api_email_checks_total', 'Email availability checks by how they were answered', ('outcome',)))
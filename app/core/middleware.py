@@ -0,0 +1,257 @@
+import hashlib
+import logging
+import threading
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+
+from core import metrics
+from core.caches import is_per_process
+from core.db import router
+from core.queries import capture_queries
+
+
+logger = logging.getLogger('core.queries')
+
+
+class QueryTimer:
+    """execute_wrapper that counts the queries of one request & adds up their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Record wall time, db time, query count, serialize & render time & size of every request"""
+    # goes first in MIDDLEWARE so the wall time covers the whole stack
+    # numbers land in the histograms of core/metrics.py (labelled with the url name of the view)
+        # & are scraped from /metrics/; each request also gets a Server-Timing header so the
+        # browser's dev tools / curl -v show where its time went
+    # serialize: building serializer .data in the view (core/serializers.py TimedDataMixin);
+        # render: encoding that to JSON after the view has returned
+    # the cost per request is a couple of perf_counter() calls per query plus a few dict updates
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        timer = QueryTimer()
+        request._metrics_serialize = 0.0
+        request._metrics_render = 0.0
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        labels = (match.view_name if match else '<unmatched>', request.method)
+        metrics.requests_total.inc(*labels, response.status_code)
+        metrics.request_seconds.observe(total, *labels)
+        metrics.db_seconds.observe(timer.seconds, *labels)
+        metrics.db_queries.observe(timer.count, *labels)
+        metrics.serialize_seconds.observe(request._metrics_serialize, *labels)
+        metrics.render_seconds.observe(request._metrics_render, *labels)
+        if not response.streaming:
+            metrics.response_bytes.observe(len(response.content), *labels)
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                'db;dur=%.2f;desc="%d queries", serialize;dur=%.2f, render;dur=%.2f, total;dur=%.2f' % (
+                    timer.seconds * 1000, timer.count, request._metrics_serialize * 1000,
+                    request._metrics_render * 1000, total * 1000,
+                )
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (serialized to JSON) right after this hook returns
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render = time.perf_counter() - start
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class LoadSheddingMiddleware:
+    """Turn requests away with a fast 503 while this process is overloaded"""
+    # a request is shed (settings.LOAD_SHED) when:
+        # - MAX_IN_FLIGHT requests are already running in this process
+        # - it's a write & MAX_WRITES_IN_FLIGHT writes are already running, or the recent
+            # average request time is over MAX_LATENCY - the expensive writes go first so
+            # the (mostly cached) reads stay fast
+        # - it already waited more than MAX_QUEUE_WAIT for a thread - the client has likely
+            # given up or is about to; how long it waited comes from core/asgi.py's stamp or
+            # the proxy's X-Request-Start (gthread's own queue isn't visible to django)
+    # the concurrency limits default to the server's thread count (settings.SERVER_THREADS, set by
+        # serve); under any other server (ie. runserver) it's off unless MAX_IN_FLIGHT is set
+    # goes right after MetricsMiddleware, so a shed request costs a lock & a dict lookup
+        # (and still shows up in the metrics, plus api_requests_shed_total by reason)
+    # a streamed response counts as finished once its headers are ready
+
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+    smoothing = 0.1 # weight of the newest request in the average request time
+
+    def __init__(self, get_response):
+        limits = dict(settings.LOAD_SHED)
+        if limits['MAX_IN_FLIGHT'] is None:
+            limits['MAX_IN_FLIGHT'] = settings.SERVER_THREADS
+        if not limits['MAX_IN_FLIGHT']:
+            raise MiddlewareNotUsed
+        if limits['MAX_WRITES_IN_FLIGHT'] is None:
+            # the other half stays free for reads
+            limits['MAX_WRITES_IN_FLIGHT'] = max(1, limits['MAX_IN_FLIGHT'] // 2)
+        self.limits = limits
+        header = limits.get('REQUEST_START_HEADER')
+        self.request_start_key = 'HTTP_' + header.upper().replace('-', '_') if header else None
+        self.get_response = get_response
+        self.in_flight = 0
+        self.writes_in_flight = 0
+        self.average_seconds = 0.0
+        self.finished_at = 0.0 # time.monotonic() of the last request that finished
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        write = request.method not in self.safe_methods
+        reason = self.admit(request, write)
+        if reason is not None:
+            metrics.shed_total.inc(reason)
+            response = JsonResponse({'detail': 'The server is busy, please try again shortly.'}, status=503)
+            response['Retry-After'] = str(self.limits['RETRY_AFTER'])
+            return response
+
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.release(write, time.perf_counter() - start)
+
+    def admit(self, request, write):
+        """Count the request in, or return why it's shed"""
+        waited = self.queue_wait(request)
+        if waited is not None and waited > self.limits['MAX_QUEUE_WAIT']:
+            return 'queue_wait'
+        with self._lock:
+            if self.in_flight >= self.limits['MAX_IN_FLIGHT']:
+                return 'in_flight'
+            if write:
+                if self.writes_in_flight >= self.limits['MAX_WRITES_IN_FLIGHT']:
+                    return 'writes_in_flight'
+                # only while requests keep finishing - with writes shed & no reads coming in
+                    # nothing would ever update a stale average
+                recent = time.monotonic() - self.finished_at < self.limits['RETRY_AFTER']
+                if recent and self.average_seconds > self.limits['MAX_LATENCY']:
+                    return 'latency'
+                self.writes_in_flight += 1
+            self.in_flight += 1
+        return None
+
+    def queue_wait(self, request):
+        """Seconds the request waited before a thread picked it up (None if nothing says)"""
+        queued_at = request.META.get('core.queued_at')
+        if queued_at is not None:
+            return time.monotonic() - queued_at
+        if self.request_start_key is None:
+            return None
+        # "t=1700000000.123" or a bare number - in seconds, milliseconds or microseconds
+            # since the epoch depending on the proxy, told apart by their size
+        value = request.META.get(self.request_start_key, '')
+        try:
+            started = float(value[2:] if value.startswith('t=') else value)
+        except ValueError:
+            return None
+        while started > 1e11: # ms or us -> s
+            started /= 1000
+        return time.time() - started
+
+    def release(self, write, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            if write:
+                self.writes_in_flight -= 1
+            self.average_seconds += self.smoothing * (seconds - self.average_seconds)
+            self.finished_at = time.monotonic()
+
+
+class QueryInspectorMiddleware:
+    """Log the query shapes a request repeats (likely N+1s) with the code that ran them"""
+    # dev only - it keeps a stack per query, which is far too slow for production, so
+        # django drops it from the stack unless DEBUG is on
+    # a shape repeated settings.QUERY_INSPECTOR_REPEATS times or more in one request is logged
+        # as a warning on the core.queries logger
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with capture_queries(stacks=True) as queries:
+            response = self.get_response(request)
+
+        for sql, count in queries.repeated(settings.QUERY_INSPECTOR_REPEATS).items():
+            stack = ''.join(traceback.format_list(queries.stack_for(sql) or []))
+            logger.warning(
+                '%s %s ran the same query %d times (possible N+1):\n  %s\n%s',
+                request.method, request.path, count, sql, stack,
+            )
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Send a client's reads to the primary for a few seconds after it writes (core/db/router.py)"""
+    # the client is whoever sends the same Authorization header (or session cookie, or - for
+        # anonymous requests like signing up - IP address); the pins live in the cache named by
+        # settings.REPLICA_PIN_CACHE_ALIAS, which must be shared by every process - a pin in one
+        # worker's LocMemCache wouldn't stop the next request, on another worker, reading a replica
+        # that hasn't caught up yet, so a per process cache stops the app from starting
+    # not used at all unless settings.DATABASE_REPLICAS lists some replicas
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        if is_per_process(settings.REPLICA_PIN_CACHE_ALIAS):
+            raise ImproperlyConfigured(
+                'REPLICA_PIN_CACHE_ALIAS (%r) is a per process LocMemCache - read replicas need a cache '
+                'every server process shares (ie. CACHE_BACKEND=...MemcachedCache)' % settings.REPLICA_PIN_CACHE_ALIAS
+            )
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+        key = self.client_key(request)
+        router.reset_state()
+        router.state.pinned = bool(cache.get(key))
+        try:
+            response = self.get_response(request)
+            if router.state.wrote:
+                cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        finally:
+            router.reset_state()
+        return response
+
+    def client_key(self, request):
+        client = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        # never put credentials in the cache's keyspace
+        return 'replica:pin:' + hashlib.sha256(client.encode()).hexdigest()
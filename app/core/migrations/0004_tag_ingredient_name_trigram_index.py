@@ -0,0 +1,38 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# GIN trigram indexes serve both `name ILIKE 'q%'` & `name % 'q'` (see recipe/search.py)
+    # they only exist on postgres; other databases search with an in-memory index instead
+INDEXES = (
+    ('core_tag_name_trgm_idx', 'core_tag'),
+    ('core_ingredient_name_trgm_idx', 'core_ingredient'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX %s ON %s USING gin (name gin_trgm_ops)' % (name, table)
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_tag_ingredient_user_name_index'),
+    ]
+
+    operations = [
+        TrigramExtension(), # CREATE EXTENSION IF NOT EXISTS pg_trgm (skipped on other databases)
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+# emails are unique ignoring case - Test@Example.com & test@example.com are the same person
+    # a unique index on the expression LOWER(email) enforces it & serves the lookups in
+    # core/emails.py; postgres & sqlite support expression indexes, other databases keep
+    # only the (case sensitive) unique constraint on the column
+# fails if the table already holds emails differing only in case - merge those users first:
+    # SELECT LOWER(email) FROM core_user GROUP BY 1 HAVING COUNT(*) > 1
+INDEX = 'core_user_email_lower_uniq'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    schema_editor.execute('CREATE UNIQUE INDEX %s ON core_user (LOWER(email))' % INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS %s' % INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_tag_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
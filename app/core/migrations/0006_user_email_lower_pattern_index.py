@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+# the admin's user search is LOWER(email) LIKE 'term%' (see core/changelist.py); the unique
+    # LOWER(email) index from 0005 can't serve LIKE unless the database collation is "C", an
+    # index with text_pattern_ops can - postgres only (sqlite's LIKE ignores case & can't use it)
+INDEX = 'core_user_email_lower_like_idx'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE INDEX %s ON core_user (LOWER(email) text_pattern_ops)' % INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS %s' % INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_user_email_lower_unique_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.1.15 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_email_lower_pattern_index'),
+    ]
+
+    # (user, name) couldn't serve ORDER BY name DESC, id DESC - postgres sorted all of a
+        # user's rows for every page; (user, name, id) returns them in the cursor's order
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingredient_user_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_ingredient_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_tag_user_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 2.1.15 on 2026-10-18 06:30
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge each user's objects of the same name into the oldest one so the unique constraint can be added"""
+    # the single object create endpoint used to accept a name the user already had, so these
+        # are real user data: whatever links to a duplicate (ie. a recipe's tags) is moved over
+        # to the row that's kept before the duplicate is deleted - nothing loses a link
+    for model_name in ('Tag', 'Ingredient'):
+        model = apps.get_model('core', model_name)
+        # every foreign key & many to many pointing at the model - hidden ones (related_name='+')
+            # too; the tables behind many to manys are handled through the many to many itself
+        relations = [
+            field for field in model._meta.get_fields(include_hidden=True)
+            if field.auto_created and not field.concrete
+        ]
+        throughs = {relation.field.remote_field.through for relation in relations if relation.many_to_many}
+        relations = [relation for relation in relations if relation.related_model not in throughs]
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'), count=Count('id')
+        ).filter(count__gt=1)
+        for row in duplicates:
+            others = list(model.objects.filter(user=row['user'], name=row['name']).exclude(
+                id=row['keep']).values_list('id', flat=True))
+            for relation in relations:
+                repoint(relation, others, row['keep'])
+            model.objects.filter(id__in=others).delete()
+
+
+def repoint(relation, others, keep):
+    """Point the rows of relation that reference any of the others at keep instead"""
+    if relation.many_to_many:
+        field = relation.field # the ManyToManyField, on the model that links to ours
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        # a link to the kept row may already be there - drop the one that would repeat it
+        through.objects.filter(**{
+            target + '__in': others,
+            source + '__in': through.objects.filter(**{target: keep}).values(source),
+        }).delete()
+        # (two of the others linked from the same row would collide too - keep the first)
+        seen = set()
+        for pk, linked in through.objects.filter(**{target + '__in': others}).values_list('pk', source):
+            if linked in seen:
+                through.objects.filter(pk=pk).delete()
+            seen.add(linked)
+        through.objects.filter(**{target + '__in': others}).update(**{target: keep})
+    else:
+        relation.related_model.objects.filter(**{relation.field.name + '__in': others}).update(
+            **{relation.field.name: keep}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0007_tag_ingredient_user_name_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='ingredient',
+            unique_together={('user', 'name')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='tag',
+            unique_together={('user', 'name')},
+        ),
+    ]
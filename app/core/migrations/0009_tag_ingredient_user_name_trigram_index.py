@@ -0,0 +1,45 @@
+from django.contrib.postgres.operations import BtreeGinExtension
+from django.db import migrations
+
+
+# the trigram indexes of 0004 cover every user's names, so a search had to go through the
+    # matches of all users before throwing away those that aren't the searching user's - the
+    # more users, the slower everyone's search; with user_id as the index's first column (GIN
+    # can't index an integer on its own - btree_gin lets it) a search only ever reads one
+    # user's entries (see recipe/search.py)
+INDEXES = (
+    ('core_tag_user_name_trgm_idx', 'core_tag', 'core_tag_name_trgm_idx'),
+    ('core_ingredient_user_name_trgm_idx', 'core_ingredient', 'core_ingredient_name_trgm_idx'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, old_name in INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX %s ON %s USING gin (user_id, name gin_trgm_ops)' % (name, table)
+        )
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % old_name)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, old_name in INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX %s ON %s USING gin (name gin_trgm_ops)' % (old_name, table)
+        )
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_tag_ingredient_user_name_unique'),
+    ]
+
+    operations = [
+        BtreeGinExtension(), # CREATE EXTENSION IF NOT EXISTS btree_gin (skipped on other databases)
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# (user, name) is unique since 0008 - its unique index is all the lists need: it filters by
+    # user & hands the rows over in name order, & with the name unique per user the cursor
+    # needs no id tiebreaker (see recipe/pagination.py); the (user, name, id) index of 0007 & the
+    # foreign key's own user_id index only repeat it, & every insert had to write all three
+UNIQUE = (
+    ('core_tag', 'core_tag_user_name_uniq'),
+    ('core_ingredient', 'core_ingredient_user_name_uniq'),
+)
+COLUMNS = ['user_id', 'name']
+
+
+def unique_constraint(schema_editor, table):
+    """The name of table's unique (user_id, name) constraint"""
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection.get_constraints(cursor, table)
+    for name, constraint in constraints.items():
+        if constraint['unique'] and not constraint['primary_key'] and constraint['columns'] == COLUMNS:
+            return name
+
+
+def rename_unique_constraints(apps, schema_editor):
+    # the name django generated (with a hash in it) -> one that says what it is, like the
+        # other indexes; only postgres can rename a constraint (& django finds unique_together
+        # constraints by their columns, not their name)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, name in UNIQUE:
+        schema_editor.execute('ALTER TABLE %s RENAME CONSTRAINT %s TO %s' % (
+            schema_editor.quote_name(table),
+            schema_editor.quote_name(unique_constraint(schema_editor, table)),
+            schema_editor.quote_name(name),
+        ))
+
+
+def restore_unique_constraint_names(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, name in UNIQUE:
+        schema_editor.execute('ALTER TABLE %s RENAME CONSTRAINT %s TO %s' % (
+            schema_editor.quote_name(table),
+            schema_editor.quote_name(name),
+            schema_editor.quote_name(schema_editor._create_index_name(table, COLUMNS, suffix='_uniq')),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0009_tag_ingredient_user_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingredient_seek_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_name_id_idx',
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(rename_unique_constraints, restore_unique_constraint_names),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.conf import settings # lets us reference AUTH_USER_MODEL from our settings file
+
+from core.hashers import hash_password, verify_password
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 # import 'abstract base user'
 # import 'base user manager'
@@ -50,3 +53,58 @@ class User(AbstractBaseUser, PermissionsMixin): # create user model
     objects = UserManager()
 
     USERNAME_FIELD = 'email' # by default the USERNAME_FIELD is username; now it's email
+
+    # both overridden so the slow hashing runs on the bounded hashing pool (see core/hashers.py)
+    def set_password(self, raw_password):
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Check the password & upgrade the stored hash if the hasher settings changed"""
+        correct, outdated = verify_password(raw_password, self.password)
+        if correct and outdated:
+            # rehash-on-login: the user just gave us the raw password, so move them to the
+                # current PASSWORD_HASHER & cost
+            self.set_password(raw_password)
+            self._password = None # an upgrade isn't a password change
+            self.save(update_fields=['password'])
+        return correct
+
+
+
+class Tag(models.Model):
+    """Tag to be used for a recipe"""
+    name = models.CharField(max_length=255)
+    # the user that owns the tag; if the user is deleted their tags are deleted too
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False, # the unique (user, name) index below starts with it
+    )
+
+    class Meta:
+        # a user has each name once - bulk creates rely on it to stay idempotent when they race
+            # its index is the only one the table needs: the list endpoints filter by user &
+            # seek/sort by name, so a page is an index range scan without a sort
+        unique_together = (('user', 'name'),)
+
+    def __str__(self):
+        return self.name
+
+
+
+class Ingredient(models.Model):
+    """Ingredient to be used in a recipe"""
+    name = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False, # the unique (user, name) index below starts with it
+    )
+
+    class Meta:
+        # a user has each name once (see Tag)
+        unique_together = (('user', 'name'),)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,85 @@
+"""Record the SQL a block of code runs & spot the same query shape repeated (N+1s)"""
+# used by the query budget assertions in tests (core/testing.py) & by the dev-only
+    # QueryInspectorMiddleware (core/middleware.py)
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN \((?:[^()]+)\)', re.IGNORECASE)
+SPACES = re.compile(r'\s+')
+
+
+def shape(sql):
+    """sql without its values, so 'WHERE id = 1' & 'WHERE id = 2' come out the same"""
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def project_stack():
+    """The frames of the current stack that are our code (not django's or a library's)"""
+    base = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and '/site-packages/' not in frame.filename
+    ]
+
+
+class QueryRecorder:
+    """execute_wrapper that keeps every query it sees (and where it came from, if asked)"""
+
+    def __init__(self, stacks=False):
+        self.stacks = stacks
+        self.queries = [] # (alias, sql, stack)
+
+    def wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            stack = project_stack() if self.stacks else None
+            self.queries.append((alias, sql, stack))
+            return execute(sql, params, many, context)
+        return record
+
+    def __len__(self):
+        return len(self.queries)
+
+    def shapes(self):
+        return Counter(shape(sql) for _, sql, _ in self.queries)
+
+    def repeated(self, threshold=2):
+        """{shape: times run} of every query shape run at least threshold times"""
+        return {sql: count for sql, count in self.shapes().items() if count >= threshold}
+
+    def stack_for(self, sql_shape):
+        """Stack of the first query with this shape"""
+        for _, sql, stack in self.queries:
+            if shape(sql) == sql_shape:
+                return stack
+        return None
+
+    def report(self):
+        lines = ['%d queries:' % len(self.queries)]
+        lines.extend('  %d. [%s] %s' % (i, alias, sql) for i, (alias, sql, _) in enumerate(self.queries, 1))
+        repeated = self.repeated()
+        if repeated:
+            lines.append('Repeated query shapes (possible N+1):')
+            lines.extend('  %dx %s' % (count, sql) for sql, count in repeated.items())
+        return '\n'.join(lines)
+
+
+@contextmanager
+def capture_queries(using=None, stacks=False):
+    """with capture_queries() as queries: ... - record the queries run on every (or the given) db"""
+    recorder = QueryRecorder(stacks=stacks)
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder.wrapper(alias)))
+        yield recorder
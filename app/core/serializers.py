@@ -0,0 +1,21 @@
+"""Serializer mixins shared by the apps"""
+import time
+
+
+class TimedDataMixin:
+    """Adds the time spent building .data to the request's serialize time (see MetricsMiddleware)"""
+    # .data is where to_representation() runs - once per object, per field - inside the view,
+        # before the renderer turns the result into JSON (that part is the render time)
+    # put it on list serializers too: ListSerializer.data calls the child's to_representation()
+        # directly, never the child's .data
+
+    @property
+    def data(self):
+        start = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            request = self.context.get('request')
+            request = getattr(request, '_request', request) # the django request under DRF's
+            if hasattr(request, '_metrics_serialize'):
+                request._metrics_serialize += time.perf_counter() - start
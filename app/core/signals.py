@@ -0,0 +1,38 @@
+"""Signal receivers that keep the caches in core in sync with the database"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import get_token_cache
+from core.emails import get_email_index
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """A deleted token must stop authenticating straight away"""
+    get_token_cache().delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def evict_saved_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    """Drop the cached tokens of a user whenever is_active (or the whole row) is saved"""
+    if created:
+        return # a brand new user can't have cached tokens yet
+    if update_fields is not None and 'is_active' not in update_fields:
+        return # ie. save(update_fields=['last_login']) doesn't change who can log in
+    cache = get_token_cache()
+    keys = ()
+    if cache.shared is not None:
+        # the shared tier can only be cleared by key, so look the keys up
+        keys = list(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+    cache.delete_user(instance.pk, keys=keys)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def add_saved_user_email(sender, instance, update_fields=None, **kwargs):
+    """Keep this process's email filter current (new users & changed emails)"""
+    if update_fields is not None and 'email' not in update_fields:
+        return
+    get_email_index().add(instance.email)
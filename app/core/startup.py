@@ -0,0 +1,94 @@
+"""Time a cold start of the django process, phase by phase (run by the profile_startup command)"""
+# runs in a fresh interpreter - python -X importtime -m core.startup - so nothing is imported
+    # yet; prints the timings as JSON on stdout, while -X importtime writes every module import
+    # (self & cumulative microseconds) to stderr
+# phases, in the order a worker goes through them:
+    # settings - importing the settings module
+    # apps - django.setup(): per app, importing it, its models & running its ready()
+    # urls - the URLconf, which imports every view (& whatever the views import)
+    # wsgi - get_wsgi_application(): building the middleware chain
+    # warm_up - core.warmup.warm_up() (what serve runs in each worker before it takes traffic)
+import json
+import os
+import sys
+import time
+
+
+def parse_importtime(output):
+    """[(module, self seconds, cumulative seconds)] from the stderr of python -X importtime"""
+    # import time:       533 |      75606 | user.views
+        # (nested imports are indented under the module that imported them)
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue # the header line
+        imports.append((module.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return imports
+
+
+def instrument_apps(timings):
+    """Record per app how long importing it, its models & its ready() take"""
+    from django.apps import AppConfig
+
+    create = AppConfig.create.__func__
+
+    def timed(label, step, method):
+        def wrapper():
+            start = time.perf_counter()
+            try:
+                return method()
+            finally:
+                timings.setdefault(label, {})[step] = time.perf_counter() - start
+        return wrapper
+
+    def timed_create(cls, entry):
+        start = time.perf_counter()
+        config = create(cls, entry)
+        timings.setdefault(config.label, {})['import'] = time.perf_counter() - start
+        # populate() calls these on the instance, so wrapping them there is enough
+        config.import_models = timed(config.label, 'models', config.import_models)
+        config.ready = timed(config.label, 'ready', config.ready)
+        return config
+
+    AppConfig.create = classmethod(timed_create)
+
+
+def main():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    phases = []
+    apps = {}
+
+    def phase(name, function):
+        start = time.perf_counter()
+        function()
+        phases.append((name, time.perf_counter() - start))
+
+    import django
+    from django.conf import settings
+
+    phase('settings', lambda: settings.INSTALLED_APPS)
+    instrument_apps(apps)
+    phase('apps', django.setup)
+
+    from django.urls import get_resolver
+    phase('urls', lambda: get_resolver().url_patterns)
+
+    from django.core.wsgi import get_wsgi_application
+    phase('wsgi', get_wsgi_application)
+
+    from core.warmup import warm_up
+    phase('warm_up', warm_up)
+
+    json.dump({
+        'settings_module': os.environ['DJANGO_SETTINGS_MODULE'],
+        'phases': phases,
+        'apps': apps,
+        'modules': len(sys.modules),
+    }, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+"""Helpers for summarizing the latencies our benchmark & load test commands collect"""
+
+
+def percentile(values, pct):
+    """Return the pct (0-100) percentile of values using the nearest-rank method"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0) # nearest rank, 0 based
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(latencies, elapsed):
+    """Summary of per-operation latencies (seconds) for a run that took elapsed seconds"""
+    return {
+        'count': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0, # operations per second
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else 0.0,
+    }
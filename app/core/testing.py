@@ -0,0 +1,56 @@
+"""Query budget & on_commit helpers for API tests"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.queries import capture_queries
+
+
+class QueryBudgetMixin:
+    """Mix into a TestCase to cap the queries an endpoint may run
+
+    with self.assertMaxQueries(2):
+        self.client.get(TAGS_URL)
+    """
+    # unlike assertNumQueries an endpoint may get cheaper without breaking the test, and
+        # any query shape run more than once in the block fails it too (ie. one query per
+        # row in a list = an N+1) - pass allow_repeats=True where repeats are on purpose
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=None, allow_repeats=False):
+        with capture_queries(using=using) as queries:
+            yield queries
+        if len(queries) > budget:
+            self.fail('Expected at most %d queries, got %d\n%s' % (budget, len(queries), queries.report()))
+        if not allow_repeats and queries.repeated():
+            self.fail('Repeated query shapes (possible N+1)\n%s' % queries.report())
+
+    @contextmanager
+    def assertNoRepeatedQueries(self, threshold=2, using=None):
+        with capture_queries(using=using) as queries:
+            yield queries
+        if queries.repeated(threshold):
+            self.fail('Query shapes run %d+ times (possible N+1)\n%s' % (threshold, queries.report()))
+
+
+class OnCommitMixin:
+    """Mix into a TestCase to run the transaction.on_commit() callbacks of a block
+
+    with self.captureOnCommitCallbacks(execute=True):
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+    """
+    # a TestCase never commits (every test is rolled back), so on_commit callbacks - ie. the
+        # list version bumps of recipe/signals.py - never run on their own; this is Django 3.2's
+        # TestCase.captureOnCommitCallbacks for the Django we're on
+
+    @contextmanager
+    def captureOnCommitCallbacks(self, using=DEFAULT_DB_ALIAS, execute=False):
+        callbacks = []
+        start = len(connections[using].run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            callbacks[:] = [callback for _, callback in connections[using].run_on_commit[start:]]
+            if execute:
+                for callback in callbacks:
+                    callback()
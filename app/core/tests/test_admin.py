@@ -1,11 +1,19 @@
 # this is where we store all our admin test_create_new_superuser
 
-from django.test import TestCase, Client
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
+from django.db import OperationalError
 
 #add a helper function called reverse - allows us to generate URLs for our django admin page
 from django.urls import reverse
 
+from core.admin import UserAdmin
+from core.changelist import QUERY_CANCELED, KeysetChangeList
+from core.queries import capture_queries
+
 
 class AdminSiteTests(TestCase):
 
@@ -61,3 +69,67 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url) # our test client makes an http GET request to this url
 
         self.assertEqual(res.status_code, 200)
+
+
+
+class UserChangelistTests(TestCase):
+    """The user list pages by id & never counts the whole table (see core/changelist.py)"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(email='admin@javid.com', password='password123')
+        self.client.force_login(self.admin_user)
+        self.users = [
+            get_user_model().objects.create_user(email='user%d@javid.com' % i, password='password123')
+            for i in range(5)
+        ]
+        self.url = reverse('admin:core_user_changelist')
+        patcher = patch.object(UserAdmin, 'list_per_page', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def emails(self, res):
+        return [user.email for user in res.context['cl'].result_list]
+
+    def test_pages_with_keyset_links(self):
+        res = self.client.get(self.url)
+        self.assertEqual(self.emails(res), ['admin@javid.com', 'user0@javid.com'])
+        self.assertIsNone(res.context['cl'].previous_url)
+
+        res = self.client.get(self.url + res.context['cl'].next_url)
+        self.assertEqual(self.emails(res), ['user1@javid.com', 'user2@javid.com'])
+
+        res = self.client.get(self.url + res.context['cl'].previous_url)
+        self.assertEqual(self.emails(res), ['admin@javid.com', 'user0@javid.com'])
+
+    def test_no_offset_and_no_full_count(self):
+        with capture_queries() as queries:
+            self.client.get(self.url, {'after': self.users[1].pk})
+
+        sql = ' '.join(sql for _, sql, _ in queries.queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('SELECT COUNT(*) AS "__count" FROM "core_user"', sql) # only bounded counts
+
+    def test_search_is_a_case_insensitive_email_prefix(self):
+        res = self.client.get(self.url, {'q': 'USER3'})
+
+        self.assertEqual(self.emails(res), ['user3@javid.com'])
+
+    def test_big_counts_are_capped(self):
+        with override_settings(ADMIN_CHANGELIST=dict(settings.ADMIN_CHANGELIST, COUNT_LIMIT=3)):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.context['cl'].result_count, 3)
+        self.assertContains(res, 'more than')
+
+    def test_search_over_the_time_limit(self):
+        class QueryCanceled(Exception):
+            pgcode = QUERY_CANCELED # what psycopg2 raises for a statement_timeout
+
+        canceled = OperationalError('canceling statement due to statement timeout')
+        canceled.__cause__ = QueryCanceled()
+
+        with patch.object(KeysetChangeList, 'get_results', side_effect=canceled):
+            res = self.client.get(self.url, {'q': 'user'})
+
+        self.assertRedirects(res, self.url, fetch_redirect_response=False)
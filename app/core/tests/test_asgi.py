@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase
+
+from core.asgi import ASGIHandler
+
+
+def echo_app(environ, start_response):
+    """Tiny WSGI app answering with what it was sent"""
+    body = environ['wsgi.input'].read()
+    start_response('201 Created', [('Content-Type', 'text/plain'), ('X-Path', environ['PATH_INFO'])])
+    return [environ['QUERY_STRING'].encode(), b'|', environ.get('HTTP_X_TEST', '').encode(), b'|', body]
+
+
+def streaming_app(environ, start_response):
+    response = StreamingHttpResponse(iter([b'one,', b'two,', b'three']))
+    start_response('200 OK', list(response.items()))
+    return response
+
+
+def call(application, path='/', body=b'', headers=()):
+    """Run one http request through an ASGI app; returns the messages it sent"""
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'a=1',
+        'headers': [(b'x-test', b'yes')] + list(headers), 'server': ('testserver', 80),
+    }
+    incoming = [
+        {'type': 'http.request', 'body': body[:3], 'more_body': True},
+        {'type': 'http.request', 'body': body[3:], 'more_body': False},
+    ]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.get_event_loop().run_until_complete(application(scope, receive, send))
+    return sent
+
+
+class ASGIHandlerTests(SimpleTestCase):
+
+    def test_runs_the_wsgi_app(self):
+        sent = call(ASGIHandler(echo_app, max_threads=2), '/caf\xe9/', b'hello world')
+
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'X-Path', '/caf\xe9/'.encode('utf-8')), sent[0]['headers'])
+        self.assertEqual(sent[1]['body'], b'a=1|yes|hello world')
+
+    def test_streams_streaming_responses(self):
+        sent = call(ASGIHandler(streaming_app, max_threads=2))
+
+        bodies = [message['body'] for message in sent[1:]]
+        self.assertEqual(bodies, [b'one,', b'two,', b'three', b''])
+        self.assertTrue(all(message.get('more_body') for message in sent[1:-1]))
+
+    def test_fast_path_skips_the_thread_pool(self):
+        def fast_path(scope):
+            if scope['path'] == '/fast/':
+                return 200, [(b'content-type', b'text/plain')], b'fast'
+
+        handler = ASGIHandler(echo_app, fast_paths=[fast_path], max_threads=2)
+        sent = call(handler, '/fast/')
+
+        self.assertEqual(sent[1]['body'], b'fast')
+        self.assertIsNone(handler.executor) # no thread was needed
+
+    def test_stamps_when_the_request_was_queued(self):
+        seen = {}
+
+        def app(environ, start_response):
+            seen['queued_at'] = environ.get('core.queued_at')
+            return echo_app(environ, start_response)
+
+        before = time.monotonic()
+        call(ASGIHandler(app, max_threads=2))
+
+        self.assertGreaterEqual(seen['queued_at'], before)
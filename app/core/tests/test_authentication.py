@@ -0,0 +1,108 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from core.authentication import CachedTokenAuthentication, TokenCache, get_token_cache
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        get_token_cache().clear() # the cache lives for the whole process; start every test empty
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_second_lookup_skips_the_database(self):
+        """Only the first request with a token queries authtoken_token"""
+        with self.assertNumQueries(1):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(cached_user, self.user)
+        self.assertEqual(cached_token.key, self.token.key)
+
+    def test_deleted_token_is_evicted(self):
+        """A deleted token stops working even though it was cached"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user_is_evicted(self):
+        """Flipping is_active off drops the user's cached tokens"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_invalid_token_is_not_cached(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials('not-a-real-token')
+        self.assertEqual(len(get_token_cache()), 0)
+
+
+class TokenCacheTests(TestCase):
+
+    def test_least_recently_used_token_is_evicted(self):
+        """The LRU never grows past max_size"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', 'token a')
+        cache.set('b', 'token b')
+        cache.get('a') # 'b' is now the least recently used
+        cache.set('c', 'token c')
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'token a')
+
+    def test_expired_entries_are_misses(self):
+        cache = TokenCache(ttl=-1) # everything is already expired
+        cache.set('a', 'token a')
+        self.assertIsNone(cache.get('a'))
+
+    def test_shared_tier_is_used_on_local_miss(self):
+        """Another process filling the shared cache saves us the lookup"""
+        writer = TokenCache(alias='default')
+        reader = TokenCache(alias='default')
+        writer.set('a', 'token a')
+
+        self.assertEqual(reader.get('a'), 'token a')
+        writer.delete('a')
+        reader.clear()
+        self.assertIsNone(reader.get('a'))
+
+    def test_revocation_reaches_other_processes(self):
+        """Deleting a user's tokens in one process stops another serving its local copy"""
+        saver = TokenCache(alias='default')
+        worker = TokenCache(alias='default')
+        token = Token(key='a', user_id=1)
+        worker.set('a', token)
+
+        saver.delete_user(1, keys=['a'])
+
+        self.assertIsNone(worker.get('a'))
+        self.assertEqual(len(worker), 0)
+
+    def test_token_revoked_during_the_lookup_is_not_cached(self):
+        cache = TokenCache(alias='default')
+        generation = cache.generation()
+        TokenCache(alias='default').delete('b') # another process revokes meanwhile
+
+        cache.set('a', Token(key='a', user_id=1), generation)
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_local_copies_expire_after_local_ttl(self):
+        """Without a shared tier, LOCAL_TTL bounds how long another process trusts a revoked token"""
+        cache = TokenCache(ttl=60, local_ttl=-1)
+        cache.set('a', 'token a')
+
+        self.assertIsNone(cache.get('a'))
@@ -1,14 +1,25 @@
 # import the patch function from the unit test . mock module
     # lets us mock the behavior of the django get db method
-from unittest.mock import patch
-
-from django.core.management import call_command
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command, CommandError
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.db.migrations.loader import MigrationLoader
 
 #import the error django throws when db is unavailable & will use it to simulate the data being available when we run our command
 from django.db.utils import OperationalError
 
 # import our test case
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from core.management.commands.migrate_if_needed import disk_migrations
 
 
 
@@ -31,13 +42,16 @@ class CommandTests(TestCase):
             # mock the behavior of __getitem__ by using the patch; as a variable called 'gi' (like get item)
 
             # the way u mock the behavior of a function is you just do:
-            gi.return_value = True # means that whenever this is called during our test execution, instead of actually performing what's done in line 24, we'll override it and replace it with a mock object to just return true & we'll monitor how many times it was called & the different calls that were made to it
+            gi.return_value = MagicMock() # a fake connection whose cursor() happily runs our probe query; means that whenever this is called during our test execution, instead of actually performing what's done in line 24, we'll override it and replace it with a mock object to just return true & we'll monitor how many times it was called & the different calls that were made to it
 
             #test our call command
             call_command('wait_for_db')
 
             # in assertion, just test the __getitem__ was called once
             self.assertEqual(gi.call_count, 1)
+            # & that we really ran a query on it instead of just looking the connection up
+            cursor = gi.return_value.cursor.return_value.__enter__.return_value
+            cursor.execute.assert_called_once_with('SELECT 1')
             # we'll simulate the databse being available & not being available for when we test our command
 
 
@@ -54,6 +68,177 @@ class CommandTests(TestCase):
             # instead of adding a return value; adding a side effect - part of unit test mock module
                 # can add a side effect to the method ur mocking
                     # we'll make it raise an error 5 times but not on the 6th, then call should complete
-            gi.side_effect = [OperationalError] * 5 + [True] # raises error for first 5 times; + [True] means no error on 6th
+            gi.side_effect = [OperationalError] * 5 + [MagicMock()] # raises error for first 5 times; a working connection on the 6th
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+        # sub-second retries that back off exponentially (with jitter, so between half & all of the delay)
+        pauses = [c[0][0] for c in ts.call_args_list]
+        self.assertEqual(len(pauses), 5)
+        for pause, delay in zip(pauses, [0.1, 0.2, 0.4, 0.8, 1.6]):
+            self.assertTrue(delay / 2 <= pause <= delay)
+
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_times_out(self, ts):
+        """The command gives up (with an error exit) once --timeout has passed"""
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0.01, interval=1)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_waits_forever_by_default(self, ts):
+        """Without --timeout the command keeps trying, however long the db takes (ie. a big restore)"""
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi, \
+                patch('time.monotonic', side_effect=range(0, 10 ** 6, 60)): # a minute passes between retries
+            gi.side_effect = [OperationalError] * 30 + [MagicMock()]
+            call_command('wait_for_db')
+            self.assertEqual(gi.call_count, 31)
+
+    def test_wait_for_db_unknown_database(self):
+        """A misspelled --database is a plain error, not a traceback from a probe thread"""
+        with self.assertRaisesMessage(CommandError, "The connection nope doesn't exist"):
+            call_command('wait_for_db', databases=['nope'])
+
+
+
+
+class ProvisionUsersTests(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_users_created_from_csv(self):
+        """Every new email becomes a user with a working password"""
+        path = self.write('users.csv', 'email,name,password\na@javid.com,A,password123\nb@Javid.com,B,\n')
+        call_command('provision_users', path, processes=1, stdout=StringIO())
+
+        a = get_user_model().objects.get(email='a@javid.com')
+        self.assertEqual(a.name, 'A')
+        self.assertTrue(a.check_password('password123'))
+        b = get_user_model().objects.get(email='b@javid.com') # domain is normalized like create_user
+        self.assertFalse(b.has_usable_password())
+
+    def test_existing_and_repeated_emails_skipped(self):
+        get_user_model().objects.create_user('a@javid.com', 'password123')
+        path = self.write('users.jsonl', '{"email": "a@javid.com"}\n{"email": "c@javid.com"}\n{"email": "c@javid.com"}\n')
+        call_command('provision_users', path, processes=1, stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+
+    def test_emails_differing_only_in_case_skipped(self):
+        """The LOWER(email) unique index would refuse them & lose the whole batch"""
+        get_user_model().objects.create_user('Known@javid.com', 'password123')
+        path = self.write('users.csv', 'email\nBob@javid.com\nbob@javid.com\nKNOWN@javid.com\n')
+        out = StringIO()
+        call_command('provision_users', path, processes=1, stdout=out)
+
+        emails = get_user_model().objects.order_by('id').values_list('email', flat=True)
+        self.assertEqual(list(emails), ['Known@javid.com', 'Bob@javid.com'])
+        self.assertIn('1 created, 2 skipped', out.getvalue())
+
+    def test_resumes_from_checkpoint(self):
+        """Rows before the checkpoint aren't read again"""
+        path = self.write('users.csv', 'email\na@javid.com\nb@javid.com\nc@javid.com\n')
+        self.write('users.csv.checkpoint', '2')
+        call_command('provision_users', path, processes=1, stdout=StringIO())
+
+        emails = get_user_model().objects.values_list('email', flat=True)
+        self.assertEqual(list(emails), ['c@javid.com'])
+        with open(path + '.checkpoint') as f:
+            self.assertEqual(f.read(), '3')
+
+
+class BenchApiTests(TestCase):
+
+    def setUp(self):
+        # like django's test client: don't let the end of each request close the test's connection
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def bench(self, *args):
+        out = StringIO()
+        call_command(
+            'bench_api', '--users', '3', '--tags', '2', '--ingredients', '2', '--requests', '5',
+            '--warmup', '1', '--alloc-requests', '1', *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_results_saved_as_json(self):
+        path = os.path.join(self.tmp, 'run.json')
+        self.bench('--output', path)
+
+        with open(path) as f:
+            run = json.load(f)
+        self.assertEqual(set(run['scenarios']), {
+            'user_create', 'token_auth', 'tag_list', 'ingredient_list', 'tag_create', 'ingredient_create',
+        })
+        for stats in run['scenarios'].values():
+            self.assertEqual(stats['count'], 5)
+            self.assertEqual(stats['errors'], 0)
+            self.assertIn('queries_per_request', stats)
+            self.assertIn('alloc_peak_kb', stats)
+        self.assertFalse(get_user_model().objects.filter(email__endswith='@bench.invalid').exists())
+
+    def test_regression_against_baseline_fails(self):
+        path = os.path.join(self.tmp, 'baseline.json')
+        with open(path, 'w') as f:
+            json.dump({'scenarios': {'tag_list': {
+                'throughput': 1e9, 'p50_ms': 1e-9, 'p99_ms': 1e-9, 'queries_per_request': 0, 'alloc_peak_kb': 0,
+            }}}, f)
+
+        with self.assertRaisesMessage(CommandError, 'p50 regressed'):
+            self.bench('--scenario', 'tag_list', '--baseline', path, '--max-regression', '10')
+
+
+class ServeTests(TestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refuses_several_workers_with_a_per_process_version_cache(self):
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        with self.settings(METRICS_DIR=metrics_dir.name), patch('core.management.commands.serve.Application') as application:
+            with self.assertRaisesMessage(CommandError, 'per process LocMemCache'):
+                call_command('serve', workers=2)
+            call_command('serve', workers=1)
+
+        application.return_value.run.assert_called_once_with()
+
+
+class MigrateIfNeededTests(TestCase):
+
+    def migrate_if_needed(self):
+        out = StringIO()
+        with patch('core.management.commands.migrate_if_needed.call_command') as migrate:
+            call_command('migrate_if_needed', stdout=out)
+        return migrate, out.getvalue()
+
+    def test_finds_the_same_migrations_as_django(self):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+
+        self.assertEqual(disk_migrations(), set(loader.disk_migrations))
+
+    def test_up_to_date_database_is_not_migrated(self):
+        migrate, out = self.migrate_if_needed()
+
+        migrate.assert_not_called()
+        self.assertIn('up to date', out)
+
+    @patch('core.management.commands.migrate_if_needed.disk_migrations')
+    def test_pending_migration_is_applied(self, disk):
+        disk.return_value = {('core', '9999_not_applied_yet')}
+
+        migrate, _ = self.migrate_if_needed()
+
+        migrate.assert_called_once()
+        self.assertEqual(migrate.call_args[0], ('migrate',))
@@ -0,0 +1,129 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase
+
+from core.bloom import BloomFilter
+from core.emails import EmailIndex
+from core.testing import QueryBudgetMixin
+
+
+class BloomFilterTests(SimpleTestCase):
+
+    def test_added_items_are_always_found(self):
+        bloom = BloomFilter(1000)
+        emails = ['user%d@javid.com' % i for i in range(1000)]
+        for email in emails:
+            bloom.add(email)
+
+        self.assertTrue(all(email in bloom for email in emails))
+
+    def test_false_positives_stay_near_the_error_rate(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add('user%d@javid.com' % i)
+
+        false_positives = sum('other%d@javid.com' % i in bloom for i in range(10000))
+
+        self.assertLess(false_positives, 300) # ~100 expected
+
+    def test_full(self):
+        bloom = BloomFilter(2)
+        for item in 'abc':
+            bloom.add(item)
+
+        self.assertTrue(bloom.full)
+
+
+class EmailIndexTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.User = get_user_model()
+        self.User.objects.create_user('Known@javid.com', 'password123')
+        self.index = EmailIndex(capacity=100, refresh=60)
+        self.index.build()
+
+    def test_new_email_is_free_without_a_query(self):
+        with self.assertMaxQueries(0):
+            self.assertFalse(self.index.is_taken('new@javid.com'))
+
+    def test_taken_email_ignores_case(self):
+        self.assertTrue(self.index.is_taken('known@JAVID.com'))
+        self.assertTrue(self.index.is_taken(' KNOWN@javid.com '))
+
+    def test_added_email_is_taken(self):
+        self.User.objects.create_user('added@javid.com', 'password123')
+        self.index.add('added@javid.com')
+
+        self.assertTrue(self.index.is_taken('added@javid.com'))
+
+    def test_catches_up_with_users_created_elsewhere(self):
+        # bulk_create sends no post_save - like a user created by another process
+        self.User.objects.bulk_create([self.User(email='elsewhere@javid.com')])
+        self.assertFalse(self.index.is_taken('elsewhere@javid.com')) # not looked since the build
+
+        self.index.refresh = 0
+        self.assertTrue(self.index.is_taken('elsewhere@javid.com'))
+
+    def test_full_filter_is_rebuilt_in_the_background(self):
+        self.index.capacity = 1
+        self.index.build(force=True)
+        self.index.add('one@javid.com')
+        self.index.add('two@javid.com')
+
+        with mock.patch.object(self.index, 'start_build') as start_build, self.assertMaxQueries(0):
+            self.assertTrue(self.index.might_exist('one@javid.com')) # the full one still answers
+        start_build.assert_called_once_with()
+
+        self.index.build() # what the background thread runs
+        self.assertGreaterEqual(self.index.filter.capacity, 2)
+        self.assertFalse(self.index.filter.full)
+
+    def test_build_skipped_when_the_filter_is_fine(self):
+        # ie. the threads that waited on the lock while another one built it
+        with self.assertMaxQueries(0):
+            self.index.build()
+
+    def test_database_answers_until_the_filter_is_built(self):
+        index = EmailIndex(capacity=100, refresh=60)
+
+        with mock.patch.object(index, 'start_build') as start_build:
+            with self.assertNumQueries(2): # one lookup per check - neither waits for a scan
+                self.assertTrue(index.is_taken('KNOWN@javid.com'))
+                self.assertFalse(index.is_taken('new@javid.com'))
+
+        self.assertIsNone(index.filter)
+        self.assertEqual(start_build.call_count, 2)
+
+    def test_start_build_runs_one_thread_at_a_time(self):
+        index = EmailIndex(capacity=100, refresh=60)
+        building = threading.Event()
+        # (the thread has a connection of its own, which can't see this test's transaction)
+        with mock.patch.object(index, 'build', side_effect=lambda: building.wait(5)) as build:
+            thread = index.start_build()
+            self.assertIs(index.start_build(), thread) # still running
+            building.set()
+            thread.join()
+
+        build.assert_called_once_with()
+        self.assertNotEqual(thread.ident, threading.get_ident())
+
+    def test_failed_build_is_retried_later(self):
+        index = EmailIndex(capacity=100, refresh=60)
+        with mock.patch.object(index, 'build', side_effect=DatabaseError('gone')) as build:
+            with self.assertLogs('core.emails', 'ERROR'):
+                index.start_build().join()
+            index.start_build().join() # too soon - the same (finished) thread
+
+        self.assertEqual(build.call_count, 1)
+
+
+class EmailUniqueIndexTests(TestCase):
+
+    def test_emails_differing_only_in_case_are_refused(self):
+        get_user_model().objects.create_user('test@javid.com', 'password123')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            get_user_model().objects.create_user('TEST@javid.com', 'password123')
@@ -0,0 +1,68 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from core.hashers import hash_password, verify_password
+
+try:
+    import argon2
+except ImportError: # argon2-cffi is optional
+    argon2 = None
+
+
+class HashersTests(TestCase):
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_pbkdf2_cost_comes_from_settings(self):
+        encoded = hash_password('password123')
+
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(verify_password('password123', encoded), (True, False))
+        self.assertEqual(verify_password('wrong', encoded), (False, False))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_hashing_inline_without_workers(self):
+        """0 workers hashes on the calling thread"""
+        encoded = hash_password('password123')
+
+        self.assertEqual(verify_password('password123', encoded)[0], True)
+
+    def test_hash_is_upgraded_on_login(self):
+        """A hash made with an old cost is rehashed the next time the password is checked"""
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = get_user_model().objects.create_user('test@javid.com', 'password123')
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertTrue(user.check_password('password123'))
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_wrong_password_is_not_upgraded(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        old_hash = user.password
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertFalse(user.check_password('wrong'))
+
+        user.refresh_from_db()
+        self.assertEqual(user.password, old_hash)
+
+    @skipUnless(argon2, 'argon2-cffi is not installed')
+    def test_users_move_to_argon2(self):
+        """Switching PASSWORD_HASHER to argon2 migrates pbkdf2 users when they log in"""
+        user = get_user_model().objects.create_user('test@javid.com', 'password123')
+
+        argon2_first = [
+            'core.hashers.Argon2PasswordHasher',
+            'core.hashers.PBKDF2PasswordHasher',
+        ]
+        argon2_costs = {'TIME_COST': 1, 'MEMORY_COST': 256, 'PARALLELISM': 1}
+        with self.settings(PASSWORD_HASHERS=argon2_first, PASSWORD_ARGON2=argon2_costs):
+            self.assertTrue(user.check_password('password123'))
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('argon2$'))
+            self.assertIn('m=256,t=1,p=1', user.password)
+            self.assertTrue(user.check_password('password123'))
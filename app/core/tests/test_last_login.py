@@ -0,0 +1,93 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core import last_login
+from core.last_login import LastLoginBuffer
+from core.testing import QueryBudgetMixin
+
+
+class LastLoginBufferTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user('user%d@javid.com' % i, 'password123') for i in range(3)
+        ]
+        self.buffer = LastLoginBuffer(flush_interval=60, max_size=10)
+        patcher = patch.object(LastLoginBuffer, 'start') # no background thread in these tests
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+
+    def last_logins(self):
+        return [get_user_model().objects.get(pk=user.pk).last_login for user in self.users]
+
+    def test_flush_writes_everyone_in_one_update(self):
+        for i, user in enumerate(self.users):
+            self.buffer.record(user.pk, self.now + timedelta(seconds=i))
+
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.buffer.flush(), 3)
+
+        self.assertEqual(self.last_logins(), [self.now + timedelta(seconds=i) for i in range(3)])
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_repeated_logins_are_coalesced(self):
+        user = self.users[0]
+        self.buffer.record(user.pk, self.now)
+        self.buffer.record(user.pk, self.now + timedelta(seconds=5))
+        self.buffer.record(user.pk, self.now + timedelta(seconds=2)) # arrived late, older
+
+        self.assertEqual(len(self.buffer), 1)
+        self.buffer.flush()
+        self.assertEqual(self.last_logins()[0], self.now + timedelta(seconds=5))
+
+    def test_full_buffer_flushes_itself(self):
+        self.buffer.max_size = 2
+        self.buffer.record(self.users[0].pk, self.now)
+        self.assertEqual(len(self.buffer), 1)
+
+        self.buffer.record(self.users[1].pk, self.now)
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.last_logins()[:2], [self.now, self.now])
+
+    def test_failed_flush_keeps_the_logins(self):
+        self.buffer.record(self.users[0].pk, self.now)
+
+        with patch.object(LastLoginBuffer, 'write', side_effect=OperationalError('gone')), \
+                self.assertLogs('core.last_login', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(self.buffer.pending, {self.users[0].pk: self.now})
+
+    def test_login_inside_a_transaction_is_written_straight_away(self):
+        user = self.users[0]
+
+        last_login.record_login(None, user)
+
+        self.assertIsNotNone(self.last_logins()[0])
+
+
+class RecordLoginTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.buffer = LastLoginBuffer(flush_interval=60)
+        for patcher in (patch.object(last_login, '_buffer', self.buffer), patch.object(LastLoginBuffer, 'start')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_login_is_written_by_the_next_flush(self):
+        self.client.force_login(self.user)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+        self.buffer.flush()
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
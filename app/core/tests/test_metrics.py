@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from core.metrics import Counter, Histogram, Registry
+from core.models import Tag
+from recipe.serializers import TagSerializer
+
+
+TAGS_URL = reverse('recipe:tag-list')
+METRICS_URL = reverse('metrics')
+
+
+class HistogramTests(SimpleTestCase):
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram('latency', 'Latency', (0.1, 1), ('view',))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, 'tags')
+
+        lines = list(histogram.collect())
+
+        self.assertIn('latency_bucket{view="tags",le="0.1"} 2', lines)
+        self.assertIn('latency_bucket{view="tags",le="1"} 3', lines)
+        self.assertIn('latency_bucket{view="tags",le="+Inf"} 4', lines)
+        self.assertIn('latency_sum{view="tags"} 3.65', lines)
+        self.assertIn('latency_count{view="tags"} 4', lines)
+
+    def test_counter_escapes_labels(self):
+        counter = Counter('hits', 'Hits', ('path',))
+        counter.inc('say "hi"', amount=2)
+
+        self.assertIn('hits{path="say \\"hi\\""} 2', list(counter.collect()))
+
+
+class SharedRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.registry = Registry()
+        self.counter = self.registry.register(Counter('hits', 'Hits', ('view',)))
+        self.histogram = self.registry.register(Histogram('latency', 'Latency', (0.1, 1)))
+        self.registry.share(self.directory, interval=3600)
+
+    def other_process(self, pid, hits):
+        """Leave the file another worker would have written"""
+        path = os.path.join(self.directory, 'metrics-%d-0000.json' % pid)
+        self.registry.write(path, {'hits': {('tags',): hits}, 'latency': {(): [1, 0, 0, 0.05]}})
+        return path
+
+    def test_numbers_of_all_processes_are_added_up(self):
+        self.counter.inc('tags', amount=2)
+        self.histogram.observe(0.5)
+        self.other_process(os.getppid(), 3)
+
+        lines = self.registry.expose().splitlines()
+
+        self.assertIn('hits{view="tags"} 5', lines)
+        self.assertIn('latency_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{le="1"} 2', lines)
+        self.assertIn('latency_count 2', lines)
+
+    def test_exited_processes_are_archived_not_forgotten(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], stdout=subprocess.PIPE)
+        path = self.other_process(int(exited.stdout), 3)
+        self.counter.inc('tags')
+
+        self.registry.expose()
+        self.counter.inc('tags')
+        lines = self.registry.expose().splitlines()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertIn('hits{view="tags"} 5', lines) # 3 archived + 2 of this process, counted once
+
+
+class MetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['recipe_responses'].clear()
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        res = self.client.get(TAGS_URL)
+
+        timing = res['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_serializer_data_counts_as_serialize_time(self):
+        Tag.objects.create(user=self.user, name='Vegan')
+        request = RequestFactory().get('/')
+        request._metrics_serialize = 0.0
+
+        TagSerializer(Tag.objects.all(), many=True, context={'request': Request(request)}).data
+
+        self.assertGreater(request._metrics_serialize, 0)
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        res = self.client.get(TAGS_URL)
+
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    def test_requests_show_up_on_the_metrics_endpoint(self):
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        body = res.content.decode()
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn('api_requests_total{view="recipe:tag-list",method="GET",status="200"}', body)
+        self.assertIn('api_request_queries_count{view="recipe:tag-list",method="GET"}', body)
+        self.assertIn('api_response_size_bytes_bucket{view="recipe:tag-list",method="GET",le="+Inf"}', body)
+        self.assertIn('api_request_serialize_seconds_count{view="recipe:tag-list",method="GET"}', body)
+        self.assertIn('api_request_render_seconds_count{view="recipe:tag-list",method="GET"}', body)
+        self.assertIn('recipe_response_cache_misses_total', body)
+
+    @override_settings(METRICS_ACCESS={'ALLOWED_NETWORKS': ['10.0.0.0/8'], 'TOKEN': 's3cret'})
+    def test_metrics_endpoint_is_not_public(self):
+        self.assertEqual(self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7').status_code, 403)
+        self.assertEqual(
+            self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403
+        )
+
+        self.assertEqual(self.client.get(METRICS_URL, REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.assertEqual(
+            self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200
+        )
@@ -0,0 +1,109 @@
+from unittest import mock
+
+import psycopg2
+from django.test import SimpleTestCase
+
+from core.db.backends.postgresql_pool.base import check_connection
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            conn = FakeConnection()
+            self.opened.append(conn)
+            return conn
+
+        return ConnectionPool(
+            connect=connect,
+            check=lambda conn, idle_for: conn.healthy,
+            reset=lambda conn: not conn.closed,
+            **kwargs
+        )
+
+    def test_released_connection_is_reused(self):
+        """A connection given back is handed out again instead of opening a new one"""
+        pool = self.make_pool()
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_unhealthy_connection_is_replaced(self):
+        """A connection failing the health check is closed & never handed out"""
+        pool = self.make_pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.healthy = False
+
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+
+    def test_pool_size_is_bounded(self):
+        """Once max_size connections are out, acquire waits & then times out"""
+        pool = self.make_pool(max_size=2, timeout=0.01)
+        pool.acquire()
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+    def test_old_connections_are_recycled(self):
+        pool = self.make_pool(max_lifetime=-1) # every connection is already too old
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.idle_count, 0)
+
+    def test_close_closes_idle_connections(self):
+        pool = self.make_pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        pool.close()
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.idle_count, 0)
+
+
+class CheckConnectionTests(SimpleTestCase):
+
+    def make_connection(self, error=None):
+        conn = mock.MagicMock(closed=0)
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.execute.side_effect = error
+        return conn, cursor
+
+    def test_connection_used_moments_ago_is_pinged(self):
+        """By default even a connection given back a moment ago is pinged before it's reused"""
+        conn, cursor = self.make_connection()
+
+        self.assertTrue(check_connection(conn, idle_for=0.001))
+        cursor.execute.assert_called_once_with('SELECT 1')
+
+    def test_connection_to_a_restarted_server_fails_the_check(self):
+        """The socket of a restarted server still looks open; only the ping catches it"""
+        conn, _ = self.make_connection(psycopg2.OperationalError('server closed the connection'))
+
+        self.assertFalse(check_connection(conn, idle_for=0.001))
+
+    def test_check_interval_skips_the_ping(self):
+        conn, cursor = self.make_connection()
+
+        self.assertTrue(check_connection(conn, idle_for=1, check_interval=30))
+        cursor.execute.assert_not_called()
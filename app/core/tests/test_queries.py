@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import path, reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag
+from core.queries import capture_queries, shape
+from core.testing import QueryBudgetMixin
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ShapeTests(SimpleTestCase):
+
+    def test_values_are_stripped(self):
+        self.assertEqual(
+            shape("SELECT * FROM t WHERE id = 1 AND name = 'it''s'"),
+            shape("SELECT * FROM t WHERE id = 22 AND name = 'other'"),
+        )
+
+    def test_in_lists_collapse(self):
+        self.assertEqual(shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'), 'SELECT * FROM t WHERE id IN (...)')
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['recipe_responses'].clear()
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [Tag.objects.create(user=self.user, name='Tag %d' % i) for i in range(5)]
+
+    def test_recorder_flags_repeated_shapes(self):
+        with capture_queries() as queries:
+            for tag in self.tags:
+                Tag.objects.get(pk=tag.pk)
+
+        self.assertEqual(len(queries), 5)
+        self.assertEqual(list(queries.repeated().values()), [5])
+
+    def test_budget_catches_n_plus_one(self):
+        with self.assertRaisesMessage(AssertionError, 'possible N+1'):
+            with self.assertMaxQueries(10):
+                for tag in self.tags:
+                    tag.user = get_user_model().objects.get(pk=tag.user_id)
+
+    def test_budget_catches_too_many_queries(self):
+        with self.assertRaisesMessage(AssertionError, 'Expected at most 1 queries, got 2'):
+            with self.assertMaxQueries(1):
+                Tag.objects.count()
+                list(Tag.objects.all())
+
+    def test_tag_list_budget(self):
+        """Listing tags costs one query however many tags there are"""
+        with self.assertMaxQueries(1):
+            self.client.get(TAGS_URL)
+
+
+def n_plus_one(request):
+    names = [tag.user.email for tag in Tag.objects.all()] # one user query per tag
+    return HttpResponse(', '.join(names))
+
+
+urlpatterns = [path('tags/', n_plus_one)]
+
+
+@override_settings(ROOT_URLCONF=__name__, DEBUG=True, QUERY_INSPECTOR_REPEATS=2)
+class QueryInspectorMiddlewareTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        for name in ('Vegan', 'Dessert', 'Brunch'):
+            Tag.objects.create(user=user, name=name)
+
+    def test_logs_repeated_queries_with_the_stack(self):
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            self.client.get('/tags/')
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('ran the same query 3 times', logs.output[0])
+        self.assertIn('in n_plus_one', logs.output[0])
@@ -0,0 +1,66 @@
+import json
+from collections import OrderedDict
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+
+from core.parsers import JSONParser
+from core.renderers import JSONRenderer, StreamingJSONRenderer
+
+
+DATA = OrderedDict([
+    ('results', [OrderedDict([('id', 1), ('name', 'Crème brûlée\u2028')])]),
+    ('price', Decimal('1.50')),
+    ('next', None),
+])
+
+
+class JSONRendererTests(SimpleTestCase):
+
+    def test_same_bytes_as_drf(self):
+        self.assertEqual(JSONRenderer().render(DATA), renderers.JSONRenderer().render(DATA))
+
+    def test_falls_back_without_orjson(self):
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(JSONRenderer().render(DATA), renderers.JSONRenderer().render(DATA))
+
+    def test_indent_is_left_to_drf(self):
+        content = JSONRenderer().render({'a': 1}, 'application/json; indent=4')
+
+        self.assertEqual(content, b'{\n    "a": 1\n}')
+
+    def test_stream_is_one_json_document(self):
+        renderer = StreamingJSONRenderer()
+        renderer.chunk_size = 20 # a few items per chunk
+        items = ({'id': i, 'name': 'Item %d' % i} for i in range(10))
+
+        chunks = list(renderer.stream(items, OrderedDict([('next', None)])))
+
+        self.assertGreater(len(chunks), 3)
+        document = json.loads(b''.join(chunks).decode())
+        self.assertIsNone(document['next'])
+        self.assertEqual([item['id'] for item in document['results']], list(range(10)))
+
+    def test_stream_empty_list(self):
+        chunks = StreamingJSONRenderer().stream(iter(()))
+
+        self.assertEqual(b''.join(chunks), b'{"results":[]}')
+
+
+class JSONParserTests(SimpleTestCase):
+
+    def test_parses(self):
+        self.assertEqual(JSONParser().parse(BytesIO(b'[{"name": "Kale"}]')), [{'name': 'Kale'}])
+
+    def test_invalid_json(self):
+        with self.assertRaises(ParseError):
+            JSONParser().parse(BytesIO(b'{"name": '))
+
+    def test_falls_back_without_orjson(self):
+        with patch('core.parsers.orjson', None):
+            self.assertEqual(JSONParser().parse(BytesIO(b'{"name": "Kale"}')), {'name': 'Kale'})
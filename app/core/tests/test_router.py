@@ -0,0 +1,148 @@
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db import router
+from core.middleware import ReplicaPinMiddleware
+from core.models import Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+EXPORT_URL = reverse('recipe:export')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_MAX_LAG=5, REPLICA_CHECK_INTERVAL=60)
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.lags = {'replica1': 0.5, 'replica2': 0.5}
+        self.check = MagicMock(side_effect=lambda alias: self.lags[alias])
+        patcher = patch.object(router, 'monitor', router.ReplicaMonitor(check=self.check))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        router.reset_state()
+        self.addCleanup(router.reset_state)
+        self.router = router.ReplicaRouter()
+
+    def test_reads_go_to_replicas(self):
+        self.assertIn(self.router.db_for_read(Tag), ('replica1', 'replica2'))
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Tag), 'default')
+
+    def test_lagging_replicas_are_skipped(self):
+        self.lags['replica1'] = 30
+
+        self.assertEqual({self.router.db_for_read(Tag) for _ in range(20)}, {'replica2'})
+
+    def test_primary_when_no_replica_is_usable(self):
+        self.check.side_effect = [30, DatabaseError('down')] # replica1 lags, replica2 is down
+
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_lag_is_checked_once_per_interval(self):
+        for _ in range(5):
+            self.router.db_for_read(Tag)
+
+        self.assertEqual(self.check.call_count, 2) # once per replica
+
+    def test_reads_after_a_write_go_to_primary(self):
+        self.router.db_for_write(Tag)
+
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_pinned_client_reads_from_primary(self):
+        router.state.pinned = True
+
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_related_objects_follow_their_parent(self):
+        tag = Tag(name='Vegan')
+        tag._state.db = 'replica2'
+
+        self.assertEqual(self.router.db_for_read(Tag, instance=tag), 'replica2')
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_default(self):
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaPinMiddlewareTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['recipe_responses'].clear()
+        # TestCase runs everything in a transaction (which reads from the primary anyway);
+            # the middleware & its pins are what's under test here
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.key = ReplicaPinMiddleware(None).client_key(
+            MagicMock(META={'HTTP_AUTHORIZATION': 'Token ' + self.token.key}, COOKIES={})
+        )
+
+    def test_refuses_a_per_process_cache(self):
+        """Pins in one worker's memory wouldn't keep the client's next request off the replicas"""
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pins'}
+        with self.settings(CACHES=dict(settings.CACHES, pins=local), REPLICA_PIN_CACHE_ALIAS='pins'):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaPinMiddleware(None)
+
+    def test_write_pins_the_client(self):
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertTrue(caches['default'].get(self.key))
+
+    def test_read_does_not_pin(self):
+        self.client.get(TAGS_URL)
+
+        self.assertIsNone(caches['default'].get(self.key))
+
+    def test_pinned_request_reads_from_primary(self):
+        caches['default'].set(self.key, True)
+        seen = []
+        original = router.ReplicaRouter.db_for_read
+
+        def spy(self, model, **hints):
+            seen.append(router.state.pinned)
+            return original(self, model, **hints)
+
+        with patch.object(router.ReplicaRouter, 'db_for_read', spy):
+            self.client.get(TAGS_URL, {'page_size': 7})
+
+        self.assertTrue(seen)
+        self.assertTrue(all(seen))
+
+    def test_pinned_client_streams_from_primary(self):
+        """Streamed rows are read after the middleware is done - the pin must still apply to them"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        caches['default'].set(self.key, True)
+        seen = []
+        original = router.ReplicaRouter.db_for_read
+
+        def spy(self, model, **hints):
+            seen.append(router.state.pinned)
+            return original(self, model, **hints)
+
+        with patch.object(router.ReplicaRouter, 'db_for_read', spy):
+            for url in (TAGS_URL + '?format=json-stream', EXPORT_URL):
+                res = self.client.get(url)
+                b''.join(res.streaming_content) # sent after the middleware returned
+
+        self.assertTrue(seen)
+        self.assertTrue(all(seen))
@@ -0,0 +1,67 @@
+import importlib
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import Resolver404, resolve
+
+from core.startup import parse_importtime
+
+
+IMPORTTIME = '''import time: self [us] | cumulative | imported package
+import time:       201 |        201 |     rest_framework.utils
+import time:      1152 |       1353 |   rest_framework.serializers
+import time:       533 |       1886 | user.views
+'''
+
+
+class ParseImporttimeTests(SimpleTestCase):
+
+    def test_modules_with_self_and_cumulative_seconds(self):
+        self.assertEqual(parse_importtime(IMPORTTIME), [
+            ('rest_framework.utils', 0.000201, 0.000201),
+            ('rest_framework.serializers', 0.001152, 0.001353),
+            ('user.views', 0.000533, 0.001886),
+        ])
+
+    def test_other_output_ignored(self):
+        self.assertEqual(parse_importtime('Traceback (most recent call last):\n'), [])
+
+
+class ProfileStartupTests(SimpleTestCase):
+
+    def test_reports_phases_apps_and_imports(self):
+        out = StringIO()
+
+        call_command('profile_startup', runs=1, top=5, stdout=out)
+
+        report = out.getvalue()
+        for line in ('process (wall clock)', 'apps', 'urls', 'warm_up', 'slowest imports', 'imports by package'):
+            self.assertIn(line, report)
+        self.assertRegex(report, r'\ncore +[\d.]+ +[\d.]+ +[\d.]+\n') # import, models & ready of the core app
+
+
+class ApiSettingsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.settings_api = importlib.import_module('app.settings_api')
+
+    def test_admin_apps_and_browser_middleware_left_out(self):
+        for app in ('django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages'):
+            self.assertNotIn(app, self.settings_api.INSTALLED_APPS)
+        self.assertIn('core', self.settings_api.INSTALLED_APPS)
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', self.settings_api.MIDDLEWARE)
+        self.assertIn('core.middleware.MetricsMiddleware', self.settings_api.MIDDLEWARE)
+
+    def test_json_and_token_auth_only(self):
+        rest_framework = self.settings_api.REST_FRAMEWORK
+        self.assertEqual(rest_framework['DEFAULT_RENDERER_CLASSES'], ('core.renderers.JSONRenderer',))
+        self.assertEqual(rest_framework['DEFAULT_AUTHENTICATION_CLASSES'], (
+            'core.authentication.CachedTokenAuthentication',
+        ))
+        self.assertIn('signup', rest_framework['DEFAULT_THROTTLE_RATES']) # the rest is kept
+
+    def test_api_urls_without_admin(self):
+        self.assertEqual(resolve('/api/user/create/', 'app.urls_api').url_name, 'create')
+        with self.assertRaises(Resolver404):
+            resolve('/admin/', 'app.urls_api')
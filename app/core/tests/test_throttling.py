@@ -0,0 +1,210 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import throttling
+from core.middleware import LoadSheddingMiddleware
+
+
+CREATE_USER_URL = reverse('user:create')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def rates(**scopes):
+    return override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=scopes))
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('10/min'), (10, 60))
+        self.assertEqual(throttling.parse_rate('3/s'), (3, 1))
+
+    def test_take_refills_over_time(self):
+        tokens, wait = throttling.take(0.0, 100.0, 100.5, capacity=10, per_second=2)
+
+        self.assertEqual((tokens, wait), (0.0, 0.0)) # half a second refilled exactly one token
+
+    def test_take_never_overfills(self):
+        tokens, _ = throttling.take(5.0, 0.0, 1000.0, capacity=10, per_second=2)
+
+        self.assertEqual(tokens, 9.0)
+
+    def test_empty_bucket_says_how_long_to_wait(self):
+        tokens, wait = throttling.take(0.5, 0.0, 0.0, capacity=10, per_second=2)
+
+        self.assertEqual((tokens, wait), (0.5, 0.25))
+
+    def test_memory_store_allows_a_burst_then_the_rate(self):
+        store = throttling.MemoryBucketStore()
+        waits = [store.consume('client', 3, 1.0) for _ in range(4)]
+
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        self.assertGreater(waits[3], 0.9)
+        self.assertEqual(store.consume('someone else', 3, 1.0), 0.0)
+
+    def test_memory_store_forgets_the_least_recent_client(self):
+        store = throttling.MemoryBucketStore(max_size=2)
+        for key in ('a', 'b', 'c'):
+            store.consume(key, 1, 1.0)
+
+        self.assertEqual(list(store._buckets), ['b', 'c'])
+
+    def test_cache_store_shares_buckets(self):
+        caches['default'].clear()
+        first, second = throttling.CacheBucketStore('default'), throttling.CacheBucketStore('default')
+
+        self.assertEqual(first.consume('client', 1, 0.1), 0.0)
+        self.assertGreater(second.consume('client', 1, 0.1), 9) # the other "worker" sees it
+
+
+class ThrottleApiTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['recipe_responses'].clear()
+        patcher = patch.object(throttling, '_store', throttling.MemoryBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    @rates(signup='2/min')
+    def test_signups_are_throttled_per_ip(self):
+        statuses = [
+            self.client.post(CREATE_USER_URL, {'email': 'test%d@javid.com' % i, 'password': 'pass123', 'name': 'Test'}).status_code
+            for i in range(3)
+        ]
+        other = self.client.post(
+            CREATE_USER_URL, {'email': 'other@javid.com', 'password': 'pass123', 'name': 'Test'}, REMOTE_ADDR='10.0.0.2'
+        )
+
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(other.status_code, 201)
+        self.assertFalse(get_user_model().objects.filter(email='test2@javid.com').exists())
+
+    @rates(signup='1/min')
+    def test_throttled_response_says_when_to_retry(self):
+        self.client.post(CREATE_USER_URL, {'email': 'test@javid.com', 'password': 'pass123', 'name': 'Test'})
+        res = self.client.post(CREATE_USER_URL, {'email': 'test2@javid.com', 'password': 'pass123', 'name': 'Test'})
+
+        self.assertEqual(res.status_code, 429)
+        self.assertIn(res['Retry-After'], ('59', '60'))
+
+    @rates(create='1/min', create_ip='100/min')
+    def test_creates_are_throttled_per_user_but_reads_are_not(self):
+        user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+
+        self.assertEqual(self.client.post(TAGS_URL, {'name': 'Vegan'}).status_code, 201)
+        self.assertEqual(self.client.post(TAGS_URL, {'name': 'Dessert'}).status_code, 429)
+        self.assertEqual(self.client.get(TAGS_URL).status_code, 200)
+
+    @rates()
+    def test_scope_without_a_rate_is_not_throttled(self):
+        for i in range(3):
+            res = self.client.post(CREATE_USER_URL, {'email': 'test%d@javid.com' % i, 'password': 'pass123', 'name': 'Test'})
+            self.assertEqual(res.status_code, 201)
+
+
+LIMITS = {
+    'MAX_IN_FLIGHT': 2, 'MAX_WRITES_IN_FLIGHT': 1, 'MAX_QUEUE_WAIT': 1.0,
+    'REQUEST_START_HEADER': 'X-Request-Start', 'MAX_LATENCY': 2.0, 'RETRY_AFTER': 3,
+}
+
+
+@override_settings(LOAD_SHED=LIMITS)
+class LoadSheddingMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = LoadSheddingMiddleware(MagicMock(return_value=HttpResponse('ok')))
+
+    def test_passes_requests_through(self):
+        res = self.middleware(self.factory.get('/'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.middleware.in_flight, 0)
+
+    def test_sheds_over_the_concurrency_limit(self):
+        self.middleware.in_flight = 2
+
+        res = self.middleware(self.factory.get('/'))
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res['Retry-After'], '3')
+        self.middleware.get_response.assert_not_called()
+
+    def test_writes_have_their_own_smaller_limit(self):
+        self.middleware.in_flight = self.middleware.writes_in_flight = 1
+
+        self.assertEqual(self.middleware(self.factory.post('/')).status_code, 503)
+        self.assertEqual(self.middleware(self.factory.get('/')).status_code, 200)
+
+    def test_slow_server_sheds_writes_only(self):
+        self.middleware.average_seconds = 5.0
+        self.middleware.finished_at = time.monotonic()
+
+        self.assertEqual(self.middleware(self.factory.post('/')).status_code, 503)
+        self.assertEqual(self.middleware(self.factory.get('/')).status_code, 200)
+
+    def test_stale_average_does_not_shed(self):
+        self.middleware.average_seconds = 5.0
+        self.middleware.finished_at = time.monotonic() - 60
+
+        self.assertEqual(self.middleware(self.factory.post('/')).status_code, 200)
+
+    def test_sheds_requests_that_waited_too_long_for_a_thread(self):
+        request = self.factory.get('/')
+        request.META['core.queued_at'] = time.monotonic() - 5
+
+        self.assertEqual(self.middleware(request).status_code, 503)
+
+    def test_sheds_requests_a_proxy_says_waited_too_long(self):
+        """gthread's queue is only visible through the proxy's X-Request-Start"""
+        for start in ('t=%.3f' % (time.time() - 5), '%d' % ((time.time() - 5) * 1e6)): # seconds, microseconds
+            request = self.factory.get('/', HTTP_X_REQUEST_START=start)
+            self.assertEqual(self.middleware(request).status_code, 503)
+
+        fresh = self.factory.get('/', HTTP_X_REQUEST_START='t=%d' % (time.time() * 1000)) # milliseconds
+        self.assertEqual(self.middleware(fresh).status_code, 200)
+
+    @override_settings(LOAD_SHED=dict(LIMITS, MAX_IN_FLIGHT=None, MAX_WRITES_IN_FLIGHT=None), SERVER_THREADS=4)
+    def test_limits_default_to_the_thread_count(self):
+        middleware = LoadSheddingMiddleware(None)
+
+        self.assertEqual((middleware.limits['MAX_IN_FLIGHT'], middleware.limits['MAX_WRITES_IN_FLIGHT']), (4, 2))
+
+    @override_settings(LOAD_SHED=dict(LIMITS, MAX_IN_FLIGHT=None, MAX_WRITES_IN_FLIGHT=None), SERVER_THREADS=None)
+    def test_off_outside_serve_unless_configured(self):
+        """runserver has a thread per request - 4 busy threads aren't a reason to turn the 5th away"""
+        with self.assertRaises(MiddlewareNotUsed):
+            LoadSheddingMiddleware(None)
+
+        with self.settings(LOAD_SHED=dict(LIMITS, MAX_IN_FLIGHT=6, MAX_WRITES_IN_FLIGHT=None)):
+            middleware = LoadSheddingMiddleware(None)
+        self.assertEqual((middleware.limits['MAX_IN_FLIGHT'], middleware.limits['MAX_WRITES_IN_FLIGHT']), (6, 3))
+
+    @override_settings(LOAD_SHED=dict(LIMITS, REQUEST_START_HEADER=None))
+    def test_ignores_request_start_header_unless_configured(self):
+        """Without a proxy known to set it, X-Request-Start is whatever the client sent"""
+        middleware = LoadSheddingMiddleware(MagicMock(return_value=HttpResponse('ok')))
+        request = self.factory.get('/', HTTP_X_REQUEST_START='t=%.3f' % (time.time() - 60))
+
+        self.assertEqual(middleware(request).status_code, 200)
+
+    def test_counts_out_failed_requests(self):
+        self.middleware.get_response.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            self.middleware(self.factory.post('/'))
+        self.assertEqual((self.middleware.in_flight, self.middleware.writes_in_flight), (0, 0))
@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.test import TestCase
+
+from rest_framework.settings import api_settings
+
+from core.models import Tag
+from core.warmup import warm_up
+
+
+class WarmUpTests(TestCase):
+
+    def test_model_field_caches_are_filled(self):
+        apps.clear_cache() # what a fresh worker starts with
+
+        count = warm_up()
+
+        self.assertEqual(count, len(apps.get_models()))
+        for cached in ('fields', 'related_objects', 'fields_map', '_relation_tree'):
+            self.assertIn(cached, Tag._meta.__dict__)
+
+    def test_drf_settings_are_loaded_without_queries(self):
+        api_settings.reload()
+
+        with self.assertNumQueries(0):
+            warm_up()
+
+        self.assertIn('EXCEPTION_HANDLER', api_settings._cached_attrs)
+        self.assertIn('UNAUTHENTICATED_USER', api_settings._cached_attrs)
@@ -0,0 +1,171 @@
+"""Token bucket throttles for the expensive endpoints (signing up & creating objects)"""
+# every client (a user, or an IP address) gets a bucket per scope holding up to N tokens:
+    # each request takes a token & the bucket refills at N per period, so a client can burst N
+    # requests at once & then keeps going at the steady rate - over it they get a 429 with
+    # Retry-After set to when the next token arrives
+# rates are the usual DRF "<requests>/<s|m|h|d>" strings in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'];
+    # a scope without a rate (or an empty one) isn't throttled at all
+# buckets live in this process (MemoryBucketStore) unless settings.THROTTLE_CACHE_ALIAS names a
+    # cache shared by every worker (CacheBucketStore) - with N workers & in-process buckets a
+    # client really gets N times the rate
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core import metrics
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60): bucket size & the seconds it takes to refill it"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def take(tokens, updated, now, capacity, per_second):
+    """Refill a bucket up to now & try to take one token; returns (tokens left, seconds to wait)"""
+    tokens = min(capacity, tokens + (now - updated) * per_second)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / per_second
+
+
+class MemoryBucketStore:
+    """Buckets in a bounded LRU dict inside this process"""
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._buckets = OrderedDict() # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, per_second):
+        """Take a token from the key's bucket; returns 0 if allowed, else the seconds to wait"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now)) # new clients start full
+            tokens, wait = take(tokens, updated, now, capacity, per_second)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                # the least recently seen client - a forgotten bucket just starts full again
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """Buckets in a django cache shared by all the workers (ie. memcached)"""
+    # read, refill & write back isn't atomic, so a client racing itself across workers can
+        # sneak an extra request or two through - fine for throttling, and no locks on the hot path
+
+    key_prefix = 'throttle:'
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, capacity, per_second):
+        cache = caches[self.alias]
+        now = time.time() # wall clock, the workers may be on different machines
+        tokens, updated = cache.get(self.key_prefix + key) or (capacity, now)
+        tokens, wait = take(tokens, updated, now, capacity, per_second)
+        # once it would have refilled completely the bucket is the same as a new one
+        cache.set(self.key_prefix + key, (tokens, now), int(capacity / per_second) + 1)
+        return wait
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    """The process wide bucket store, built from settings on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                alias = settings.THROTTLE_CACHE_ALIAS
+                _store = CacheBucketStore(alias) if alias else MemoryBucketStore()
+    return _store
+
+
+class BucketThrottle(BaseThrottle):
+    """Base token bucket throttle; subclasses set scope & say whose bucket a request uses"""
+
+    scope = None
+    methods = None # only throttle these HTTP methods (None: all of them)
+
+    def get_rate(self):
+        # looked up on every request (not once at import) so override_settings works
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_ident_key(self, request):
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        rate = self.get_rate()
+        if not rate or (self.methods is not None and request.method not in self.methods):
+            return True
+        capacity, period = parse_rate(rate)
+        key = '%s:%s' % (self.scope, self.get_ident_key(request))
+        wait = get_bucket_store().consume(key, capacity, capacity / period)
+        if wait:
+            self.wait_seconds = wait
+            metrics.throttled_total.inc(self.scope)
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPBucketThrottle(BucketThrottle):
+    """One bucket per client IP address (see NUM_PROXIES in the DRF settings when behind a proxy)"""
+
+    def get_ident_key(self, request):
+        return 'ip:%s' % self.get_ident(request)
+
+
+class UserBucketThrottle(BucketThrottle):
+    """One bucket per user (anonymous requests share one per IP address)"""
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return 'user:%s' % request.user.pk
+        return 'ip:%s' % self.get_ident(request)
+
+
+class SignupThrottle(IPBucketThrottle):
+    # every signup hashes a password (the slowest thing the API does), so a burst of them
+        # from one address would tie up the workers
+    scope = 'signup'
+
+
+class EmailCheckThrottle(IPBucketThrottle):
+    # keeps the availability check from being used to test a whole list of emails
+    scope = 'email_check'
+
+
+class CreateUserThrottle(UserBucketThrottle):
+    scope = 'create'
+    methods = ('POST',)
+
+
+class CreateIPThrottle(IPBucketThrottle):
+    # catches one address spreading its creates over many accounts
+    scope = 'create_ip'
+    methods = ('POST',)
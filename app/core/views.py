@@ -0,0 +1,30 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core.metrics import registry
+
+
+def metrics(request):
+    """The request metrics of this process, in the Prometheus text format"""
+    # only for the scraper (settings.METRICS_ACCESS) - the numbers show which views are slow,
+        # which is all an attacker needs to pick the endpoint to flood
+    if not can_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def can_scrape(request):
+    """True if the request carries the scrape token or comes from an allowed network"""
+    token = settings.METRICS_ACCESS['TOKEN']
+    if token:
+        scheme, _, given = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(given.encode(), token.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ACCESS['ALLOWED_NETWORKS'])
@@ -0,0 +1,31 @@
+"""Do the lazy, one-off work of a worker's first request before it takes traffic"""
+# only what outlives a request is worth doing here - ie. a serializer's .fields are built
+    # again for every serializer instance, so building them once up front saves nothing
+from django.apps import apps
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve, reverse
+
+
+def warm_up():
+    """Fill the process wide caches a worker's first requests would otherwise fill
+
+    Returns the number of models whose field caches were filled.
+    """
+    resolver = get_resolver()
+    resolver.reverse_dict # compiles every url regex & fills the reverse() lookup tables
+
+    # the field lookups cached on every model's _meta - serializers, querysets & the admin all
+        # go through them; the reverse ones (related_objects) walk all the models the first time
+    models = apps.get_models()
+    for model in models:
+        opts = model._meta
+        opts.get_fields()
+        opts.fields, opts.concrete_fields, opts.many_to_many, opts.related_objects, opts.fields_map
+        opts._forward_fields_map, opts.managers_map
+
+    # one request through DRF, straight to the view (not counted in the metrics): the settings
+        # it only imports on first use (the exception handler, the anonymous user...) & the
+        # translation catalog of the error message are loaded & kept
+    request = RequestFactory().get(reverse('recipe:tag-list')) # no credentials - a 401, no queries
+    resolve(request.path).func(request).render()
+    return len(models)
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class RecipeConfig(AppConfig):
+    name = 'recipe'
+
+    def ready(self):
+        # importing the module connects the receivers that bump the list versions (& through
+            # recipe.caching registers the response cache counters on the metrics endpoint)
+        from recipe import signals  # noqa: F401
+
+        # at startup, not as a side effect of importing recipe.search - that's only imported by
+            # the first ?q= request (see BaseRecipeAttrViewSet.search_list)
+        from django.db.models import CharField
+        from recipe.lookups import ILikePrefix
+        CharField.register_lookup(ILikePrefix)
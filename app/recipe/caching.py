@@ -0,0 +1,122 @@
+"""Per-user collection versions & rendered response cache for the tag & ingredient lists"""
+# every time one of a user's tags (or ingredients) is created, changed or deleted we bump
+    # that user's version of the collection. The version lives in the cache named by
+    # settings.RECIPE_CACHE_ALIAS, so checking "has anything changed?" never touches the db
+# that cache must be shared by every server process (the default one is - see CACHES in
+    # settings): with a per process locmem cache, the workers that didn't handle the write would
+    # keep answering 304 Not Modified & serving their cached pages; serve refuses to run more than
+    # one worker with one
+import hashlib
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from core.metrics import Counter, registry
+
+
+# on the metrics endpoint (core/metrics.py) - added up over all the server processes
+cache_hits_total = registry.register(Counter('recipe_response_cache_hits_total', 'Response cache hits'))
+cache_misses_total = registry.register(Counter('recipe_response_cache_misses_total', 'Response cache misses'))
+
+
+def get_cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def version_key(model, user_id):
+    return 'recipe:version:%s:%s' % (model._meta.label_lower, user_id)
+
+
+def bump_version(model, user_id):
+    """Mark a user's collection of model objects as changed; returns the new version"""
+    cache = get_cache()
+    key = version_key(model, user_id)
+    previous = cache.get(key)
+    # Last-Modified only has 1 second resolution, so never hand out the same second twice
+        # or a client that only sends If-Modified-Since could miss a change
+    modified = math.ceil(time.time())
+    if previous is not None:
+        modified = max(modified, previous[1] + 1)
+    version = (uuid.uuid4().hex, modified)
+    cache.set(key, version, None) # never expires; it's replaced on the next change
+    return version
+
+
+def get_version(model, user_id):
+    """Return (version tag, last modified unix time) of a user's collection of model objects"""
+    version = get_cache().get(version_key(model, user_id))
+    if version is None:
+        # nothing cached (first use, restart or eviction) - start a new version, which
+            # just means clients re-download the list once
+        version = bump_version(model, user_id)
+    return version
+
+
+def list_digest(version, full_path, media_type):
+    """Identifies one representation (page, query string, format) of a version of a list"""
+    return hashlib.md5('{}|{}|{}'.format(version, full_path, media_type).encode()).hexdigest()
+
+
+class ResponseCache:
+    """Rendered list responses, keyed by user + representation (version, url & format)"""
+    # the collection version is part of every key, so bumping it (any create/update/delete)
+        # invalidates all of the user's cached pages at once; the stale entries just expire
+    # the bytes live in the cache named by settings.RECIPE_RESPONSE_CACHE_ALIAS - a locmem
+        # cache per process by default, or point it at a shared one (ie. memcached)
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_cache(self):
+        return caches[settings.RECIPE_RESPONSE_CACHE_ALIAS]
+
+    def key(self, model, user_id, digest):
+        return 'recipe:response:%s:%s:%s' % (model._meta.label_lower, user_id, digest)
+
+    def get(self, model, user_id, digest):
+        """Return a ready to send HttpResponse, or None on a miss"""
+        cached = self.get_cache().get(self.key(model, user_id, digest))
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                cache_misses_total.inc()
+                return None
+            self.hits += 1
+            cache_hits_total.inc()
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def set(self, model, user_id, digest, response):
+        """Store a rendered response's bytes"""
+        self.get_cache().set(
+            self.key(model, user_id, digest),
+            (response.content, response['Content-Type']),
+            settings.RECIPE_RESPONSE_CACHE_TTL,
+        )
+
+    def stats(self):
+        """Hit/miss counters of this process"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+response_cache = ResponseCache()
+
@@ -0,0 +1,96 @@
+"""Answer repeat tag/ingredient list requests from the ASGI event loop (see core/asgi.py)"""
+# most list requests are a client re-checking a list it already has (If-None-Match) or
+    # asking for a page someone just rendered; both can be answered from caches alone:
+    # token -> user (the in-process token LRU), user -> version (recipe/caching.py) &
+    # version -> rendered bytes (the response cache) - so no thread & no db is needed
+# anything else (a cache miss, a non-JSON Accept, ?format=, If-Modified-Since on its own ...)
+    # returns None & goes through django as usual, which also fills the caches for next time
+# NOTE: the version & response lookups are cache calls; with a shared cache (ie. memcached)
+    # they're short blocking network round trips on the loop - set ASGI_FAST_PATH=0 if that hurts
+import time
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.encoding import escape_uri_path, iri_to_uri
+from django.utils.http import http_date
+
+from core import metrics
+from core.authentication import get_token_cache
+from core.models import Ingredient, Tag
+from recipe.caching import get_version, list_digest, response_cache
+
+
+JSON_ACCEPTS = ('', '*/*', 'application/json') # Accept headers DRF answers with application/json
+
+_routes = None
+
+
+def header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def list_routes():
+    """path -> (model, url name) of the list endpoints (built on first use)"""
+    global _routes
+    if _routes is None:
+        _routes = {
+            reverse('recipe:tag-list'): (Tag, 'recipe:tag-list'),
+            reverse('recipe:ingredient-list'): (Ingredient, 'recipe:ingredient-list'),
+        }
+    return _routes
+
+
+def cached_list(scope):
+    """(status, headers, body) for a list request the caches can answer, else None"""
+    if scope['method'] != 'GET' or not settings.ASGI_FAST_PATH:
+        return None
+    route = list_routes().get(scope['path'])
+    if route is None:
+        return None
+    model, view_name = route
+    start = time.perf_counter()
+
+    query = scope.get('query_string', b'').decode('latin-1')
+    if 'format=' in query or (header(scope, b'accept') or '').strip() not in JSON_ACCEPTS:
+        return None # content negotiation is left to DRF
+    authorization = (header(scope, b'authorization') or '').split()
+    if len(authorization) != 2 or authorization[0] != 'Token':
+        return None
+    token = get_token_cache().get_local(authorization[1])
+    if token is None:
+        return None
+
+    # the same ETag the view would compute (BaseRecipeAttrViewSet.list)
+    version, modified = get_version(model, token.user_id)
+    full_path = escape_uri_path(scope['path']) + ('?' + iri_to_uri(query) if query else '')
+    digest = list_digest(version, full_path, 'application/json')
+    etag = '"%s"' % digest
+    headers = [
+        (b'etag', etag.encode()),
+        (b'last-modified', http_date(modified).encode()),
+        (b'vary', b'Accept, Authorization'),
+        (b'x-frame-options', settings.X_FRAME_OPTIONS.encode()),
+    ]
+
+    if_none_match = header(scope, b'if-none-match')
+    if if_none_match is not None and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        status, content = 304, b''
+    else:
+        cached = response_cache.get(model, token.user_id, digest)
+        if cached is None:
+            return None
+        status, content = 200, cached.content
+        headers += [
+            (b'content-type', cached['Content-Type'].encode()),
+            (b'content-length', str(len(content)).encode()),
+            (b'x-cache', b'HIT'),
+        ]
+
+    labels = (view_name, 'GET')
+    metrics.requests_total.inc(*labels, status)
+    metrics.request_seconds.observe(time.perf_counter() - start, *labels)
+    metrics.response_bytes.observe(len(content), *labels)
+    return status, headers, content
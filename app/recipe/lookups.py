@@ -0,0 +1,15 @@
+"""Extra field lookups (registered in RecipeConfig.ready())"""
+from django.db.models import Lookup
+
+
+class ILikePrefix(Lookup):
+    """name__ilike_prefix='to' -> name ILIKE 'to%' (which a trigram index can serve)"""
+    lookup_name = 'ilike_prefix'
+
+    def get_db_prep_lookup(self, value, connection):
+        return ('%s', [connection.ops.prep_for_like_query(value) + '%'])
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s ILIKE %s' % (lhs, rhs), lhs_params + rhs_params
@@ -0,0 +1,133 @@
+"""Keyset (aka cursor / seek) pagination for the tag & ingredient lists"""
+# OFFSET pagination makes the db walk & throw away every row before the page, and rows
+    # inserted while a client pages through shift everything over (duplicates/skips)
+# instead the cursor remembers the name of the last row the client saw & the next page is
+    # "the next page_size rows after that name" - with the unique (user, name) index that's a
+    # short index range scan (no sort) no matter how deep into the list the client is
+import base64
+import json
+from collections import OrderedDict
+
+from django.db import connections
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginates on a unique ordering (ie. ('-name',)) with opaque cursors"""
+
+    # the last field must be unique so the key never ties - a name is unique within the one
+        # user's list that's paginated ((user, name) is unique)
+    ordering = ('-name',)
+    page_size = api_settings.PAGE_SIZE or 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        reverse, key = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            # walking backwards: flip the ordering, then flip the page back afterwards
+            ordering = tuple(self.flip(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if key is not None:
+            queryset = self.after(queryset, ordering, key)
+
+        rows = list(queryset[:self.page_size + 1]) # one extra row tells us if there's more
+        more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        # going forwards there's a previous page if we came from a cursor & vice versa
+        self.has_next = more if not reverse else key is not None
+        self.has_previous = key is not None if not reverse else more
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.page[0])
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def after(queryset, ordering, key):
+        """queryset narrowed to the rows that come after key in ordering
+
+        ie. for ('-name', '-id'): WHERE (name, id) < (key name, key id)
+        """
+        # one row value comparison rather than name < x OR (name = x AND id < y) - the planner
+            # turns it into a single range of an index on (filter columns, *ordering), read in order
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError('Keyset ordering must be all ascending or all descending: %r' % (ordering,))
+        opts = queryset.model._meta
+        qn = connections[queryset.db].ops.quote_name
+        columns = ', '.join(
+            '%s.%s' % (qn(opts.db_table), qn(opts.get_field(field.lstrip('-')).column)) for field in ordering
+        )
+        placeholders = ', '.join(['%s'] * len(key))
+        operator = '<' if descending.pop() else '>'
+        return queryset.extra(where=['(%s) %s (%s)' % (columns, operator, placeholders)], params=list(key))
+
+    def position(self, instance):
+        if isinstance(instance, dict): # a row from .values() (the list view's fast path)
+            return [instance[field.lstrip('-')] for field in self.ordering]
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, reverse, instance):
+        payload = json.dumps([reverse, self.position(instance)]).encode()
+        cursor = base64.urlsafe_b64encode(payload).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Return (reverse, key) from the request's cursor, (False, None) for the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            reverse, key = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if isinstance(key, list) and len(key) == 2 and type(key[1]) is int:
+            key = key[:1] # handed out while the ordering was (-name, -id) - the name is enough
+        if not isinstance(key, list) or len(key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # a hand made cursor can hold anything - a name that isn't a string would otherwise
+            # blow up inside the query as a 500
+        if not all(isinstance(name, str) for name in key):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), key
@@ -0,0 +1,123 @@
+"""Ranked prefix + fuzzy (trigram) search over a user's tags or ingredients"""
+# on postgres the (user_id, name) pg_trgm GIN indexes (core migration 0009) answer both halves
+    # of the query, reading only the searching user's entries:
+    # user_id = u AND (name ILIKE 'q%'  (prefix / autocomplete)   OR   name % 'q'  (trigram similarity >= 0.3))
+    # (name__ilike_prefix is registered in recipe/apps.py)
+# every other database (ie. sqlite in tests) gets an in-memory index per user instead, built
+    # from one query & reused until the user's collection version changes (recipe/caching.py)
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from recipe.caching import get_version
+
+
+SIMILARITY_THRESHOLD = 0.3 # same as pg_trgm's default similarity_threshold
+
+
+def trigrams(text):
+    """The set of trigrams of text, the way pg_trgm makes them"""
+    grams = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """pg_trgm's similarity() of two trigram sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MemoryIndex:
+    """Sorted names for prefix lookups + an inverted trigram index for fuzzy ones"""
+
+    def __init__(self, rows):
+        self.entries = sorted((name.lower(), pk, name) for pk, name in rows)
+        self.keys = [entry[0] for entry in self.entries]
+        self.names = {pk: name for _, pk, name in self.entries}
+        self.grams = {}
+        self.postings = {} # trigram -> ids of the names that contain it
+        for _, pk, name in self.entries:
+            grams = self.grams[pk] = trigrams(name)
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(pk)
+
+    def search(self, query, limit):
+        """Return up to limit ids, best match first"""
+        lowered = query.lower()
+        prefix = set()
+        for i in range(bisect_left(self.keys, lowered), len(self.keys)):
+            if not self.keys[i].startswith(lowered):
+                break
+            prefix.add(self.entries[i][1])
+
+        query_grams = trigrams(query)
+        candidates = set(prefix)
+        for gram in query_grams:
+            candidates.update(self.postings.get(gram, ()))
+
+        ranked = []
+        for pk in candidates:
+            score = similarity(query_grams, self.grams[pk])
+            if pk in prefix or score >= SIMILARITY_THRESHOLD:
+                ranked.append((pk not in prefix, -score, self.names[pk], pk))
+        ranked.sort()
+        return [pk for *_, pk in ranked[:limit]]
+
+
+class MemoryIndexCache:
+    """One MemoryIndex per (model, user), rebuilt when the collection version changes"""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, queryset, model, user_id):
+        key = (model._meta.label_lower, user_id)
+        version = get_version(model, user_id)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == version:
+                self._indexes.move_to_end(key)
+                return cached[1]
+
+        index = MemoryIndex(queryset.values_list('pk', 'name'))
+        with self._lock:
+            self._indexes[key] = (version, index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_size:
+                self._indexes.popitem(last=False)
+        return index
+
+
+memory_indexes = MemoryIndexCache()
+
+
+def search(queryset, user_id, query, limit):
+    """Return up to limit objects of the user's queryset that match query, best match first"""
+    if connections[queryset.db].vendor == 'postgresql':
+        prefix = Case(
+            When(name__ilike_prefix=query, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        matches = queryset.filter(
+            Q(name__ilike_prefix=query) | Q(name__trigram_similar=query)
+        ).annotate(
+            is_prefix=prefix,
+            similarity=TrigramSimilarity('name', query),
+        ).order_by('-is_prefix', '-similarity', 'name', 'pk')
+        return list(matches[:limit])
+
+    ids = memory_indexes.get(queryset, queryset.model, user_id).search(query, limit)
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
@@ -0,0 +1,101 @@
+from functools import lru_cache
+
+from django.db import IntegrityError, transaction
+
+from rest_framework import serializers
+
+from core.models import Tag, Ingredient
+from core.serializers import TimedDataMixin
+
+
+class BulkCreateListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """Saves a whole list of objects with one bulk INSERT inside a transaction"""
+    # used when a JSON array is posted to the create endpoint (many=True)
+        # validation errors come back as a list lined up with the posted items - ie.
+        # [{}, {'name': ['This field may not be blank.']}] means item 1 failed
+    # names the user already has (or that are repeated in the same batch) aren't inserted
+        # again; the existing object is returned in their place, so re-posting the same
+        # pantry is idempotent - also when two posts race, as (user, name) is unique in the db
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        with transaction.atomic():
+            by_user = {}
+            for attrs in validated_data:
+                by_user.setdefault(attrs['user'], []).append(attrs)
+            objects = {}
+            for user, items in by_user.items():
+                objects.update(self.create_for_user(model, user, items))
+        return [objects[(attrs['user'].pk, attrs['name'])] for attrs in validated_data]
+
+    def create_for_user(self, model, user, items):
+        """Return {(user id, name): object} for items, inserting the missing ones"""
+        names = {attrs['name'] for attrs in items}
+        existing = {obj.name: obj for obj in model.objects.filter(user=user, name__in=names)}
+
+        new = {}
+        for attrs in items:
+            if attrs['name'] not in existing and attrs['name'] not in new:
+                new[attrs['name']] = model(**attrs)
+        if new:
+            try:
+                with transaction.atomic(): # a savepoint - create() already runs in a transaction
+                    model.objects.bulk_create(new.values(), batch_size=500)
+            except IntegrityError:
+                # a concurrent (or retried) request inserted some of these names since we
+                    # looked & the unique (user, name) constraint refused the batch - insert
+                    # one at a time, keeping the rows that are already there
+                for attrs in items:
+                    model.objects.get_or_create(
+                        user=user, name=attrs['name'],
+                        defaults={k: v for k, v in attrs.items() if k not in ('user', 'name')},
+                    )
+            # re-select everything: not every database hands back the new ids & after a
+                # conflict some of the rows are someone else's inserts
+            existing = {obj.name: obj for obj in model.objects.filter(user=user, name__in=names)}
+        return {(user.pk, name): obj for name, obj in existing.items()}
+
+
+class NamedObjectSerializer(TimedDataMixin, serializers.ModelSerializer):
+    """Creates through get_or_create - (user, name) is unique, so a repeated name returns the existing object"""
+
+    def create(self, validated_data):
+        model = self.Meta.model
+        attrs = dict(validated_data)
+        obj, _ = model.objects.get_or_create(user=attrs.pop('user'), name=attrs.pop('name'), defaults=attrs)
+        return obj
+
+
+@lru_cache(maxsize=None)
+def read_fields(serializer_class):
+    """The columns to fetch with .values() to list objects without the serializer
+
+    None if any field is more than a plain model column (a source, a method field...)
+    """
+    # the list view then builds each row's dict straight from the db values, skipping the
+        # per object model instance + per field to_representation() calls of the serializer
+    fields = serializer_class().fields
+    for name, field in fields.items():
+        if type(field) not in (serializers.IntegerField, serializers.CharField) or field.source != name:
+            return None
+    return tuple(fields)
+
+
+class TagSerializer(NamedObjectSerializer):
+    """Serializer for tag objects"""
+
+    class Meta:
+        model = Tag
+        fields = ('id', 'name')
+        read_only_fields = ('id',) # the id is generated by the db; the user is taken from the request
+        list_serializer_class = BulkCreateListSerializer
+
+
+class IngredientSerializer(NamedObjectSerializer):
+    """Serializer for ingredient objects"""
+
+    class Meta:
+        model = Ingredient
+        fields = ('id', 'name')
+        read_only_fields = ('id',)
+        list_serializer_class = BulkCreateListSerializer
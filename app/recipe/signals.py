@@ -0,0 +1,20 @@
+"""Keep the per-user collection versions (recipe/caching.py) up to date"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient
+
+from recipe.caching import bump_version
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_collection_version(sender, instance, **kwargs):
+    """Any change to a tag/ingredient changes the owner's list"""
+    # only once the change is committed: bumped earlier, a list request in between would read
+        # the old rows & cache them under the new version, where they'd stay until the next change
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_version(sender, user_id))
@@ -0,0 +1,80 @@
+import csv
+import gzip
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Tag
+
+
+EXPORT_URL = reverse('recipe:export')
+
+
+class PublicExportApiTests(TestCase):
+
+    def test_login_required(self):
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateExportApiTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.kale = Ingredient.objects.create(user=self.user, name='Kale, curly')
+        other = get_user_model().objects.create_user('other@javid.com', 'password123')
+        Tag.objects.create(user=other, name='Not mine')
+
+    def test_export_ndjson(self):
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'type': 'tag', 'id': self.vegan.id, 'name': 'Vegan'},
+            {'type': 'ingredient', 'id': self.kale.id, 'name': 'Kale, curly'},
+        ])
+
+    def test_export_csv(self):
+        res = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('recipe-export.csv', res['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(b''.join(res.streaming_content).decode())))
+        self.assertEqual(rows, [
+            ['type', 'id', 'name'],
+            ['tag', str(self.vegan.id), 'Vegan'],
+            ['ingredient', str(self.kale.id), 'Kale, curly'],
+        ])
+
+    def test_export_gzipped(self):
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        lines = gzip.decompress(b''.join(res.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_export_streams_in_chunks(self):
+        """Rows go out a chunk at a time instead of as one big body"""
+        Ingredient.objects.bulk_create(
+            Ingredient(user=self.user, name='Ingredient %d' % i) for i in range(3000)
+        )
+
+        res = self.client.get(EXPORT_URL)
+
+        chunks = list(res.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks).count(b'\n'), 3002)
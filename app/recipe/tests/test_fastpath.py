@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import get_token_cache
+from core.models import Tag
+from core.testing import OnCommitMixin
+
+from recipe.fastpath import cached_list
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class CachedListTests(OnCommitMixin, TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['recipe_responses'].clear()
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.token = Token.objects.create(user=self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def scope(self, query=b'', headers=()):
+        return {
+            'type': 'http', 'method': 'GET', 'path': TAGS_URL, 'query_string': query,
+            'headers': [(b'authorization', ('Token ' + self.token.key).encode())] + list(headers),
+        }
+
+    def test_serves_rendered_page_from_cache(self):
+        """Once django has rendered a page, the same request is answered without it"""
+        self.assertIsNone(cached_list(self.scope(b'page_size=5')))
+        res = self.client.get(TAGS_URL, {'page_size': 5})
+
+        status, headers, content = cached_list(self.scope(b'page_size=5'))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(content, res.content)
+        self.assertIn((b'etag', res['ETag'].encode()), headers)
+        self.assertIn((b'x-cache', b'HIT'), headers)
+
+    def test_not_modified(self):
+        res = self.client.get(TAGS_URL)
+
+        status, _, content = cached_list(self.scope(headers=[(b'if-none-match', res['ETag'].encode())]))
+
+        self.assertEqual(status, 304)
+        self.assertEqual(content, b'')
+
+    def test_changed_list_goes_to_django(self):
+        self.client.get(TAGS_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Dessert')
+
+        self.assertIsNone(cached_list(self.scope()))
+
+    def test_unknown_token_goes_to_django(self):
+        self.client.get(TAGS_URL)
+        get_token_cache().clear()
+
+        self.assertIsNone(cached_list(self.scope()))
+
+    def test_other_formats_go_to_django(self):
+        self.client.get(TAGS_URL, {'format': 'json'})
+
+        self.assertIsNone(cached_list(self.scope(b'format=json')))
+        self.assertIsNone(cached_list(self.scope(headers=[(b'accept', b'text/html')])))
+
+    @override_settings(ASGI_FAST_PATH=False)
+    def test_can_be_turned_off(self):
+        self.client.get(TAGS_URL)
+
+        self.assertIsNone(cached_list(self.scope()))
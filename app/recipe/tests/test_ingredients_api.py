@@ -0,0 +1,150 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Manager
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient
+
+
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class PublicIngredientsApiTests(TestCase):
+    """Test the publicly available ingredients API"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_login_required(self):
+        """Test that login is required to access the endpoint"""
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateIngredientsApiTests(TestCase):
+    """Test the private ingredients API"""
+
+    def setUp(self):
+        caches['default'].clear() # cached list versions & pages of earlier tests
+        caches['recipe_responses'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@javid.com',
+            'password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_ingredients_limited_to_user(self):
+        """Test that only ingredients for the authenticated user are returned"""
+        other = get_user_model().objects.create_user('other@javid.com', 'testpass')
+        Ingredient.objects.create(user=other, name='Vinegar')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tumeric')
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
+
+    def test_create_ingredient_successful(self):
+        """Test creating a new ingredient"""
+        res = self.client.post(INGREDIENTS_URL, {'name': 'Cabbage'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Ingredient.objects.filter(user=self.user, name='Cabbage').exists())
+
+    def test_bulk_create_ingredients(self):
+        """Posting a JSON array creates every ingredient with a single INSERT"""
+        payload = [{'name': 'Salt'}, {'name': 'Pepper'}, {'name': 'Flour'}]
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(INGREDIENTS_URL, payload, format='json')
+
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['name'] for item in res.data], ['Salt', 'Pepper', 'Flour'])
+        self.assertTrue(all(item['id'] for item in res.data))
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_create_is_idempotent(self):
+        """Names the user already has (or repeats) are returned, not duplicated"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = [{'name': 'Salt'}, {'name': 'Sugar'}, {'name': 'Sugar'}]
+
+        res = self.client.post(INGREDIENTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['id'], salt.id)
+        self.assertEqual(res.data[1]['id'], res.data[2]['id'])
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_keeps_rows_inserted_concurrently(self):
+        """A name another request inserts between our lookup & our INSERT is returned, not duplicated"""
+        real_filter = Manager.filter
+        raced = []
+
+        def filter(manager, *args, **kwargs):
+            if manager.model is Ingredient and not raced:
+                # our lookup finds nothing, then the other request's INSERT lands
+                raced.append(Ingredient.objects.create(user=self.user, name='Salt'))
+                return manager.none()
+            return real_filter(manager, *args, **kwargs)
+
+        with patch.object(Manager, 'filter', autospec=True, side_effect=filter):
+            res = self.client.post(INGREDIENTS_URL, [{'name': 'Salt'}, {'name': 'Sugar'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['id'], raced[0].id)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+
+    def test_create_existing_name_returns_it(self):
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.post(INGREDIENTS_URL, {'name': 'Salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['id'], salt.id)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_errors_by_index(self):
+        """One invalid item rejects the whole batch & the error lines up with it"""
+        payload = [{'name': 'Salt'}, {'name': ''}]
+
+        res = self.client.post(INGREDIENTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('name', res.data[1])
+        self.assertFalse(Ingredient.objects.exists())
+
+    @override_settings(RECIPE_BULK_CREATE_MAX=2)
+    def test_bulk_create_size_is_limited(self):
+        payload = [{'name': 'Salt'}, {'name': 'Pepper'}, {'name': 'Flour'}]
+
+        res = self.client.post(INGREDIENTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_whole_list(self):
+        """?format=json-stream sends every ingredient, not just one page, as a streamed response"""
+        for i in range(5):
+            Ingredient.objects.create(user=self.user, name='Ingredient %d' % i)
+
+        res = self.client.get(INGREDIENTS_URL, {'format': 'json-stream', 'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        document = json.loads(b''.join(res.streaming_content).decode())
+        self.assertIsNone(document['next'])
+        self.assertEqual([item['name'] for item in document['results']], ['Ingredient %d' % i for i in range(4, -1, -1)])
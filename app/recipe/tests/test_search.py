@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import CharField
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient
+from core.testing import OnCommitMixin
+
+from recipe.lookups import ILikePrefix
+from recipe.search import MemoryIndex, similarity, trigrams
+
+
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class MemoryIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = MemoryIndex([
+            (1, 'Tomato'), (2, 'Tomatillo'), (3, 'Potato'), (4, 'Basil'), (5, 'Cherry tomato'),
+        ])
+
+    def test_trigram_similarity_matches_pg_trgm(self):
+        """similarity('tom', 'Tomato') is 3 shared trigrams out of 8 in postgres too"""
+        self.assertEqual(similarity(trigrams('tom'), trigrams('Tomato')), 3 / 8)
+
+    def test_prefix_matches_rank_first(self):
+        self.assertEqual(self.index.search('tom', 10), [1, 2])
+
+    def test_fuzzy_matches_typos(self):
+        # closest first: tomato (6 of 9 trigrams), tomatillo (5/13), cherry tomato (6/16)
+        self.assertEqual(self.index.search('tomatos', 10), [1, 2, 5])
+
+    def test_limit(self):
+        self.assertEqual(self.index.search('t', 1), [1])
+
+    def test_no_matches(self):
+        self.assertEqual(self.index.search('zucchini', 10), [])
+
+
+class ILikePrefixTests(SimpleTestCase):
+
+    def test_registered_at_startup(self):
+        """Available before (& without) the first search imports recipe.search"""
+        self.assertIs(CharField.get_lookups()['ilike_prefix'], ILikePrefix)
+
+    def test_sql(self):
+        sql = str(Ingredient.objects.filter(name__ilike_prefix='to_').query)
+
+        self.assertIn('"core_ingredient"."name" ILIKE to\\_%', sql)
+
+
+class IngredientSearchApiTests(OnCommitMixin, TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['recipe_responses'].clear()
+        self.user = get_user_model().objects.create_user('test@javid.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for name in ['Tomato', 'Tomatillo', 'Potato', 'Basil']:
+            Ingredient.objects.create(user=self.user, name=name)
+
+    def search(self, q):
+        res = self.client.get(INGREDIENTS_URL, {'q': q})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data['results']]
+
+    def test_search_ranks_prefix_matches(self):
+        self.assertEqual(self.search('tom'), ['Tomato', 'Tomatillo'])
+
+    def test_search_is_case_insensitive_and_fuzzy(self):
+        self.assertEqual(self.search('TOMATOS'), ['Tomato', 'Tomatillo'])
+
+    def test_search_limited_to_user(self):
+        other = get_user_model().objects.create_user('other@javid.com', 'password123')
+        Ingredient.objects.create(user=other, name='Tomato paste')
+
+        self.assertNotIn('Tomato paste', self.search('tomato'))
+
+    def test_search_sees_new_ingredients(self):
+        """The in-memory index is rebuilt once the user's ingredients change"""
+        self.search('bas')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(user=self.user, name='Basmati rice')
+
+        self.assertEqual(self.search('bas'), ['Basil', 'Basmati rice'])
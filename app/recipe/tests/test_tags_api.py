@@ -0,0 +1,248 @@
+import base64
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import _create_cache, caches
+from django.urls import reverse
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+
+from core.authentication import get_token_cache
+from core.models import Tag
+from core.testing import OnCommitMixin
+
+from recipe import caching
+from recipe.caching import response_cache
+from recipe.serializers import TagSerializer, read_fields
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class PublicTagsApiTests(TestCase):
+    """Test the publicly available tags API"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_login_required(self):
+        """Test that login is required for retrieving tags"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateTagsApiTests(OnCommitMixin, TestCase):
+    """Test the authorized user tags API"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        caches['default'].clear() # forget the list versions of earlier tests
+        caches['recipe_responses'].clear()
+        self.user = get_user_model().objects.create_user(
+            'test@javid.com',
+            'password123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        # authenticate with a real token header so the token auth class is exercised
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_retrieve_tags(self):
+        """Test retrieving tags"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAGS_URL)
+
+        tags = Tag.objects.all().order_by('-name')
+        serializer = TagSerializer(tags, many=True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_tags_limited_to_user(self):
+        """Test that tags returned are for the authenticated user"""
+        other = get_user_model().objects.create_user('other@javid.com', 'testpass')
+        Tag.objects.create(user=other, name='Fruity')
+        tag = Tag.objects.create(user=self.user, name='Comfort Food')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+
+    def test_token_lookup_is_cached(self):
+        """Only the first request pays for the authtoken query"""
+        self.client.get(TAGS_URL) # warms the token cache
+
+        with self.assertNumQueries(1): # just the tag list query (a new page, so not a cached response)
+            res = self.client.get(TAGS_URL + '?page_size=5')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tags_are_paginated_by_cursor(self):
+        """Following the next links walks every tag exactly once, in order"""
+        for name in ['Breakfast', 'Lunch', 'Dinner', 'Supper', 'Snack']: # (user, name) is unique
+            Tag.objects.create(user=self.user, name=name)
+
+        seen = []
+        url = TAGS_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(tag['id'] for tag in res.data['results'])
+            url = res.data['next']
+
+        expected = Tag.objects.order_by('-name').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_cursor_is_stable_under_inserts(self):
+        """Tags created while paging don't shift the following pages"""
+        for name in ['d', 'c', 'b', 'a']:
+            Tag.objects.create(user=self.user, name=name)
+
+        first = self.client.get(TAGS_URL + '?page_size=2')
+        Tag.objects.create(user=self.user, name='z') # sorts before everything we've seen
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual([t['name'] for t in first.data['results']], ['d', 'c'])
+        self.assertEqual([t['name'] for t in second.data['results']], ['b', 'a'])
+        self.assertIsNone(second.data['next'])
+
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual([t['name'] for t in previous.data['results']], ['d', 'c'])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(TAGS_URL + '?cursor=garbage')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_wrong_value_types(self):
+        """A well formed cursor holding the wrong types is a 404, not a 500"""
+        for key in (['a', 'abc'], [1, 2], ['a', True], [1], [None]):
+            cursor = base64.urlsafe_b64encode(json.dumps([False, key]).encode()).decode()
+            res = self.client.get(TAGS_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_the_old_name_and_id_key(self):
+        """Cursors handed out before the ordering lost its id tiebreaker still work"""
+        for name in ['c', 'b', 'a']:
+            Tag.objects.create(user=self.user, name=name)
+        cursor = base64.urlsafe_b64encode(json.dumps([False, ['c', 99]]).encode()).decode()
+
+        res = self.client.get(TAGS_URL, {'cursor': cursor})
+
+        self.assertEqual([t['name'] for t in res.data['results']], ['b', 'a'])
+
+    def test_unchanged_list_is_not_modified(self):
+        """Sending back the ETag gets a 304 without querying the tags"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAGS_URL)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(0):
+            again = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again['ETag'], res['ETag'])
+
+        since = self.client.get(TAGS_URL, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changed_list_gets_new_etag(self):
+        """Creating a tag (one or in bulk) invalidates the old ETag"""
+        res = self.client.get(TAGS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(TAGS_URL, {'name': 'Vegan'})
+        after_one = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(after_one.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(after_one['ETag'], res['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(TAGS_URL, [{'name': 'Keto'}], format='json')
+        after_bulk = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=after_one['ETag'])
+        self.assertEqual(after_bulk.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(after_bulk.data['results']), 2)
+
+    def test_version_changes_only_once_committed(self):
+        """A list read before the commit mustn't be cached under the new version"""
+        version = caching.get_version(Tag, self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Vegan')
+            self.assertEqual(caching.get_version(Tag, self.user.pk), version)
+
+        self.assertNotEqual(caching.get_version(Tag, self.user.pk), version)
+
+    def test_rendered_list_is_cached(self):
+        """The same page is served from the response cache until a tag changes"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        response_cache.reset_stats()
+
+        first = self.client.get(TAGS_URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(TAGS_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(response_cache.stats()['hits'], 1)
+        self.assertEqual(response_cache.stats()['misses'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(TAGS_URL, {'name': 'Keto'})
+        third = self.client.get(TAGS_URL)
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(len(third.json()['results']), 2)
+
+    def test_create_tag_successful(self):
+        """Test creating a new tag"""
+        payload = {'name': 'Test tag'}
+        res = self.client.post(TAGS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        exists = Tag.objects.filter(user=self.user, name=payload['name']).exists()
+        self.assertTrue(exists)
+
+    def test_create_tag_invalid(self):
+        """Test creating a new tag with invalid payload"""
+        res = self.client.post(TAGS_URL, {'name': ''})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CollectionVersionTests(SimpleTestCase):
+
+    def test_version_bumped_in_one_process_is_seen_by_another(self):
+        """The default cache is shared: a second instance stands in for another worker"""
+        writer, reader = _create_cache('default'), _create_cache('default')
+        writer.clear()
+
+        with mock.patch.object(caching, 'get_cache', return_value=writer):
+            version = caching.bump_version(Tag, 1)
+        with mock.patch.object(caching, 'get_cache', return_value=reader):
+            self.assertEqual(caching.get_version(Tag, 1), version)
+
+
+class ReadFieldsTests(SimpleTestCase):
+
+    def test_plain_columns_use_values(self):
+        self.assertEqual(read_fields(TagSerializer), ('id', 'name'))
+
+    def test_computed_fields_need_the_serializer(self):
+        class ShoutingTagSerializer(TagSerializer):
+            shout = serializers.SerializerMethodField()
+
+            class Meta(TagSerializer.Meta):
+                fields = ('id', 'name', 'shout')
+
+            def get_shout(self, tag):
+                return tag.name.upper()
+
+        self.assertIsNone(read_fields(ShoutingTagSerializer))
@@ -0,0 +1,19 @@
+from django.urls import path, include
+
+# the default router automatically generates the urls for our viewsets
+    # ie. /api/recipe/tags and /api/recipe/tags/1
+from rest_framework.routers import DefaultRouter
+
+from recipe import views
+
+
+router = DefaultRouter()
+router.register('tags', views.TagViewSet)
+router.register('ingredients', views.IngredientViewSet)
+
+app_name = 'recipe' # so reverse() can find our urls -- ie. reverse('recipe:tag-list')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('export/', views.ExportView.as_view(), name='export'), # streams everything as NDJSON or CSV
+]
@@ -3,26 +3,52 @@
         # specifically, we'll use the list model mixin
         # we're able to pull in different parts of a view for our app
             # we only want the LIST function (not create, update, or delete functions)
+import re
+from collections import OrderedDict
+
 from rest_framework import viewsets, mixins 
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from django.conf import settings
+from django.db import router, transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_sequence
 
-# to auth. the requests
-from rest_framework.authentication import TokenAuthentication
+# to auth. the requests - same as TokenAuthentication but caches the token lookups
+    # so we don't run a query against authtoken_token on every request
+from core.authentication import CachedTokenAuthentication
+from core.renderers import CSVRenderer, NDJSONRenderer, StreamingJSONRenderer
+from core.throttling import CreateIPThrottle, CreateUserThrottle
 
 from rest_framework.permissions import IsAuthenticated
 
 # import the tag and the serializer
 from core.models import Tag, Ingredient
 from recipe import serializers
+from recipe.caching import bump_version, get_version, list_digest, response_cache
+from recipe.pagination import KeysetPagination
 
 
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixings.ListModelMixin, mixins.CreateModelMixin):
+class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
      # add the authentication & permission classes 
     # requires that token auth. is used
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     # requires that the user's auth. to use the api
     permission_classes = (IsAuthenticated,)
+    # creates (POST) are rate limited per user & per IP address; reads aren't throttled
+    throttle_classes = (CreateUserThrottle, CreateIPThrottle)
+    # returns ?page_size= objects per page with next/previous cursor links (seeks on the name)
+    pagination_class = KeysetPagination
+    # the usual renderers + ?format=json-stream, which streams the whole (unpaginated) list
+    renderer_classes = tuple(api_settings.DEFAULT_RENDERER_CLASSES) + (StreamingJSONRenderer,)
 
     def get_queryset(self):
         #overriding
@@ -35,7 +61,100 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixings.ListModelMixin, mix
         # don't do Tag.objects.all(); do queryset in case it's changed
         # the request object should be passed to self as a class variable 
         #   & the user should be assigned since it requires auth.
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        return self.queryset.filter(user=self.request.user).order_by('-name') # a name is unique per user - no ties to break
+
+    def list(self, request, *args, **kwargs):
+        """List the user's objects, or 304 Not Modified if the client's copy is current"""
+        # the version comes from the cache, so an unchanged list costs no queries & no serializing
+        version, modified = get_version(self.queryset.model, request.user.pk)
+        # each page / query string / format is a different representation of the same version
+        digest = list_digest(version, request.get_full_path(), request.accepted_media_type)
+        etag = '"%s"' % digest
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=modified)
+        if response is None:
+            # client doesn't have it, but maybe we've already rendered this exact page
+            response = response_cache.get(self.queryset.model, request.user.pk, digest)
+        if response is None:
+            query = request.query_params.get('q', '').strip()
+            if query:
+                response = self.search_list(request, query)
+            elif isinstance(request.accepted_renderer, StreamingJSONRenderer):
+                response = self.stream_list(request)
+            else:
+                response = self.page_list(request, *args, **kwargs)
+            self.response_cache_digest = digest # finalize_response stores it once rendered
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        patch_vary_headers(response, ('Authorization',)) # every user has their own list
+        return response
+
+    def page_list(self, request, *args, **kwargs):
+        """One page of the list, built from plain .values() dicts when the serializer allows it"""
+        # reads don't need the validating serializer: fetching just the exposed columns & using
+            # the dicts as they come out of the db is several times faster per row (see
+            # bench_list_serialization); creates still go through the full serializers
+        fields = serializers.read_fields(self.get_serializer_class())
+        if fields is None:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.get_queryset().values(*fields))
+        return self.get_paginated_response(page)
+
+    def search_list(self, request, query):
+        """?q= mode - the best ?page_size= prefix/fuzzy matches, best first (not paginated)"""
+        # imported here - only ?q= requests need the search index code, so it stays out of
+            # every worker's startup (see python manage.py profile_startup)
+        from recipe import search
+
+        limit = self.paginator.get_page_size(request)
+        objects = search.search(self.get_queryset(), request.user.pk, query, limit)
+        serializer = self.get_serializer(objects, many=True)
+        # same shape as a normal page so clients can treat both the same
+        return Response(OrderedDict([('next', None), ('previous', None), ('results', serializer.data)]))
+
+    def stream_list(self, request):
+        """?format=json-stream - every object, serialized & sent a chunk at a time"""
+        # rows come from a server side cursor in batches & each one is serialized just before
+            # it's written, so memory stays flat however long the list is
+        chunk_size = settings.RECIPE_STREAM_CHUNK_SIZE
+        fields = serializers.read_fields(self.get_serializer_class())
+        # the rows are only read while the response is sent - after ReplicaPinMiddleware has
+            # already forgotten this client's pin - so pick the database now (see core/db/router.py)
+        queryset = self.get_queryset()
+        queryset = queryset.using(router.db_for_read(queryset.model))
+        if fields is None:
+            serializer = self.get_serializer()
+            items = (serializer.to_representation(obj) for obj in queryset.iterator(chunk_size=chunk_size))
+        else:
+            items = queryset.values(*fields).iterator(chunk_size=chunk_size)
+        envelope = OrderedDict([('next', None), ('previous', None)]) # same shape as a page
+        return StreamingHttpResponse(
+            request.accepted_renderer.stream(items, envelope),
+            content_type=StreamingJSONRenderer.media_type,
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        digest = getattr(self, 'response_cache_digest', None)
+        if digest and isinstance(response, Response) and response.status_code == 200:
+            # the bytes only exist after the renderer has run
+            model, user_id = self.queryset.model, request.user.pk
+            response.add_post_render_callback(
+                lambda rendered: response_cache.set(model, user_id, digest, rendered)
+            )
+            response['X-Cache'] = 'MISS'
+        return response
+
+    def get_serializer(self, *args, **kwargs):
+        """Use a list serializer when a JSON array is posted (bulk create)"""
+        data = kwargs.get('data')
+        if isinstance(data, list):
+            # one request & one INSERT for the whole list instead of one per object
+            limit = settings.RECIPE_BULK_CREATE_MAX
+            if len(data) > limit:
+                raise ValidationError('Send at most %d objects per request.' % limit)
+            kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
 
       # overriding from mixingsCreateModelMixin
     def perform_create(self, serializer):
@@ -43,6 +162,11 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixings.ListModelMixin, mix
         # now we can pass in whatever mods. we want to do in our create process
         # we'll save & set the user to the authenticated user:
         serializer.save(user=self.request.user)
+        if isinstance(serializer, ListSerializer):
+            # bulk_create doesn't send post_save signals, so bump the list version ourselves
+                # (after the commit, like recipe/signals.py)
+            model, user_id = self.queryset.model, self.request.user.pk
+            transaction.on_commit(lambda: bump_version(model, user_id))
 
 
 # create our viewset
@@ -64,4 +188,45 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
  
     # register this viewset with the ROUTER 
         # so we can access the endpoint from the web
- 
\ No newline at end of file
+ 
+
+
+class ExportView(APIView):
+    """Download all of the user's tags & ingredients as NDJSON (default) or CSV"""
+    # ie. GET /api/recipe/export/?format=csv  (or Accept: text/csv)
+    # rows are read through a server side cursor a chunk at a time (iterator(chunk_size=...)),
+        # written out as they arrive & - if the client sends Accept-Encoding: gzip - compressed
+        # on the fly, so memory use is the same for 10 rows or 10 million
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+    columns = ('type', 'id', 'name')
+    accepts_gzip = re.compile(r'\bgzip\b')
+
+    def get(self, request):
+        renderer = request.accepted_renderer
+        # like stream_list: the rows are read while the response is sent, so the database
+            # (primary for a client that just wrote) is picked while the request is handled
+        alias = router.db_for_read(Tag)
+        chunks = renderer.stream(self.rows(request.user, alias), self.columns)
+        gzipped = bool(self.accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        if gzipped:
+            chunks = compress_sequence(chunks)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += '; charset=%s' % renderer.charset
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="recipe-export.%s"' % renderer.format
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding', 'Authorization'))
+        return response
+
+    def rows(self, user, alias):
+        """(type, id, name) of every tag, then every ingredient, of the user"""
+        chunk_size = settings.RECIPE_STREAM_CHUNK_SIZE
+        for label, model in (('tag', Tag), ('ingredient', Ingredient)):
+            queryset = model.objects.using(alias).filter(user=user).order_by('id').values_list('id', 'name')
+            for pk, name in queryset.iterator(chunk_size=chunk_size):
+                yield label, pk, name
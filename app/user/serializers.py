@@ -3,16 +3,24 @@
 # this is where we'll store the serializers for our User model/class
     # we'll need to import our get_user_model to access our User model/class
 from django.contrib.auth import get_user_model 
+from django.db import IntegrityError
 
 # import the serializers module
 from rest_framework import serializers
 
+# answers "is this email taken?" from an in-memory filter when it can (see core/emails.py)
+from core.emails import is_email_taken
+# counts building .data towards the request's serialize time (see core/serializers.py)
+from core.serializers import TimedDataMixin
+
 # inherit since we're basing serializer from our model 
     # django has a built in serializer
         # we just specify the fields we want for our serializer 
             # then, db conversion will automatically be done for us
         # also helps with retrieving & creating from the database
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedDataMixin, serializers.ModelSerializer):
+
+    taken_message = 'user with this email already exists.' # same wording as DRF's UniqueValidator
 
     class Meta:
         model = get_user_model() # the model we base our serializer from
@@ -23,12 +31,27 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('email', 'password', 'name') # aka (the fields we'll accept when creating users) // must update if you need to add or remove fields
         # allows us to configure a few extra settings in our model serializer
             # will be used to ensure the password's WRITE-ONLY & >= 5 characters
-        extra_kwargs = {'password': {'write_only': True, 'min_length': 5}} # for the pw 'field' in 'fields'
+        extra_kwargs = {
+            'password': {'write_only': True, 'min_length': 5}, # for the pw 'field' in 'fields'
+            # drop the default UniqueValidator (an exact match query on every signup); validate_email
+                # checks uniqueness ignoring case & usually without a query
+            'email': {'validators': []},
+        }
 
+    def validate_email(self, value):
+        """Refuse an email that's already registered (in any letter case)"""
+        if is_email_taken(value):
+            raise serializers.ValidationError(self.taken_message)
+        return value
 
     def create(self, validated_data): # from the django rest_framework documentation; we're overriding the create function
         """Create a new user with an encrypted password and return it"""
         # call the create_user function in our model since by default it only calls the create function & we want to call create_user model manager function so we know the password's encrypted
         # validated_data is data that's passed into our serializer
             # from the JSON data made in the HTTP POST
-        return get_user_model().objects.create_user(**validated_data)
\ No newline at end of file
+        try:
+            return get_user_model().objects.create_user(**validated_data)
+        except IntegrityError:
+            # someone signed up with the same email between validate_email & here (the
+                # unique index on LOWER(email) has the final word)
+            raise serializers.ValidationError({'email': [self.taken_message]})
\ No newline at end of file
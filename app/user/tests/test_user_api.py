@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse  # so we can generate our API url
@@ -5,10 +7,14 @@ from django.urls import reverse  # so we can generate our API url
 from rest_framework.test import APIClient # a test client to make requests to our api & check the response
 from rest_framework import status # module that has status codes // makes tests easier to read
 
+from core.emails import get_email_index
+from core.testing import QueryBudgetMixin # fails a test that runs too many (or repeated) queries
+
 # Note - db refreshes after each test; users created in 1 test aren't accessible in another test
 # At the beginning of any API tests, add a helper function OR constant variable for the URL we'll be testing
 
 
+EMAIL_AVAILABLE_URL = reverse('user:email-available')
 CREATE_USER_URL = reverse('user:create') # based on the app & URL in urls.py // app = user // will look in the 'user' app for a url called 'create' 
    
 def create_user(**params):  # can pass in many params // dynamic list of args.  # this method is used to easily create a user when the test requires that a user already exists (for example: test_user_exists()).
@@ -18,7 +24,7 @@ def create_user(**params):  # can pass in many params // dynamic list of args.
 
 """TEST CLASS"""         
 
-class PublicUserAPITests(TestCase):      
+class PublicUserAPITests(QueryBudgetMixin, TestCase):      
 
     def setUp(self):     
         self.client = APIClient()
@@ -63,7 +69,56 @@ class PublicUserAPITests(TestCase):
         """User with that email doesn't exist"""
         self.assertFalse(user_exists)                                       
 
+    def test_create_user_query_budget(self):
+        """Signing up with a new email is just the INSERT (the email filter knows it's free)"""
+        get_email_index().build(force=True)
+        payload = {'email': 'budget@cleandev.com', 'password': 'testpass', 'name': 'Budget'}
+        with self.assertMaxQueries(1):
+            res = self.client.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_email_in_other_case_is_a_duplicate(self):
+        create_user(email='test@cleandev.com', password='testpass')
+        payload = {'email': 'TEST@cleandev.com', 'password': 'testpass', 'name': 'Test'}
+
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
+    def test_duplicate_missed_by_the_check_is_refused_by_the_index(self):
+        """A signup racing another one for the same email gets a 400, not a 500"""
+        create_user(email='race@cleandev.com', password='testpass')
+        payload = {'email': 'race@cleandev.com', 'password': 'testpass', 'name': 'Race'}
+
+        with patch('user.serializers.is_email_taken', return_value=False):
+            res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['email'], ['user with this email already exists.'])
+
+
+
+"""TEST CLASS"""
+
+class EmailAvailableAPITests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        create_user(email='taken@cleandev.com', password='testpass')
+
+    def test_free_email(self):
+        res = self.client.get(EMAIL_AVAILABLE_URL, {'email': 'New@cleandev.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'email': 'new@cleandev.com', 'available': True})
+
+    def test_taken_email_in_any_case(self):
+        res = self.client.get(EMAIL_AVAILABLE_URL, {'email': 'Taken@CleanDev.com'})
 
+        self.assertFalse(res.data['available'])
 
+    def test_invalid_email(self):
+        res = self.client.get(EMAIL_AVAILABLE_URL, {'email': 'not-an-email'})
 
-"""TEST CLASS"""
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
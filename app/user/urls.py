@@ -15,5 +15,6 @@ urlpatterns = [
     # second: the view we wire the URL to, 
     # third: give it a name we can use when using django's reverse() lookup function
     path('create/', views.CreateUserView.as_view(), name='create'),
+    path('email-available/', views.EmailAvailableView.as_view(), name='email-available'),
 ] 
  # if path matches create/, we go to that view which will handle/render our API request
@@ -5,6 +5,16 @@ from user.serializers import UserSerializer
 #   - lets us easily make an API that creates an object in the db that uses the serializer we'll provide
 from rest_framework import generics 
 
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from core.emails import is_email_taken, normalize
+# signups are throttled per IP address (each one hashes a password - see core/throttling.py)
+from core.throttling import EmailCheckThrottle, SignupThrottle
+
 
 
 
@@ -16,6 +26,31 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer # that's all we need to do for the view
         # rest_framework - makes it ez to create API that does standard behavior
         #   aka (creating objects in the database)
+    # over the 'signup' rate a client gets a 429 with Retry-After instead
+    throttle_classes = (SignupThrottle,)
 
     # before accessing the api we need to create a URL and wire it to our view
-    
\ No newline at end of file
+    
+
+
+
+# lets a signup form say "already taken" while the user types, before they submit
+    # ie. GET /api/user/email-available/?email=someone@example.com
+        # -> {"email": "someone@example.com", "available": true}
+class EmailAvailableView(APIView):
+    """Whether an email can still be used to sign up"""
+    # anonymous - no authentication to run at all
+    authentication_classes = ()
+    permission_classes = ()
+    # it tells anyone whether an email has an account, so it's rate limited per IP address
+    throttle_classes = (EmailCheckThrottle,)
+
+    def get(self, request):
+        email = request.query_params.get('email', '').strip()
+        try:
+            validate_email(email)
+        except ValidationError:
+            return Response({'email': ['Enter a valid email address.']}, status=400)
+        # most free emails are answered from memory without a query (see core/emails.py)
+        return Response({'email': normalize(email), 'available': not is_email_taken(email)})
+